@@ -0,0 +1,395 @@
+# Воспроизводимые замеры производительности без окна (платформа Qt offscreen).
+#
+#   cd vector_editor
+#   python -m benchmarks.run                        # сравнить с baseline.json
+#   python -m benchmarks.run --sizes 1000,1000000   # свои размеры сцен
+#   python -m benchmarks.run --update-baseline      # записать новый эталон
+#
+# Код возврата 1, если какой-либо замер хуже эталона больше чем на --tolerance
+# (и больше чем на MIN_DELTA_S в абсолютном выражении: у коротких замеров шум
+# больше самой величины). Сравнивается лучший из повторов - как в timeit, он
+# меньше всего зависит от посторонней нагрузки; сборщик мусора на время
+# замера выключен.
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtWidgets import QApplication
+from benchmarks import scenes
+from src.logic.commands.commands import BulkChangeWidthCommand
+from src.logic.io import FileManager
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.styles import style_table
+from src.logic.simplify import StreamSimplifier, simplify
+from src.logic.snapping import Snapper
+from src.logic.spatial_index import IndexedScene
+from src.logic.strategies import ImageSaveStrategy, JsonSaveStrategy, SvgSaveStrategy
+from src.logic.svg_import import SvgImporter
+from src.widgets.canvas import EditorCanvas
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_TOLERANCE = 0.5
+MIN_DELTA_S = 0.005
+IMAGE_MAX_SIDE = 2048
+HIT_TESTS = 1000
+AREA_QUERIES = 100
+SNAP_QUERIES = 1000
+# Кадры вида 800x600 над одним участком сцены
+VIEW_SIZE = (800, 600)
+VIEW_FRAMES = 10
+# Штрихов на фигуру сцены и точек мыши в штрихе
+STROKES_PER_SHAPE = 0.01
+STROKE_SAMPLES = 500
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    # Функция получает контекст, делает неизмеряемую подготовку и возвращает
+    # измеряемое действие. Действие не должно менять сцену между повторами
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Context:
+    def __init__(self, n: int, workdir: str, seed: int = 0):
+        self.n = n
+        self.workdir = workdir
+        self.rng = random.Random(seed)
+        self.side = scenes.scene_side(n)
+
+        self.canvas = EditorCanvas()
+        self.scene = self.canvas.scene
+        scenes.populate(self.scene, n, seed)
+        self.json_path = os.path.join(workdir, f"scene_{n}.json")
+        self._scenes = []
+
+    def random_point(self) -> QPointF:
+        return QPointF(self.rng.uniform(0, self.side), self.rng.uniform(0, self.side))
+
+    def select_all(self):
+        for item in top_level_items(self.scene):
+            item.setSelected(True)
+
+    def keep(self, scene):
+        # Отдельные сцены замеров живут до конца прогона размера
+        self._scenes.append(scene)
+
+    def close(self):
+        self.canvas.undo_stack.clear()
+        self.scene.clear()
+        for scene in self._scenes:
+            scene.clear()
+        self.canvas.deleteLater()
+
+
+@benchmark("json_save")
+def bench_json_save(ctx):
+    strategy = JsonSaveStrategy()
+    return lambda: strategy.save(ctx.json_path, ctx.scene)
+
+
+@benchmark("json_load")
+def bench_json_load(ctx):
+    if not os.path.exists(ctx.json_path):
+        JsonSaveStrategy().save(ctx.json_path, ctx.scene)
+
+    def load():
+        data = FileManager.load_project(ctx.json_path)
+        styles = style_table.read(data.get("styles", []))
+        return [ShapeFactory.from_dict(shape, styles) for shape in data["shapes"]]
+    return load
+
+
+@benchmark("image_save")
+def bench_image_save(ctx):
+    # Крупные сцены экспортируются с уменьшением: важна отрисовка фигур, а не размер PNG
+    rect = ctx.scene.sceneRect()
+    scale = min(1.0, IMAGE_MAX_SIDE / max(rect.width(), rect.height(), 1))
+    strategy = ImageSaveStrategy("PNG", scale=scale)
+    path = os.path.join(ctx.workdir, f"scene_{ctx.n}.png")
+    return lambda: strategy.save(path, ctx.scene)
+
+
+@benchmark("svg_save")
+def bench_svg_save(ctx):
+    strategy = SvgSaveStrategy()
+    path = os.path.join(ctx.workdir, f"scene_{ctx.n}.svg")
+    return lambda: strategy.save(path, ctx.scene)
+
+
+@benchmark("svg_load")
+def bench_svg_load(ctx):
+    path = os.path.join(ctx.workdir, f"scene_{ctx.n}.svg")
+    if not os.path.exists(path):
+        SvgSaveStrategy().save(path, ctx.scene)
+    return lambda: list(SvgImporter.iter_project(path))
+
+
+@benchmark("select_all")
+def bench_select_all(ctx):
+    def select():
+        ctx.select_all()
+        ctx.scene.selectedItems()
+        ctx.scene.clearSelection()
+    return select
+
+
+@benchmark("select_same")
+def bench_select_same(ctx):
+    # Поиск по вторичным индексам колоночной модели, без самого выделения
+    columns = ctx.scene.columns
+    samples = ctx.rng.sample(top_level_items(ctx.scene), 3)
+    columns.flush()
+    return lambda: [columns.similar(samples, attribute) for attribute in ("type", "color", "width")]
+
+
+@benchmark("hit_test")
+def bench_hit_test(ctx):
+    index = ctx.canvas.spatial_index
+    points = [ctx.random_point() for _ in range(HIT_TESTS)]
+    index.flush()
+    return lambda: [index.item_at(point) for point in points]
+
+
+@benchmark("snap_query")
+def bench_snap_query(ctx):
+    # Привязка точки к опорным точкам и направляющим при масштабе 1
+    snapper = ctx.canvas.snapper
+    points = [ctx.random_point() for _ in range(SNAP_QUERIES)]
+    ctx.canvas.spatial_index.flush()
+    return lambda: [snapper.snap_offset([point.x(), point.y()], 1.0) for point in points]
+
+
+@benchmark("view_frame")
+def bench_view_frame(ctx):
+    # Отрисовка вида при масштабе 1: время должно зависеть от видимых фигур, а не от всех
+    canvas = ctx.canvas
+    canvas.resize(*VIEW_SIZE)
+    canvas.centerOn(ctx.side / 2, ctx.side / 2)
+    viewport = canvas.viewport()
+    viewport.grab()
+    return lambda: [viewport.grab() for _ in range(VIEW_FRAMES)]
+
+
+@benchmark("snap_group")
+def bench_snap_group(ctx):
+    # Привязка рядом с детьми одной большой группы: у сцены из групп по
+    # GROUP_SIZE фигур на запрос приходится мало точек, здесь - вся группа
+    scene = IndexedScene()
+    scenes.populate_group(scene, ctx.n)
+    snapper = Snapper(scene)
+    points = [ctx.random_point() for _ in range(SNAP_QUERIES)]
+    scene.spatial_index.flush()
+    ctx.keep(scene)
+    return lambda: [snapper.snap_offset([point.x(), point.y()], 1.0) for point in points]
+
+
+@benchmark("freehand")
+def bench_freehand(ctx):
+    # Упрощение штрихов по мере "рисования" и готовые фигуры с записью в словарь,
+    # без добавления на сцену. Штрих - случайное блуждание с шагом в пару пикселей
+    strokes = []
+    for _ in range(max(1, int(ctx.n * STROKES_PER_SHAPE))):
+        point = ctx.random_point()
+        x, y, angle = point.x(), point.y(), ctx.rng.uniform(0, 6.3)
+        samples = []
+        for _ in range(STROKE_SAMPLES):
+            angle += ctx.rng.uniform(-0.2, 0.2)
+            x, y = x + 2 * math.cos(angle), y + 2 * math.sin(angle)
+            samples.append((round(x), round(y)))
+        strokes.append(samples)
+
+    def draw():
+        for samples in strokes:
+            simplifier = StreamSimplifier(1.5)
+            for x, y in samples:
+                simplifier.add(x, y)
+            ShapeFactory.create_polyline(simplify(simplifier.points(), 1.5), "black").to_dict()
+    return draw
+
+
+@benchmark("area_query")
+def bench_area_query(ctx):
+    index = ctx.canvas.spatial_index
+    size = ctx.side / 10
+    areas = [QRectF(ctx.random_point(), QPointF(0, 0)).adjusted(0, 0, size, size) for _ in range(AREA_QUERIES)]
+    index.flush()
+    return lambda: [index.items_in(area) for area in areas]
+
+
+@benchmark("group_ungroup")
+def bench_group_ungroup(ctx):
+    def group_ungroup():
+        ctx.select_all()
+        ctx.canvas.group_selection()
+        # ungroup_selection() разобрала бы и вложенные группы сцены - следующий
+        # повтор шёл бы уже на другой сцене. Разбираем только созданную группу
+        group = ctx.canvas.selected_top_items()[0]
+        ctx.scene.destroyItemGroup(group)
+        ctx.scene.clearSelection()
+    return group_ungroup
+
+
+@benchmark("undo_redo_move")
+def bench_undo_redo_move(ctx):
+    ctx.select_all()
+    ctx.canvas.translate_selection(10, 10)
+    ctx.scene.clearSelection()
+    stack = ctx.canvas.undo_stack
+
+    def undo_redo():
+        stack.undo()
+        stack.redo()
+    return undo_redo
+
+
+@benchmark("undo_redo_width")
+def bench_undo_redo_width(ctx):
+    stack = ctx.canvas.undo_stack
+    stack.push(BulkChangeWidthCommand(ctx.scene, top_level_items(ctx.scene), 5))
+
+    def undo_redo():
+        stack.undo()
+        stack.redo()
+    return undo_redo
+
+
+def measure(action, repeat: int) -> list:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            action()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return times
+
+
+def run(sizes, names, repeat: int, workdir: str, log=print) -> dict:
+    results = {}
+    for n in sizes:
+        start = time.perf_counter()
+        ctx = Context(n, workdir)
+        QApplication.processEvents()
+        log(f"сцена {n}: {time.perf_counter() - start:.2f} с")
+
+        for name in names:
+            # Редактор печатает в консоль при группировке и т.п. - в замерах это шум
+            with contextlib.redirect_stdout(io.StringIO()):
+                action = BENCHMARKS[name](ctx)
+                times = measure(action, repeat)
+                QApplication.processEvents()
+
+            key = f"{name}@{n}"
+            results[key] = {"median_s": statistics.median(times), "min_s": min(times), "repeat": repeat}
+            log(f"  {key:28} {results[key]['min_s'] * 1000:10.2f} мс (медиана {results[key]['median_s'] * 1000:.2f})")
+
+        ctx.close()
+        QApplication.processEvents()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+
+        current, expected = result["min_s"], reference["min_s"]
+        if current > expected * (1 + tolerance) and current - expected > MIN_DELTA_S:
+            regressions.append((key, expected, current))
+    return regressions
+
+
+def machine_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры производительности vector_editor")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="размеры сцен через запятую, например 1000,10000,1000000")
+    parser.add_argument("--only", default="", help="замеры через запятую (по умолчанию все)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="допустимое замедление относительно эталона, доля")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="записать результаты как эталон")
+    parser.add_argument("--output", help="записать результаты в JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    names = [name for name in args.only.split(",") if name] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(unknown)}; есть: {', '.join(BENCHMARKS)}")
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(sizes, names, args.repeat, workdir)
+
+    report = {"machine": machine_info(), "results": results}
+    if args.output:
+        with FileManager.atomic_open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        # Новые результаты дополняют эталон: прогон части замеров не стирает остальные
+        baseline = {"machine": report["machine"], "results": {}}
+        if os.path.exists(args.baseline):
+            baseline["results"] = FileManager.load_project(args.baseline).get("results", {})
+        baseline["results"].update(results)
+        with FileManager.atomic_open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Эталон записан: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Эталона нет ({args.baseline}), сравнивать не с чем; запустите с --update-baseline")
+        return 0
+
+    baseline = FileManager.load_project(args.baseline)
+    if baseline.get("machine") != report["machine"]:
+        print("Внимание: эталон записан на другой машине, сравнение приблизительное")
+
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    for key, expected, current in regressions:
+        print(f"РЕГРЕССИЯ {key}: {expected * 1000:.2f} мс -> {current * 1000:.2f} мс "
+              f"({current / expected - 1:+.0%})")
+    if regressions:
+        return 1
+
+    print("Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import math
+import random
+from src.logic.shape_logic.factory import ShapeFactory
+
+# Синтетические сцены: n фигур верхнего уровня вперемешку - линии, прямоугольники,
+# эллипсы и каждая GROUP_EVERY-я - группа из GROUP_SIZE фигур. Плотность
+# постоянна (CELL пикселей на фигуру), поэтому сторона сцены растёт как sqrt(n)
+CELL = 25
+GROUP_EVERY = 20
+GROUP_SIZE = 4
+COLORS = ("black", "red", "#1f77b4", "#2ca02c", "#ff7f0e")
+PRIMITIVES = ("line", "rect", "ellipse")
+
+
+def scene_side(n: int) -> float:
+    return math.ceil(math.sqrt(n)) * CELL
+
+
+def populate(scene, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    side = scene_side(n)
+
+    for i in range(n):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        if i % GROUP_EVERY == GROUP_EVERY - 1:
+            item = _group(rng, x, y)
+        else:
+            item = _primitive(rng, PRIMITIVES[i % len(PRIMITIVES)], x, y)
+        scene.addItem(item)
+
+
+def _primitive(rng, shape_type: str, x: float, y: float):
+    w, h = rng.uniform(2, CELL), rng.uniform(2, CELL)
+    return ShapeFactory.from_record(shape_type, x, y, 0, 0, w, h,
+                                    rng.choice(COLORS), rng.choice((1, 2, 3)))
+
+
+def _group(rng, x: float, y: float):
+    group = ShapeFactory.from_record("group", x, y)
+    for i in range(GROUP_SIZE):
+        child = _primitive(rng, PRIMITIVES[i % len(PRIMITIVES)], 0, 0)
+        group.addToGroup(child)
+        child.setPos(rng.uniform(0, CELL), rng.uniform(0, CELL))
+    return group
+
+
+def populate_group(scene, n: int, seed: int = 0):
+    # Одна группа из n фигур на площади сцены из n фигур
+    rng = random.Random(seed)
+    side = scene_side(n)
+    group = ShapeFactory.from_record("group", 0, 0)
+    scene.addItem(group)
+    for i in range(n):
+        child = _primitive(rng, PRIMITIVES[i % len(PRIMITIVES)], 0, 0)
+        scene.addItem(child)
+        group.addToGroup(child)
+        child.setPos(rng.uniform(0, side), rng.uniform(0, side))
+    return group
@@ -1,11 +1,14 @@
-from PySide6.QtWidgets import QMainWindow, QMessageBox, QWidget, QHBoxLayout, QVBoxLayout, QFrame, QPushButton, QFileDialog
-from PySide6.QtGui import QCloseEvent, QAction, QKeySequence
+from PySide6.QtWidgets import QMainWindow, QMessageBox, QWidget, QHBoxLayout, QVBoxLayout, QFrame, QPushButton, QFileDialog, QProgressDialog, QInputDialog, QLabel
+from PySide6.QtGui import QCloseEvent, QAction, QActionGroup, QKeySequence
+from PySide6.QtCore import Qt, QTimer
 from src.widgets.canvas import EditorCanvas
 from src.widgets.properties import PropertiesPanel
-from src.logic.strategies import JsonSaveStrategy, ImageSaveStrategy
-from src.logic.shape_logic.factory import ShapeFactory
-from src.logic.io import FileManager
-import json
+from src.widgets.select_dialog import SelectWhereDialog
+from src.logic.strategies import JsonSaveStrategy, ImageSaveStrategy, BinarySaveStrategy, SvgSaveStrategy
+from src.logic.loader import ProjectLoader
+from src.logic.saver import BackgroundSaver
+from src.logic.journal import CommandJournal, journal_path_for
+from src.logic.metrics import MetricsServer, metrics
 
 class VectorEditorWindow(QMainWindow):
     def __init__(self):
@@ -15,12 +18,37 @@ class VectorEditorWindow(QMainWindow):
         self.setWindowTitle("Vector Editor")
         self.resize(800, 600)
 
+        self.loader = None
+        self.saver = None
+        self.project_path = None
+        self.metrics_server = MetricsServer(self)
+
         self._init_ui()
+
+        self.journal = CommandJournal(self.canvas.scene, parent=self)
+        self.canvas.undo_stack.journal = self.journal
+        QTimer.singleShot(0, lambda: self._start_journal(None))
         
     def _init_ui(self):
         self._setup_layout()
         self.statusBar().showMessage("Готов к работе") 
 
+        # Память истории отмены - постоянно справа в строке состояния
+        self.lbl_undo_memory = QLabel()
+        self.statusBar().addPermanentWidget(self.lbl_undo_memory)
+        self.canvas.undo_stack.memory_changed.connect(self.on_undo_memory_changed)
+        self.on_undo_memory_changed(self.canvas.undo_stack.memory_used)
+
+        self.lbl_cache = QLabel()
+        self.statusBar().addPermanentWidget(self.lbl_cache)
+        self.cache_timer = QTimer(self)
+        self.cache_timer.timeout.connect(self.on_cache_stats)
+        self.cache_timer.start(1000)
+
+        self.lbl_zoom = QLabel("100%")
+        self.statusBar().addPermanentWidget(self.lbl_zoom)
+        self.canvas.zoom_changed.connect(lambda zoom: self.lbl_zoom.setText(f"{zoom:.0%}"))
+
         menu = self.menuBar()
         file_menu = menu.addMenu("&File")
 
@@ -39,8 +67,14 @@ class VectorEditorWindow(QMainWindow):
         exit_action.setStatusTip("Close app")
         exit_action.triggered.connect(self.close)
 
+        export_action = QAction("Export Image...", self)
+        export_action.setShortcut("Ctrl+E")
+        export_action.setStatusTip("Export image with custom resolution")
+        export_action.triggered.connect(self.on_export_clicked)
+
         file_menu.addAction(open_action)
         file_menu.addAction(save_action)
+        file_menu.addAction(export_action)
         file_menu.addAction(exit_action)
 
         tool = self.addToolBar("Main Toolbar")
@@ -74,12 +108,107 @@ class VectorEditorWindow(QMainWindow):
         edit_menu.addAction(redo_action)
         edit_menu.addAction(delete_action)
 
+        select_where_action = QAction("Select Where...", self)
+        select_where_action.setShortcut(QKeySequence("Ctrl+Shift+F"))
+        select_where_action.triggered.connect(self.on_select_where)
+        edit_menu.addAction(select_where_action)
+
+        select_same_menu = edit_menu.addMenu("Select Same")
+        for title, attribute in (("Color", "color"), ("Type", "type"), ("Width", "width")):
+            action = QAction(title, self)
+            action.triggered.connect(lambda checked=False, a=attribute: self.on_select_same(a))
+            select_same_menu.addAction(action)
+
+        tolerance_action = QAction("Freehand Tolerance...", self)
+        tolerance_action.setStatusTip("Насколько упрощённый штрих может отходить от пути мыши")
+        tolerance_action.triggered.connect(self.on_freehand_tolerance)
+        edit_menu.addAction(tolerance_action)
+
+        view_menu = self.menuBar().addMenu("&View")
+        for title, shortcut, slot in (("Zoom In", QKeySequence.ZoomIn, lambda: self.canvas.zoom_by(1.25)),
+                                      ("Zoom Out", QKeySequence.ZoomOut, lambda: self.canvas.zoom_by(0.8)),
+                                      ("Actual Size", QKeySequence("Ctrl+0"), self.canvas.reset_zoom),
+                                      ("Fit All", QKeySequence("Ctrl+1"), self.canvas.fit_all)):
+            action = QAction(title, self)
+            action.setShortcut(shortcut)
+            action.triggered.connect(slot)
+            view_menu.addAction(action)
+        cache_action = QAction("Item Cache", self)
+        cache_action.setCheckable(True)
+        cache_action.setChecked(self.canvas.scene.cache_policy.enabled)
+        cache_action.toggled.connect(self.canvas.set_item_cache)
+        view_menu.addAction(cache_action)
+
+        self.virtual_action = QAction("Virtualized Documents", self)
+        self.virtual_action.setCheckable(True)
+        self.virtual_action.setStatusTip("Открывать проекты виртуально: на сцене только видимые фигуры")
+        view_menu.addAction(self.virtual_action)
+
+        hud_action = QAction("Performance HUD", self)
+        hud_action.setCheckable(True)
+        hud_action.setShortcut(QKeySequence("F12"))
+        hud_action.toggled.connect(self.canvas.set_hud_visible)
+        view_menu.addAction(hud_action)
+
+        metrics_action = QAction("Metrics Endpoint", self)
+        metrics_action.setCheckable(True)
+        metrics_action.setStatusTip(f"JSON-метрики на http://127.0.0.1:{MetricsServer.DEFAULT_PORT}/metrics")
+        metrics_action.toggled.connect(self.on_metrics_endpoint_toggled)
+        view_menu.addAction(metrics_action)
+        view_menu.addSeparator()
+
+        index_menu = view_menu.addMenu("Spatial Index")
+        index_group = QActionGroup(self)
+
+        for title, backend in (("Qt BSP", "qt"), ("Grid", "grid"), ("R-tree", "rtree")):
+            action = QAction(title, self)
+            action.setCheckable(True)
+            action.setChecked(backend == self.canvas.spatial_index.backend)
+            action.triggered.connect(lambda checked, b=backend: self.canvas.set_spatial_index(b))
+            index_group.addAction(action)
+            index_menu.addAction(action)
+
+        snap_menu = view_menu.addMenu("Snapping")
+        for title, option, shortcut in (("Snap to Grid", "grid", "Ctrl+'"),
+                                        ("Snap to Objects", "objects", None),
+                                        ("Alignment Guides", "guides", None)):
+            action = QAction(title, self)
+            action.setCheckable(True)
+            action.setChecked(getattr(self.canvas.snapper, option))
+            if shortcut:
+                action.setShortcut(QKeySequence(shortcut))
+            action.toggled.connect(lambda checked, o=option: self.canvas.set_snapping(o, checked))
+            snap_menu.addAction(action)
+
+        arrange_menu = self.menuBar().addMenu("&Arrange")
+        for title, mode in (("Align Left", "left"), ("Align Center", "hcenter"), ("Align Right", "right"),
+                            ("Align Top", "top"), ("Align Middle", "vcenter"), ("Align Bottom", "bottom")):
+            action = QAction(title, self)
+            action.triggered.connect(lambda checked=False, m=mode: self.canvas.align_selection(m))
+            arrange_menu.addAction(action)
+
+        arrange_menu.addSeparator()
+        for title, axis in (("Distribute Horizontally", "horizontal"), ("Distribute Vertically", "vertical")):
+            action = QAction(title, self)
+            action.triggered.connect(lambda checked=False, a=axis: self.canvas.distribute_selection(a))
+            arrange_menu.addAction(action)
+
+        arrange_menu.addSeparator()
+        for title, angle, shortcut in (("Rotate 90° CW", 90, "Ctrl+]"), ("Rotate 90° CCW", -90, "Ctrl+[")):
+            action = QAction(title, self)
+            action.setShortcut(QKeySequence(shortcut))
+            action.triggered.connect(lambda checked=False, a=angle: self.canvas.rotate_selection(a))
+            arrange_menu.addAction(action)
+
     def closeEvent(self, event: QCloseEvent):
         print("Попытка закрыть окно")
 
         request = QMessageBox.question(self, "Attention", "Вы хотите выйти из приложения?", QMessageBox.Yes | QMessageBox.No)
 
         if request == QMessageBox.Yes:
+            if self.saver is not None:
+                self.saver.wait()
+            self.journal.close(remove=not self.journal.has_unsaved_changes())
             print("Окно закрыто")
             event.accept()
         else:
@@ -103,11 +232,13 @@ class VectorEditorWindow(QMainWindow):
         self.btn_line = QPushButton("Line")
         self.btn_rect = QPushButton("Rect")
         self.btn_ellipse = QPushButton("Ellipse")
+        self.btn_freehand = QPushButton("Freehand")
 
         self.btn_select.setCheckable(True)
         self.btn_line.setCheckable(True)
         self.btn_rect.setCheckable(True)
         self.btn_ellipse.setCheckable(True)
+        self.btn_freehand.setCheckable(True)
 
         self.btn_select.setChecked(True)
 
@@ -115,53 +246,66 @@ class VectorEditorWindow(QMainWindow):
         tools_layout.addWidget(self.btn_line)
         tools_layout.addWidget(self.btn_rect)
         tools_layout.addWidget(self.btn_ellipse)
+        tools_layout.addWidget(self.btn_freehand)
         tools_layout.addStretch()
 
         self.btn_select.clicked.connect(lambda: self.on_change_tool("select"))
         self.btn_line.clicked.connect(lambda: self.on_change_tool("line"))
         self.btn_rect.clicked.connect(lambda: self.on_change_tool("rect"))
         self.btn_ellipse.clicked.connect(lambda: self.on_change_tool("ellipse"))
+        self.btn_freehand.clicked.connect(lambda: self.on_change_tool("freehand"))
 
         self.current_tool = "select"
 
         self.canvas = EditorCanvas()
-        self.canvas.scene.changed.connect(lambda: self.props_panel.on_selection_changed())
 
         main_layout.addWidget(tools_panel)
         main_layout.addWidget(self.canvas)
         
-        self.props_panel = PropertiesPanel(self.canvas.scene, self.canvas.undo_stack)
+        self.props_panel = PropertiesPanel(self.canvas.scene, self.canvas.undo_stack, self.canvas)
         main_layout.addWidget(self.props_panel)
 
+    def on_metrics_endpoint_toggled(self, checked):
+        if not checked:
+            self.metrics_server.stop()
+            metrics.set_consumer("server", False)
+            return
+
+        if not self.metrics_server.start():
+            QMessageBox.warning(self, "Metrics", f"Не удалось открыть порт: {self.metrics_server.errorString()}")
+            self.sender().setChecked(False)
+            return
+
+        metrics.set_consumer("server", True)
+        url = f"http://127.0.0.1:{self.metrics_server.serverPort()}/metrics"
+        self.statusBar().showMessage(f"Метрики: {url}", 5000)
+
+    def on_cache_stats(self):
+        policy = self.canvas.scene.cache_policy
+        self.lbl_cache.setText(
+            f"Кэш: {policy.cached_count} эл., {policy.memory / (1024 * 1024):.1f} МБ, "
+            f"попаданий {policy.hit_rate:.0%}")
+
+    def on_undo_memory_changed(self, used):
+        stack = self.canvas.undo_stack
+        self.lbl_undo_memory.setText(
+            f"История отмены: шагов {stack.count()}, {used / (1024 * 1024):.1f} / "
+            f"{stack.memory_budget / (1024 * 1024):.0f} МБ")
+
     def on_change_tool(self, tool_name):
         self.current_tool = tool_name
         print(f"Инструмент: {tool_name}")
 
-        if tool_name == "line":
-            self.btn_select.setChecked(False)
-            self.btn_line.setChecked(True)
-            self.btn_rect.setChecked(False)
-            self.btn_ellipse.setChecked(False)
-        elif tool_name == "rect":
-            self.btn_select.setChecked(False)
-            self.btn_line.setChecked(False)
-            self.btn_rect.setChecked(True)
-            self.btn_ellipse.setChecked(False)
-        elif tool_name == "ellipse":
-            self.btn_select.setChecked(False)
-            self.btn_line.setChecked(False)
-            self.btn_rect.setChecked(False)
-            self.btn_ellipse.setChecked(True)
-        else:
-            self.btn_select.setChecked(True)
-            self.btn_line.setChecked(False)
-            self.btn_rect.setChecked(False)
-            self.btn_ellipse.setChecked(False)
+        buttons = {"line": self.btn_line, "rect": self.btn_rect, "ellipse": self.btn_ellipse,
+                   "freehand": self.btn_freehand}
+        for name, button in buttons.items():
+            button.setChecked(name == tool_name)
+        self.btn_select.setChecked(tool_name not in buttons)
 
         self.canvas.set_tool(tool_name)
     
     def on_save_clicked(self):
-        filters = "Vector Project (*.json);;PNG Image (*.png);;JPEG Image (*.jpg)"
+        filters = "Vector Project (*.json);;Vector Binary (*.vec);;PNG Image (*.png);;JPEG Image (*.jpg)"
         filename, selected_filter = QFileDialog.getSaveFileName(
             self, "Save File", "", filters
         )
@@ -175,46 +319,202 @@ class VectorEditorWindow(QMainWindow):
             strategy = ImageSaveStrategy("PNG", background="transparent")
         elif filename.lower().endswith(".jpg"):
             strategy = ImageSaveStrategy("JPG", background="white")
+        elif filename.lower().endswith(".vec"):
+            strategy = BinarySaveStrategy()
         else:
             strategy = JsonSaveStrategy()
 
+        self._start_save(strategy, filename)
+
+    def on_select_where(self):
+        dialog = SelectWhereDialog(self)
+        if not dialog.exec():
+            return
+
+        count = self.canvas.select_where(**dialog.filters())
+        self.statusBar().showMessage(f"Выделено: {count}", 5000)
+
+    def on_select_same(self, attribute):
+        if not self.canvas.selected_top_items():
+            self.statusBar().showMessage("Сначала выделите образец", 5000)
+            return
+
+        count = self.canvas.select_same(attribute)
+        self.statusBar().showMessage(f"Выделено: {count}", 5000)
+
+    def on_freehand_tolerance(self):
+        tool = self.canvas.tools["freehand"]
+        tolerance, ok = QInputDialog.getDouble(
+            self, "Freehand", "Допуск упрощения, пикселей экрана:", tool.tolerance, 0.1, 20.0, 1
+        )
+
+        if ok:
+            tool.tolerance = tolerance
+
+    def on_export_clicked(self):
+        filters = "PNG Image (*.png);;JPEG Image (*.jpg);;SVG Image (*.svg)"
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Export Image", "", filters
+        )
+
+        if not filename:
+            return
+
+        # SVG векторный - масштаб не нужен
+        if filename.lower().endswith(".svg"):
+            self._start_save(SvgSaveStrategy(), filename)
+            return
+
+        scale, ok = QInputDialog.getDouble(
+            self, "Экспорт", "Масштаб (1.0 = 96 DPI):", 1.0, 0.1, 50.0, 2
+        )
+
+        if not ok:
+            return
+
+        if filename.lower().endswith(".jpg"):
+            strategy = ImageSaveStrategy("JPG", background="white", scale=scale)
+        else:
+            strategy = ImageSaveStrategy("PNG", background="transparent", scale=scale)
+
+        self._start_save(strategy, filename)
+
+    def _start_save(self, strategy, filename):
+        if self.saver is not None and self.saver.is_running():
+            self.statusBar().showMessage("Предыдущее сохранение ещё не завершено")
+            return
+
+        is_project = isinstance(strategy, (JsonSaveStrategy, BinarySaveStrategy))
+        journal_seq = self.journal.seq
+
+        self.saver = BackgroundSaver(strategy, filename, parent=self)
+        self.saver.progress.connect(lambda text: self.statusBar().showMessage(f"Сохранение: {text}"))
+        self.saver.finished.connect(lambda filename: self._on_save_finished(filename, is_project, journal_seq))
+        self.saver.failed.connect(self._on_save_failed)
+
         try:
-            strategy.save(filename, self.canvas.scene)
-            self.statusBar().showMessage(f"Успешно сохранено в {filename}")
+            self.saver.start(self.canvas.scene)
         except Exception as e:
+            self._release_saver()
             QMessageBox.critical(self, "Error", f"Не удалось сохранить файл:\n{str(e)}")
 
+    def _release_saver(self):
+        # Сохраняльщик - дочерний объект окна: без deleteLater() он жил бы до закрытия
+        self.saver.deleteLater()
+        self.saver = None
+
+    def _on_save_finished(self, filename, is_project, journal_seq):
+        self._release_saver()
+        if is_project:
+            self.project_path = filename
+            self.journal.mark_saved(journal_seq, filename)
+
+        self.statusBar().showMessage(f"Успешно сохранено в {filename}")
+
+    def _on_save_failed(self, message):
+        self._release_saver()
+        self.statusBar().showMessage("Ошибка сохранения")
+        QMessageBox.critical(self, "Error", f"Не удалось сохранить файл:\n{message}")
+
     def on_open_clicked(self):
         path, _ = QFileDialog.getOpenFileName(
-            self, "Открыть проект", "", "Vector Project (*.json *.vec)"
+            self, "Открыть проект", "",
+            "Supported Files (*.json *.vec *.svg);;Vector Project (*.json *.vec);;SVG Image (*.svg)"
         )
 
         if not path:
             return
         
-        data = FileManager.load_project(path)
+        if self.loader is not None:
+            self.loader.cancel()
+
+        self.journal.close(remove=not self.journal.has_unsaved_changes())
 
         self.canvas.scene.clear()
         self.canvas.undo_stack.clear()
+        if self.virtual_action.isChecked():
+            self.canvas.open_virtual_document()
 
-        scene_info = data.get("scene", {})
-        width = scene_info.get("width", 800)
-        height = scene_info.get("height", 600)
-        self.canvas.scene.setSceneRect(0, 0, width, height)
+        self.loader = ProjectLoader(self.canvas.scene, path, parent=self)
 
-        shapes_data = data.get("shapes", [])
+        self.load_progress = QProgressDialog("Загрузка проекта...", "Отмена", 0, 100, self)
+        self.load_progress.setWindowModality(Qt.WindowModal)
+        self.load_progress.setMinimumDuration(500)
+        self.load_progress.canceled.connect(self.loader.cancel)
 
-        errors_count = 0
+        self.loader.progress.connect(self.load_progress.setValue)
+        self.loader.finished.connect(lambda errors_count: self._on_load_finished(path, errors_count))
+        self.loader.failed.connect(self._on_load_failed)
+        self.loader.cancelled.connect(self._on_load_cancelled)
 
-        for shape in shapes_data:
-            try:
-                shape_obj = ShapeFactory.from_dict(shape)
-                self.canvas.scene.addItem(shape_obj)
-            except Exception as e:
-                print(f"Ошибка загрузки фигуры: {e}")
-                errors_count += 1
+        self.statusBar().showMessage(f"Загрузка: {path}")
+        self.loader.start()
+
+    def _close_loader(self):
+        self.load_progress.canceled.disconnect()
+        self.load_progress.reset()
+        self.loader.deleteLater()
+        self.loader = None
+
+    def _on_load_finished(self, path, errors_count):
+        self._close_loader()
+        # SVG - импорт: сохранять поверх исходной картинки нельзя, проект без имени
+        imported = path.lower().endswith(".svg")
+        title = "Импортировано" if imported else "Проект загружен"
 
         if errors_count > 0:
             self.statusBar().showMessage(f"Загружено с ошибками ({errors_count} фигур пропущено)")
         else:
-            self.statusBar().showMessage(f"Проект загруже: {path}")
\ No newline at end of file
+            document = self.canvas.scene.document
+            if document is not None:
+                self.statusBar().showMessage(
+                    f"{title}: {path} (на сцене {len(document.live)}, вне сцены {document.dormant_count})")
+            else:
+                self.statusBar().showMessage(f"{title}: {path}")
+
+        if imported:
+            # Основы на диске нет - журнал начинается со снимка импортированной сцены
+            self.project_path = None
+            self.journal.start(journal_path_for(None), JsonSaveStrategy().snapshot(self.canvas.scene))
+        else:
+            self.project_path = path
+            self._start_journal(path)
+
+    def _on_load_failed(self, message):
+        self._close_loader()
+        self.project_path = None
+        self.journal.start(journal_path_for(None))
+        self.statusBar().showMessage("Ошибка загрузки")
+        QMessageBox.critical(self, "Error", f"Не удалось открыть файл:\n{message}")
+
+    def _on_load_cancelled(self):
+        self._close_loader()
+        self.project_path = None
+        self.journal.start(journal_path_for(None))
+        self.statusBar().showMessage("Загрузка отменена")
+
+    def _start_journal(self, project_path):
+        # Если в журнале остались несохранённые изменения (программа упала),
+        # предлагаем применить их поверх открытого документа
+        path = journal_path_for(project_path)
+        recovered = CommandJournal.read(path)
+
+        if recovered is not None:
+            request = QMessageBox.question(self, "Восстановление",
+                                           "Найдены несохранённые изменения. Восстановить их?",
+                                           QMessageBox.Yes | QMessageBox.No)
+
+            if request == QMessageBox.Yes:
+                snapshot, records = recovered
+                errors_count = CommandJournal.replay(self.canvas.scene, snapshot, records)
+                self.canvas.undo_stack.clear()
+
+                self.journal.start(path, JsonSaveStrategy().snapshot(self.canvas.scene))
+
+                if errors_count > 0:
+                    self.statusBar().showMessage(f"Восстановлено с ошибками ({errors_count} записей пропущено)")
+                else:
+                    self.statusBar().showMessage("Несохранённые изменения восстановлены")
+                return
+
+        self.journal.start(path)
@@ -0,0 +1,125 @@
+import math
+from PySide6.QtCore import QSize
+from PySide6.QtWidgets import QGraphicsItem
+
+class CachePolicy:
+    # Автоматический кэш отрисовки для дорогих элементов верхнего уровня.
+    # Стоимость - число элементов путей (paint_cost()); элемент дороже порога
+    # рисуется в ItemCoordinateCache размером под текущий масштаб вида, и
+    # перемещение стоит одного вывода картинки. Кэш пересоздаётся, когда масштаб
+    # ушёл от того, под который он строился, больше чем в REZOOM_RATIO раз,
+    # и снимается, если картинка вышла бы больше MAX_SIDE пикселей.
+    # Изменённые элементы пересматриваются не на каждое изменение, а в flush()
+    # (сцена вызывает его перед отрисовкой кадра): правка тысячи детей группы
+    # стоит одного пересчёта её границ.
+    COST_THRESHOLD = 2000
+    MAX_SIDE = 4096
+    REZOOM_RATIO = 1.5
+
+    def __init__(self):
+        self.enabled = True
+        self.zoom = 1.0
+
+        # renders - перерисовки кэша (промахи), hits - кадры, где элемент взят из кэша
+        self.renders = 0
+        self.hits = 0
+
+        self._cached = {}
+        self._candidates = set()
+        self._pending = set()
+        self._renders_seen = 0
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        for item in list(self._candidates):
+            self.evaluate(item)
+
+    def set_zoom(self, zoom: float):
+        self.zoom = zoom
+        for item in list(self._candidates):
+            self.evaluate(item)
+
+    def evaluate(self, item):
+        cost = item.paint_cost() if hasattr(item, "paint_cost") else 0
+        if cost < self.COST_THRESHOLD:
+            self._candidates.discard(item)
+            self._drop(item)
+            return
+
+        self._candidates.add(item)
+        rect = item.boundingRect()
+        size = self._cache_size(item, rect)
+
+        if not self.enabled or size is None:
+            self._drop(item)
+            return
+
+        # Кэш строится заново и при смене границ (правка фигуры, детей группы):
+        # картинка старого размера растянулась бы, а memory врал бы
+        built_zoom, _, built_rect = self._cached.get(item, (None, None, None))
+        if built_zoom is None or built_rect != rect \
+                or max(built_zoom, self.zoom) / min(built_zoom, self.zoom) > self.REZOOM_RATIO:
+            item.setCacheMode(QGraphicsItem.CacheMode.ItemCoordinateCache, size)
+            self._cached[item] = (self.zoom, size, rect)
+            if hasattr(item, "set_cached"):
+                item.set_cached(True)
+            else:
+                self.renders += 1
+
+    def item_changed(self, item):
+        # Фигура в кэше после изменения будет перерисована; группы считают это сами в paint()
+        if item in self._cached and not hasattr(item, "set_cached"):
+            self.renders += 1
+        self._pending.add(item)
+
+    def flush(self):
+        pending, self._pending = self._pending, set()
+        for item in pending:
+            self.evaluate(item)
+
+    def remove(self, item):
+        self._pending.discard(item)
+        self._candidates.discard(item)
+        self._drop(item)
+
+    def clear(self):
+        self._pending.clear()
+        self._candidates.clear()
+        self._cached.clear()
+
+    def count_frame(self, visible_rect):
+        cached = sum(1 for item in self._cached if item.sceneBoundingRect().intersects(visible_rect))
+        rendered = self.renders - self._renders_seen
+        self._renders_seen = self.renders
+        self.hits += max(0, cached - rendered)
+
+    @property
+    def cached_count(self) -> int:
+        return len(self._cached)
+
+    @property
+    def memory(self) -> int:
+        return sum(size.width() * size.height() * 4 for _, size, _ in self._cached.values())
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.renders
+        return self.hits / total if total else 0.0
+
+    def _cache_size(self, item, rect):
+        if rect.isEmpty():
+            return None
+
+        factor = self.zoom * item.scale()
+        width, height = math.ceil(rect.width() * factor), math.ceil(rect.height() * factor)
+        if max(width, height) > self.MAX_SIDE:
+            return None
+        return QSize(max(1, width), max(1, height))
+
+    def _drop(self, item):
+        if self._cached.pop(item, None) is None:
+            return
+
+        item.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+        if hasattr(item, "set_cached"):
+            item.set_cached(False)
@@ -0,0 +1,408 @@
+import math
+from array import array
+from contextlib import contextmanager
+from itertools import compress, count, islice, repeat
+import shiboken6
+from PySide6.QtCore import QRectF
+from src.logic.metrics import metrics
+from src.logic.shape_logic.styles import style_table
+
+# Колоночная модель фигур: по таблице на тип фигуры, в таблице - массивы по
+# столбцам. Фильтр ("красные прямоугольники шире 10") - проход по столбцу за
+# условие через map/compress, без вызова Qt и без байткода Python на строку.
+# Перемещение фигур верхнего уровня и перекраска (move, recolor - их вызывают
+# команды отмены) сначала меняют столбцы, а элементы сцены - представление -
+# получают только итог и строки не пересобирают. Остальные правки (геометрия,
+# поворот, масштаб) идут через элементы: модель перечитывает изменённые
+# деревья при ближайшем запросе. NumPy не входит в зависимости редактора,
+# поэтому столбцы - массивы array, как в формате .vec.
+KINDS = ("line", "rect", "ellipse", "polyline", "group")
+NO_STYLE = -1
+NO_PARENT = -1
+
+# parent - uid группы-родителя; x, y - pos элемента; style - номер в
+# style_table; w, h - размер геометрии с учётом масштаба; left..bottom -
+# габариты на сцене вместе с пером
+COLUMNS = (
+    ("parent", 'q'), ("x", 'd'), ("y", 'd'), ("style", 'i'), ("w", 'd'), ("h", 'd'),
+    ("left", 'd'), ("top", 'd'), ("right", 'd'), ("bottom", 'd'),
+)
+PARENT = 0
+STYLE = 3
+
+
+class ColumnTable:
+    # Строки фигур одного типа. Удаление переносит последнюю строку на место
+    # удалённой, поэтому номера строк не стабильны - их хранит DocumentColumns
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.items = []
+        self.columns = {name: array(code) for name, code in COLUMNS}
+        self._arrays = [self.columns[name] for name, _ in COLUMNS]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, name: str) -> array:
+        return self.columns[name]
+
+    def extend(self, items, rows) -> int:
+        # rows - кортежи значений в порядке COLUMNS; возвращает номер первой строки
+        start = len(self.items)
+        for column, values in zip(self._arrays, zip(*rows)):
+            column.extend(values)
+        self.items.extend(items)
+        return start
+
+    def remove(self, row: int):
+        # Возвращает элемент, переехавший в строку row, или None
+        last = len(self.items) - 1
+        moved = None
+        if row != last:
+            for column in self._arrays:
+                column[row] = column[last]
+            moved = self.items[row] = self.items[last]
+        for column in self._arrays:
+            column.pop()
+        self.items.pop()
+        return moved
+
+    def clear(self):
+        self.items.clear()
+        for column in self._arrays:
+            del column[:]
+
+
+class DocumentColumns:
+    # Как и SceneIndex, обновляется лениво: сцена помечает изменённые фигуры
+    # верхнего уровня, строки их деревьев пересобираются при ближайшем запросе
+    def __init__(self, scene):
+        self.scene = scene
+        self.tables = {kind: ColumnTable(kind) for kind in KINDS}
+
+        self._dirty = set()
+        self._rows = {}
+        self._trees = {}
+        # Вторичные индексы: номер стиля -> фигуры, uid группы -> её дети
+        # (NO_PARENT - фигуры верхнего уровня). Индекс по типу - сами таблицы
+        self._by_style = {}
+        self._by_parent = {}
+        # Элементы сцены сейчас получают изменения из столбцов (см. _view_update)
+        self._applying = False
+
+    def __len__(self):
+        self.flush()
+        return len(self._rows)
+
+    def mark_dirty(self, item):
+        if self._applying:
+            return
+        while getattr(item, "_index_parent", None) is not None:
+            item = item._index_parent
+        self._dirty.add(item)
+
+    def remove(self, item):
+        self._dirty.discard(item)
+        self._drop_tree(item)
+
+    def reset(self):
+        self._dirty.clear()
+        self._rows.clear()
+        self._trees.clear()
+        self._by_style.clear()
+        self._by_parent.clear()
+        for table in self.tables.values():
+            table.clear()
+
+    def flush(self):
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        with metrics.timed("columns.flush"):
+            # Сначала убираем старые строки, потом читаем деревья и дописываем
+            # новые строки в таблицы разом, по столбцу за вызов
+            for item in dirty:
+                self._drop_tree(item)
+
+            pending = {kind: ([], [], []) for kind in KINDS}
+            for item in dirty:
+                if shiboken6.isValid(item) and getattr(item, "_index_scene", None) is self.scene \
+                        and getattr(item, "_index_parent", None) is None and hasattr(item, "type_name"):
+                    tree = self._trees[item] = []
+                    self._collect(item, NO_PARENT, 1.0, item, tree, pending)
+
+            for kind, (items, rows, owners) in pending.items():
+                if items:
+                    table = self.tables[kind]
+                    start = table.extend(items, rows)
+                    self._rows.update(zip(items, zip(repeat(table), count(start), owners)))
+                    for item, row in zip(items, rows):
+                        self._by_parent.setdefault(row[PARENT], set()).add(item)
+                        if row[STYLE] != NO_STYLE:
+                            self._by_style.setdefault(row[STYLE], set()).add(item)
+
+    def where(self, kind=None, color=None, width=None, min_w=None, min_h=None,
+              max_w=None, max_h=None, area: QRectF = None) -> list:
+        # Фигуры всех уровней (и дети групп), подходящие под все заданные условия.
+        # color и width к группам не относятся - с ними группы не попадают в результат
+        self.flush()
+        candidates = None
+        if color is not None or width is not None:
+            # По индексу стилей: дальше проверяются только фигуры с подходящим пером
+            candidates = {table: [] for table in self.tables.values()}
+            for item in self._styled(style_table.matching(color, width)):
+                table, row, _ = self._rows[item]
+                candidates[table].append(row)
+
+        result = []
+        for table in self.tables.values():
+            if kind is not None and table.kind != kind:
+                continue
+            rows = range(len(table)) if candidates is None else candidates[table]
+            rows = self._filter(table, rows, min_w, min_h, max_w, max_h, area)
+            items = table.items
+            result.extend(items[row] for row in rows)
+        return result
+
+    def similar(self, items, attribute: str) -> set:
+        # Фигуры верхнего уровня того же типа ("type"), цвета ("color") или
+        # толщины ("width"), что и items. Цвет и толщина берутся у всех фигур
+        # деревьев items, найденные дети групп заменяются группой
+        self.flush()
+        if attribute == "type":
+            kinds = {item.type_name for item in items}
+            return {item for item in self._by_parent.get(NO_PARENT, ()) if item.type_name in kinds}
+
+        return {self._rows[item][2] for item in self._styled(self.similar_styles(items, attribute))}
+
+    def similar_styles(self, items, attribute: str) -> set:
+        # Номера стилей того же цвета ("color") или толщины ("width"), что у фигур деревьев items
+        samples = [style_table[style_id] for style_id in self.styles_of(items)]
+        if attribute == "color":
+            return set().union(*(style_table.matching(color=style.color) for style in samples))
+        if attribute == "width":
+            return set().union(*(style_table.matching(width=style.width) for style in samples))
+        raise ValueError(f"Unknown attribute: {attribute}")
+
+    def styles_of(self, items) -> set:
+        # Номера стилей всех фигур деревьев items (фигур верхнего уровня)
+        self.flush()
+        result = set()
+        for top in items:
+            for node in self._trees.get(top, ()):
+                entry = self._rows.get(node)
+                if entry is not None:
+                    table, row, _ = entry
+                    result.add(table["style"][row])
+        result.discard(NO_STYLE)
+        return result
+
+    def styled(self, styles) -> list:
+        # Фигуры (и дети групп) с этими номерами стилей
+        self.flush()
+        return list(self._styled(styles))
+
+    def move(self, items, coords):
+        # Фигуры верхнего уровня в позиции coords [x0, y0, x1, y1, ...]: сдвиг
+        # габаритов строк их деревьев считается в столбцах
+        self.flush()
+        shifts = {}
+        moved, other = [], []
+        for item, x, y in zip(items, islice(coords, 0, None, 2), islice(coords, 1, None, 2)):
+            entry = self._rows.get(item)
+            if entry is None or entry[2] is not item:
+                other.append((item, x, y))
+                continue
+
+            table, row, _ = entry
+            dx, dy = x - table["x"][row], y - table["y"][row]
+            table["x"][row], table["y"][row] = x, y
+            moved.append((item, x, y))
+            if dx or dy:
+                for node in self._trees[item]:
+                    node_table, node_row, _ = self._rows[node]
+                    rows, xs, ys = shifts.setdefault(node_table, ([], [], []))
+                    rows.append(node_row)
+                    xs.append(dx)
+                    ys.append(dy)
+
+        for table, (rows, xs, ys) in shifts.items():
+            for name, deltas in (("left", xs), ("right", xs), ("top", ys), ("bottom", ys)):
+                column = table[name]
+                for row, delta in zip(rows, deltas):
+                    column[row] += delta
+
+        with self._view_update():
+            for item, x, y in moved:
+                item.setPos(x, y)
+        # Элементы без строк (не верхнего уровня, вне сцены) - обычным путём
+        for item, x, y in other:
+            item.setPos(x, y)
+
+    def recolor(self, items, colors):
+        # Новый цвет фигур (не групп): colors - один цвет или по цвету на фигуру.
+        # Номер стиля меняется в столбце и индексе стилей через таблицу
+        # "старый стиль -> новый", элементы получают готовый стиль
+        self.flush()
+        if isinstance(colors, str):
+            colors = repeat(colors)
+        restyled, other = [], []
+        remap = {}
+        for item, color in zip(items, colors):
+            entry = self._rows.get(item)
+            old = item.style if entry is None else style_table[entry[0]["style"][entry[1]]]
+            style = remap.get((old.id, color))
+            if style is None:
+                style = remap[(old.id, color)] = style_table.intern(color, old.width)
+            if entry is None:
+                other.append((item, style))
+                continue
+
+            table, row, _ = entry
+            if style.id != old.id:
+                table["style"][row] = style.id
+                _discard(self._by_style, old.id, item)
+                self._by_style.setdefault(style.id, set()).add(item)
+            restyled.append((item, style))
+
+        with self._view_update():
+            for item, style in restyled:
+                item.set_style(style)
+        for item, style in other:
+            item.set_style(style)
+
+    def members(self, parent_uid: int = NO_PARENT) -> set:
+        # Дети группы с этим uid, по умолчанию - фигуры верхнего уровня
+        self.flush()
+        return set(self._by_parent.get(parent_uid, ()))
+
+    def bounds(self, items=None) -> QRectF:
+        # Габариты на сцене всех фигур верхнего уровня или заданных фигур
+        self.flush()
+        left = top = math.inf
+        right = bottom = -math.inf
+
+        if items is None:
+            for table in self.tables.values():
+                if len(table):
+                    # Дети лежат внутри габаритов группы, их можно не отделять
+                    left = min(left, min(table["left"]))
+                    top = min(top, min(table["top"]))
+                    right = max(right, max(table["right"]))
+                    bottom = max(bottom, max(table["bottom"]))
+        else:
+            for item in items:
+                entry = self._rows.get(item)
+                if entry is None:
+                    continue
+                table, row, _ = entry
+                left = min(left, table["left"][row])
+                top = min(top, table["top"][row])
+                right = max(right, table["right"][row])
+                bottom = max(bottom, table["bottom"][row])
+
+        if left > right:
+            return QRectF()
+        return QRectF(left, top, right - left, bottom - top)
+
+    @contextmanager
+    def _view_update(self):
+        # Уведомления сцены о переносе столбцов в элементы строки не пересобирают
+        self._applying = True
+        try:
+            with self.scene.batch_changes():
+                yield
+        finally:
+            self._applying = False
+
+    def _styled(self, styles):
+        for style_id in styles:
+            yield from self._by_style.get(style_id, ())
+
+    @staticmethod
+    def _filter(table, rows, min_w, min_h, max_w, max_h, area):
+        # Каждое условие - один проход по своему столбцу (map и compress идут в C),
+        # строки сужаются по очереди. Условие - метод границы: limit.__lt__(w) - это w > limit
+        conditions = [("w", min_w, "__lt__"), ("h", min_h, "__lt__"),
+                      ("w", max_w, "__ge__"), ("h", max_h, "__ge__")]
+        if area is not None:
+            conditions += [("left", area.right(), "__ge__"), ("right", area.left(), "__le__"),
+                           ("top", area.bottom(), "__ge__"), ("bottom", area.top(), "__le__")]
+
+        for name, limit, test in conditions:
+            if limit is None:
+                continue
+            values = map(table[name].__getitem__, rows)
+            rows = list(compress(rows, map(getattr(float(limit), test), values)))
+        return rows
+
+    def _collect(self, item, parent_uid: int, factor: float, top, tree: list, pending: dict):
+        kind = item.type_name
+        if kind not in pending:
+            return
+
+        # Фигура могла сменить дерево (группировка): старые строки убираем сразу,
+        # порядок обработки помеченных деревьев не важен
+        if item is not top:
+            self._drop_tree(item)
+        if item in self._rows:
+            self._remove_row(item)
+
+        rect = item.sceneBoundingRect()
+        pos = item.pos()
+        # Масштаб на сцене - произведение масштабов по цепочке групп. Это то же,
+        # что длина первой строки sceneTransform(): поворот её не меняет, а
+        # группировка переносит преобразование в pos/rotation/scale
+        # (transforms.fold_transform). Оставшийся transform() (зеркало,
+        # неравномерный масштаб) учитываем так же, по оси x
+        factor *= item.scale()
+        transform = item.transform()
+        if not transform.isIdentity():
+            factor *= math.hypot(transform.m11(), transform.m12())
+
+        if kind == "group":
+            style = NO_STYLE
+            w, h = rect.width(), rect.height()
+        else:
+            geometry = item.extent() if kind == "polyline" else item.get_geometry()
+            style = item.style.id
+            if kind == "line":
+                w, h = geometry[2] - geometry[0], geometry[3] - geometry[1]
+            else:
+                w, h = geometry[2], geometry[3]
+            w, h = abs(w) * factor, abs(h) * factor
+
+        items, rows, owners = pending[kind]
+        items.append(item)
+        rows.append((parent_uid, pos.x(), pos.y(), style, w, h, rect.left(), rect.top(), rect.right(), rect.bottom()))
+        owners.append(top)
+        tree.append(item)
+
+        if kind == "group":
+            for child in item.childItems():
+                if hasattr(child, "type_name"):
+                    self._collect(child, item.uid, factor, top, tree, pending)
+
+    def _drop_tree(self, top):
+        # Строки, которые успело забрать другое дерево, остаются ему
+        for node in self._trees.pop(top, ()):
+            entry = self._rows.get(node)
+            if entry is not None and entry[2] is top:
+                self._remove_row(node)
+
+    def _remove_row(self, item):
+        table, row, _ = self._rows.pop(item)
+        _discard(self._by_parent, table["parent"][row], item)
+        _discard(self._by_style, table["style"][row], item)
+        moved = table.remove(row)
+        if moved is not None:
+            self._rows[moved] = (table, row, self._rows[moved][2])
+
+
+def _discard(index: dict, key, item):
+    members = index.get(key)
+    if members is not None:
+        members.discard(item)
+        if not members:
+            del index[key]
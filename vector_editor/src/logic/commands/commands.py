@@ -1,10 +1,26 @@
-from PySide6.QtGui import QUndoCommand
+from PySide6.QtGui import QColor, QUndoCommand
+from array import array
+from contextlib import nullcontext
+import json
+import zlib
+from src.logic import transforms
+from src.logic.commands.history import (COMMAND_BYTES, REF_BYTES, DetachedItem,
+                                        array_bytes, pinned_bytes, subtree_uids)
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.styles import style_table
+
+# journal_records(undo) описывает результат redo()/undo() в виде записей для журнала
+# (см. src/logic/journal.py). Записи хранят итоговое состояние, а не разницу,
+# поэтому их можно повторно применить к сцене после сбоя.
+# memory_size() - оценка памяти, которую держит команда (см. src/logic/commands/history.py).
 
 class AddShapeCommand(QUndoCommand):
     def __init__(self, scene, item):
         super().__init__()
         self.scene = scene
         self.item = item
+        # Выполнена ли команда: фигуру вне сцены держит та команда, что её убрала
+        self.done = False
         
         name = "Shape"
         if hasattr(item, "type_name"):
@@ -14,27 +30,21 @@ class AddShapeCommand(QUndoCommand):
     def redo(self):
         if self.item.scene() != self.scene:
             self.scene.addItem(self.item)
+        self.done = True
 
     def undo(self):
         self.scene.removeItem(self.item)
+        self.done = False
 
-class ChangeColorCommand(QUndoCommand):
-    def __init__(self, item, color):
-        super().__init__()
-        self.item = item
-        self.new_color = color
-
-        self.old_color = item.pen().color().name()
+    def journal_records(self, undo=False):
+        if undo:
+            return [{"op": "remove", "id": self.item.uid}]
+        return [{"op": "add", "shape": self.item.to_dict()}]
 
-        self.setText(f"Changed color to {color}")
-
-    def redo(self):
-        if hasattr(self.item, "set_active_color"):
-            self.item.set_active_color(self.new_color)
-    
-    def undo(self):
-        if hasattr(self.item, "set_active_color"):
-            self.item.set_active_color(self.old_color)
+    def memory_size(self):
+        # Оценка зависит только от состояния самой команды: стек пересчитывает её,
+        # когда команду выполняют или отменяют (src/logic/journal.py)
+        return COMMAND_BYTES + (REF_BYTES if self.done else pinned_bytes(self.item))
 
 class MoveCommand(QUndoCommand):
     def __init__(self, item, start_pos, end_pos):
@@ -50,19 +60,200 @@ class MoveCommand(QUndoCommand):
     def undo(self):
         self.item.setPos(self.start)
 
+    def journal_records(self, undo=False):
+        pos = self.start if undo else self.end
+        return [{"op": "move", "id": self.item.uid, "pos": [pos.x(), pos.y()]}]
+
+    def memory_size(self):
+        return COMMAND_BYTES
+
+
+class BatchMoveCommand(QUndoCommand):
+    # Перемещение всего выделения одной командой: начальные и конечные
+    # координаты упакованы в массивы [x0, y0, x1, y1, ...]
+    def __init__(self, scene, items, starts, ends):
+        super().__init__()
+        self.scene = scene
+        self.items = list(items)
+        self.uids = array('Q', (item.uid for item in self.items))
+        self.starts = array('d')
+        self.ends = array('d')
+
+        for start, end in zip(starts, ends):
+            self.starts.extend((start.x(), start.y()))
+            self.ends.extend((end.x(), end.y()))
+
+        self.setText(f"Move {len(self.items)} items")
+
+    def redo(self):
+        self._apply(self.ends)
+
+    def undo(self):
+        self._apply(self.starts)
+
+    def _apply(self, coords):
+        _move(self.scene, self.items, coords)
+
+    def journal_records(self, undo=False):
+        coords = self.starts if undo else self.ends
+        return [{"op": "move", "ids": self.uids.tolist(), "positions": coords.tolist()}]
+
+    def memory_size(self):
+        return COMMAND_BYTES + REF_BYTES * len(self.items) + array_bytes(self.uids, self.starts, self.ends)
+
+
+class TransformCommand(QUndoCommand):
+    # Перемещение, поворот и масштаб выделения: состояние до и после хранится
+    # плоскими массивами (см. src/logic/transforms.py). Команды с одинаковым
+    # merge_key над тем же выделением (шаги спинбоксов X/Y) сливаются
+    ID = 1003
+
+    def __init__(self, scene, items, before, after, text: str, merge_key: str = None):
+        super().__init__()
+        self.scene = scene
+        self.items = list(items)
+        self.uids = array('Q', (item.uid for item in self.items))
+        self.before = before
+        self.after = after
+        self.merge_key = merge_key
+        self.translation = _same_rotation_scale(before, after)
+
+        self.setText(text)
+
+    def id(self):
+        return self.ID
+
+    def mergeWith(self, other):
+        if other.id() != self.id() or self.merge_key is None \
+                or other.merge_key != self.merge_key or other.uids != self.uids:
+            return False
+
+        self.after = other.after
+        self.translation = _same_rotation_scale(self.before, self.after)
+        self.setObsolete(self.after == self.before)
+        return True
+
+    def redo(self):
+        self._apply(self.after)
+
+    def undo(self):
+        self._apply(self.before)
+
+    def _apply(self, state):
+        # Сдвиг без поворота и масштаба - через колоночную модель (columns.move)
+        if self.translation:
+            _move(self.scene, self.items, _positions(state))
+            return
+        with _batch_changes(self.scene):
+            transforms.apply(self.items, state)
+
+    def journal_records(self, undo=False):
+        state = self.before if undo else self.after
+        return [{"op": "transform", "ids": self.uids.tolist(), "state": state.tolist()}]
+
+    def memory_size(self):
+        return COMMAND_BYTES + REF_BYTES * len(self.items) + array_bytes(self.uids, self.before, self.after)
+
+
+def _batch_changes(scene):
+    if hasattr(scene, "batch_changes"):
+        return scene.batch_changes()
+    return nullcontext()
+
+
+def _move(scene, items, coords):
+    # coords - [x0, y0, x1, y1, ...]. На сцене с колоночной моделью позиции
+    # сначала меняются в её столбцах, элементы получают итог
+    columns = getattr(scene, "columns", None)
+    if columns is not None:
+        columns.move(items, coords)
+        return
+    for i, item in enumerate(items):
+        item.setPos(coords[2 * i], coords[2 * i + 1])
+
+
+def _recolor(scene, items, colors):
+    # colors - один цвет или по цвету на фигуру
+    columns = getattr(scene, "columns", None)
+    if columns is not None:
+        columns.recolor(items, colors)
+        return
+    if isinstance(colors, str):
+        colors = [colors] * len(items)
+    for item, color in zip(items, colors):
+        item.set_active_color(color)
+
+
+def _same_rotation_scale(before, after) -> bool:
+    stride = transforms.STRIDE
+    return before[2::stride] == after[2::stride] and before[3::stride] == after[3::stride]
+
+
+def _positions(state) -> array:
+    stride = transforms.STRIDE
+    coords = array('d', bytes(8 * 2 * (len(state) // stride)))
+    coords[0::2] = state[0::stride]
+    coords[1::2] = state[1::stride]
+    return coords
+
 
 class DeleteCommand(QUndoCommand):
+    # Удалённая фигура держится командой целиком. Когда команда уходит вглубь
+    # истории, стек сжимает фигуру в запись to_dict() (compact), а отмена
+    # пересоздаёт её из записи и сообщает об этом через on_restore
     def __init__(self, scene, item):
         super().__init__()
         self.scene = scene
         self.item = item
+        self.uid = item.uid
+        self.record = None
+        self.on_restore = None
+        self.done = False
         self.setText(f"Delete {item.type_name}")
     
     def redo(self):
         self.scene.removeItem(self.item)
+        self.done = True
 
     def undo(self):
+        if self.record is not None:
+            self._restore()
         self.scene.addItem(self.item)
+        self.done = False
+
+    def can_compact(self) -> bool:
+        return self.record is None and pinned_bytes(self.item) > REF_BYTES
+
+    def compact(self) -> dict:
+        # Возвращает заглушки для ссылок на удалённые фигуры в других командах
+        data = json.dumps(self.item.to_dict(), separators=(",", ":")).encode("utf-8")
+        self.record = zlib.compress(data)
+
+        placeholders = {uid: DetachedItem(uid) for uid in subtree_uids(self.item)}
+        self.item = placeholders[self.uid]
+        return placeholders
+
+    def _restore(self):
+        self.item = ShapeFactory.from_dict(self._shape())
+        self.record = None
+
+        if self.on_restore is not None:
+            self.on_restore(self, self.item)
+
+    def _shape(self) -> dict:
+        if self.record is not None:
+            return json.loads(zlib.decompress(self.record))
+        return self.item.to_dict()
+
+    def journal_records(self, undo=False):
+        if undo:
+            return [{"op": "add", "shape": self._shape()}]
+        return [{"op": "remove", "id": self.uid}]
+
+    def memory_size(self):
+        if self.record is not None:
+            return COMMAND_BYTES + len(self.record)
+        return COMMAND_BYTES + (pinned_bytes(self.item) if self.done else REF_BYTES)
 
 class ChangeColorCommand(QUndoCommand):
     def __init__(self, item, new_color):
@@ -71,7 +262,7 @@ class ChangeColorCommand(QUndoCommand):
         self.new_color = new_color
 
         if hasattr(item, "pen"):
-            self.old_color = item.pen().color().name()
+            self.old_color = item.style.color
         else:
             self.old_color = "000000"
 
@@ -85,6 +276,13 @@ class ChangeColorCommand(QUndoCommand):
         if hasattr(self.item, "set_active_color"):
             self.item.set_active_color(self.old_color)
 
+    def journal_records(self, undo=False):
+        color = self.old_color if undo else self.new_color
+        return [{"op": "color", "id": self.item.uid, "color": color}]
+
+    def memory_size(self):
+        return COMMAND_BYTES
+
 class ChangeWidthCommand(QUndoCommand):
     def __init__(self, item, new_width):
         super().__init__()
@@ -92,7 +290,7 @@ class ChangeWidthCommand(QUndoCommand):
         self.new_width = new_width
 
         if hasattr(item, "pen"):
-            self.old_width = item.pen().width()
+            self.old_width = item.style.width
         else:
             self.old_width = 1
 
@@ -104,4 +302,148 @@ class ChangeWidthCommand(QUndoCommand):
 
     def undo(self):
         if hasattr(self.item, "set_stroke_width"):
-            self.item.set_stroke_width(self.old_width)
\ No newline at end of file
+            self.item.set_stroke_width(self.old_width)
+
+    def journal_records(self, undo=False):
+        width = self.old_width if undo else self.new_width
+        return [{"op": "width", "id": self.item.uid, "width": width}]
+
+    def memory_size(self):
+        return COMMAND_BYTES
+
+
+def _pen_items(items):
+    # Группы раскрываем до фигур: у группы нет своего пера, и отменять
+    # изменение нужно к исходным значениям каждой фигуры
+    result = []
+    for item in items:
+        if hasattr(item, "pen"):
+            result.append(item)
+        else:
+            result.extend(_pen_items(item.childItems()))
+    return result
+
+
+class BulkChangeWidthCommand(QUndoCommand):
+    # Одна команда на всё выделение: прежние значения хранятся массивом.
+    # Сливаются только шаги одного редактирования спинбокса (общий merge_key)
+    ID = 1001
+
+    def __init__(self, scene, items, new_width, merge_key: str = None):
+        super().__init__()
+        self.scene = scene
+        self.items = sorted(_pen_items(items), key=lambda item: item.uid)
+        self.uids = array('Q', (item.uid for item in self.items))
+        self.old_widths = array('H', (item.style.width for item in self.items))
+        self.new_width = new_width
+        self.merge_key = merge_key
+
+        self.setText(f"Change Width to {new_width}")
+
+    def id(self):
+        return self.ID
+
+    def mergeWith(self, other):
+        if other.id() != self.id() or self.merge_key is None \
+                or other.merge_key != self.merge_key or other.uids != self.uids:
+            return False
+
+        self.new_width = other.new_width
+        self.setText(f"Change Width to {self.new_width}")
+        self.setObsolete(all(width == self.new_width for width in self.old_widths))
+        return True
+
+    def redo(self):
+        with _batch_changes(self.scene):
+            for item in self.items:
+                item.set_stroke_width(self.new_width)
+
+    def undo(self):
+        with _batch_changes(self.scene):
+            for item, width in zip(self.items, self.old_widths):
+                item.set_stroke_width(width)
+
+    def journal_records(self, undo=False):
+        if undo:
+            return [{"op": "width", "ids": self.uids.tolist(), "widths": self.old_widths.tolist()}]
+        return [{"op": "width", "ids": self.uids.tolist(), "width": self.new_width}]
+
+    def memory_size(self):
+        return COMMAND_BYTES + REF_BYTES * len(self.items) + array_bytes(self.uids, self.old_widths)
+
+
+class BulkChangeColorCommand(QUndoCommand):
+    # Сливаются только команды одного интерактивного выбора цвета (живой
+    # предпросмотр диалога): у них общий merge_key. Отдельные смены цвета
+    # остаются отдельными шагами истории
+    ID = 1002
+
+    def __init__(self, scene, items, new_color, merge_key: str = None):
+        super().__init__()
+        self.scene = scene
+        self.items = sorted(_pen_items(items), key=lambda item: item.uid)
+        self.uids = array('Q', (item.uid for item in self.items))
+        # Цвета как 0xRRGGBB
+        self.old_colors = array('I', (item.style.rgb for item in self.items))
+        self.new_color = new_color
+        self.merge_key = merge_key
+
+        self.setText(f"Change Color to {new_color}")
+
+    def id(self):
+        return self.ID
+
+    def mergeWith(self, other):
+        if other.id() != self.id() or self.merge_key is None \
+                or other.merge_key != self.merge_key or other.uids != self.uids:
+            return False
+
+        self.new_color = other.new_color
+        self.setText(f"Change Color to {self.new_color}")
+        rgb = QColor(self.new_color).rgb() & 0xFFFFFF
+        self.setObsolete(all(color == rgb for color in self.old_colors))
+        return True
+
+    def redo(self):
+        _recolor(self.scene, self.items, self.new_color)
+
+    def undo(self):
+        _recolor(self.scene, self.items, [f"#{color:06x}" for color in self.old_colors])
+
+    def journal_records(self, undo=False):
+        if undo:
+            return [{"op": "color", "ids": self.uids.tolist(),
+                     "colors": [f"#{color:06x}" for color in self.old_colors]}]
+        return [{"op": "color", "ids": self.uids.tolist(), "color": self.new_color}]
+
+    def memory_size(self):
+        return COMMAND_BYTES + REF_BYTES * len(self.items) + array_bytes(self.uids, self.old_colors)
+
+
+class RestyleCommand(QUndoCommand):
+    # Правка записи таблицы стилей: новые цвет и толщина у всех фигур этого
+    # стиля. Команда хранит стиль и два значения, сколько бы фигур его ни
+    # использовали; элементы сцены догоняют правку при отрисовке (sync_styles)
+    def __init__(self, scene, style, new_color, new_width):
+        super().__init__()
+        self.scene = scene
+        self.style = style
+        self.old = (style.color, style.width)
+        self.new = (QColor(new_color).name(), new_width)
+
+        self.setText(f"Restyle to {self.new[0]}, {new_width}")
+
+    def redo(self):
+        style_table.restyle(self.style, *self.new)
+        self.scene.update()
+
+    def undo(self):
+        style_table.restyle(self.style, *self.old)
+        self.scene.update()
+
+    def journal_records(self, undo=False):
+        before, after = (self.new, self.old) if undo else (self.old, self.new)
+        return [{"op": "restyle", "from": list(before), "to": list(after)}]
+
+    def memory_size(self):
+        return COMMAND_BYTES
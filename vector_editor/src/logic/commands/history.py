@@ -0,0 +1,82 @@
+from src.logic.spatial_index import top_level
+
+# Грубая оценка памяти, которую держит история отмены. Точный размер объектов Qt
+# из Python не узнать, поэтому считаем по порядку величины: команда - объект
+# QUndoCommand с обёрткой, фигура - QGraphicsPathItem с обёрткой, перо и геометрия
+COMMAND_BYTES = 300
+ITEM_BYTES = 1200
+REF_BYTES = 8
+
+
+class DetachedItem:
+    # Заглушка в старых командах вместо удалённой фигуры, которую сжали в запись:
+    # при отмене удаления фигура пересоздаётся и заглушка заменяется на неё
+    __slots__ = ("uid",)
+
+    def __init__(self, uid):
+        self.uid = uid
+
+
+def node_count(item) -> int:
+    return 1 + sum(node_count(child) for child in item.childItems() if hasattr(child, "uid"))
+
+
+def pinned_bytes(item) -> int:
+    # Фигура на сцене принадлежит сцене, команда держит её только вне сцены
+    if item is None or isinstance(item, DetachedItem):
+        return 0
+    if getattr(top_level(item), "_index_scene", None) is not None:
+        return REF_BYTES
+    return ITEM_BYTES * node_count(item)
+
+
+def array_bytes(*arrays) -> int:
+    return sum(len(values) * values.itemsize for values in arrays)
+
+
+def command_size(command) -> int:
+    if hasattr(command, "memory_size"):
+        return command.memory_size()
+
+    # Макрос: сам объект и дочерние команды
+    return COMMAND_BYTES + sum(command_size(command.child(i)) for i in range(command.childCount()))
+
+
+def walk(command):
+    yield command
+    if not hasattr(command, "journal_records"):
+        for i in range(command.childCount()):
+            yield from walk(command.child(i))
+
+
+def subtree_uids(item) -> list:
+    uids = [item.uid]
+    for child in item.childItems():
+        if hasattr(child, "uid"):
+            uids.extend(subtree_uids(child))
+    return uids
+
+
+def remap_items(commands, mapping: dict):
+    # Подменяет ссылки item/items в командах по uid
+    for command in commands:
+        item = getattr(command, "item", None)
+        if item is not None and getattr(item, "uid", None) in mapping:
+            command.item = mapping[item.uid]
+
+        items = getattr(command, "items", None)
+        if items and any(getattr(item, "uid", None) in mapping for item in items):
+            command.items = [mapping.get(getattr(item, "uid", None), item) for item in items]
+
+
+def referenced_uids(commands) -> set:
+    # uid фигур верхнего уровня, на которые ссылаются команды (item/items)
+    uids = set()
+    for command in commands:
+        for node in walk(command):
+            item = getattr(node, "item", None)
+            if item is not None:
+                uids.add(top_level(item).uid)
+            for item in getattr(node, "items", None) or ():
+                uids.add(top_level(item).uid)
+    return uids
@@ -1,14 +1,62 @@
 import json
 import os
+import tempfile
+from contextlib import contextmanager
 
 class FileManager:
     @staticmethod
     def save_project(filename: str, data: dict):
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
+            with FileManager.atomic_open(filename, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
         except OSError as e:
             raise IOError(f"Не удалось сохранить: {e}")
+
+    @staticmethod
+    @contextmanager
+    def atomic_open(filename: str, mode: str = 'w', encoding=None):
+        # Пишем во временный файл рядом с целевым и подменяем его только после fsync,
+        # чтобы сбой посреди записи не испортил существующий проект
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+
+        try:
+            with os.fdopen(fd, mode, encoding=encoding) as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+
+            FileManager.replace(tmp_path, filename)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def replace(tmp_path: str, filename: str):
+        # Подмена файла уже записанным и сброшенным на диск tmp_path (рядом с целевым)
+        if os.path.exists(filename):
+            os.chmod(tmp_path, os.stat(filename).st_mode & 0o777)
+        else:
+            os.chmod(tmp_path, 0o644)
+
+        os.replace(tmp_path, filename)
+        # Само переименование надёжно только после fsync каталога
+        FileManager._fsync_directory(os.path.dirname(os.path.abspath(filename)))
+
+    @staticmethod
+    def _fsync_directory(directory: str):
+        # Каталог открывается на чтение только в POSIX. Файл уже на месте,
+        # поэтому отказ ФС (EINVAL на некоторых сетевых) не ошибка сохранения
+        if os.name != "posix":
+            return
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
         
     @staticmethod
     def load_project(filename: str) -> dict:
@@ -21,4 +69,100 @@ class FileManager:
         except json.JSONDecodeError:
             raise ValueError("Файл повреждён или имеет неверный формат")
         except OSError as e:
-            raise IOError(f"Ошибка чтения файла: {e}")
\ No newline at end of file
+            raise IOError(f"Ошибка чтения файла: {e}")
+
+    @staticmethod
+    def iter_project(filename: str, chunk_size: int = 1 << 16):
+        # Разбирает проект по частям: элементы "shapes" отдаются по одному,
+        # остальные ключи верхнего уровня - целиком. Третий элемент - сколько байт прочитано.
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"Файл не найден: {filename}")
+
+        decoder = json.JSONDecoder()
+
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                reader = _ChunkReader(f, decoder, chunk_size)
+
+                reader.expect("{")
+                if reader.peek() == "}":
+                    return
+
+                while True:
+                    key = reader.value()
+                    reader.expect(":")
+
+                    if key == "shapes":
+                        reader.expect("[")
+                        if reader.peek() == "]":
+                            reader.expect("]")
+                        else:
+                            while True:
+                                yield "shape", reader.value(), reader.bytes_read
+                                if reader.expect(",]") == "]":
+                                    break
+                    else:
+                        yield key, reader.value(), reader.bytes_read
+
+                    if reader.expect(",}") == "}":
+                        return
+        except json.JSONDecodeError:
+            raise ValueError("Файл повреждён или имеет неверный формат")
+        except OSError as e:
+            raise IOError(f"Ошибка чтения файла: {e}")
+
+
+class _ChunkReader:
+    def __init__(self, file, decoder, chunk_size):
+        self.file = file
+        self.decoder = decoder
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.bytes_read += len(chunk.encode('utf-8'))
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_ws(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def peek(self):
+        self._skip_ws()
+        if self.pos >= len(self.buffer):
+            raise json.JSONDecodeError("Unexpected end of file", self.buffer, self.pos)
+        return self.buffer[self.pos]
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise json.JSONDecodeError(f"Expected one of '{chars}'", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        self._skip_ws()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Число на границе буфера могло быть обрезано - дочитываем
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
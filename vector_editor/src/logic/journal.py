@@ -0,0 +1,555 @@
+import json
+import os
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, QStandardPaths, Signal
+from PySide6.QtGui import QUndoStack
+from src.logic import transforms
+from src.logic.commands.history import command_size, remap_items, walk
+from src.logic.metrics import metrics
+from src.logic.io import FileManager
+from src.logic.saver import BackgroundSaver
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.shape_logic.shapes import claim_uid
+from src.logic.shape_logic.styles import style_table
+
+# Журнал - текстовый файл, по одной JSON-записи на строку:
+#   {"op": "snapshot", "seq": N, "data": {...}} - полный снимок проекта (после сжатия)
+#   {"op": "add" | "remove" | "move" | "transform" | "color" | "width" | "restyle" | "group" | "ungroup", "seq": N, ...}
+#   color/width пишутся и для нескольких фигур сразу: "ids" и общее значение
+#   или список значений ("colors"/"widths"); move - "ids" и "positions" [x0, y0, x1, y1, ...];
+#   transform - "ids" и "state" [x, y, rotation, scale, ...];
+#   restyle - правка стиля "from" [цвет, толщина] на "to" у всех его фигур
+#   {"op": "saved", "seq": N}                   - проект сохранён в состоянии после записи N
+# Номера seq растут монотонно и не сбрасываются при сжатии.
+
+def journal_path_for(project_path):
+    if project_path:
+        return project_path + ".journal"
+
+    directory = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+    if not directory:
+        directory = os.path.expanduser("~")
+    return os.path.join(directory, "untitled.journal")
+
+
+class JournaledUndoStack(QUndoStack):
+    # Команды, добавленные через push(), пишутся в журнал сразу; undo/redo из
+    # QAction идут мимо Python, поэтому их отслеживаем по indexChanged.
+    #
+    # История ограничена оценкой памяти (memory_budget), а не числом шагов:
+    # при превышении удалённые фигуры в командах старше keep_live шагов сжимаются
+    # в записи. Из непустого QUndoStack старые команды не удалить, поэтому число
+    # шагов всё равно ограничено step_limit, но сжатый шаг занимает сотни байт
+    memory_changed = Signal(int)
+
+    def __init__(self, parent=None, memory_budget: int = 64 * 1024 * 1024,
+                 keep_live: int = 10, step_limit: int = 1000):
+        super().__init__(parent)
+        self.journal = None
+
+        self.memory_budget = memory_budget
+        self.keep_live = keep_live
+        self.memory_used = 0
+        self.setUndoLimit(step_limit)
+
+        # Оценка памяти каждой команды по её номеру в стеке и их сумма. Оценка
+        # пересчитывается, только когда команда добавлена, слита, выполнена,
+        # отменена или сжата, а не для всей истории на каждый push
+        self._sizes = []
+        self._total = 0
+        # Команды до этого номера уже просмотрены при сжатии
+        self._compact_from = 0
+
+        self._last_index = 0
+        self._in_python_call = False
+
+        self.indexChanged.connect(self._on_index_changed)
+
+    def push(self, command):
+        with metrics.timed("undo.push"):
+            if self.journal is not None and hasattr(command, "journal_records"):
+                # Записи берём до push: при слиянии (mergeWith) команда будет удалена
+                self.journal.record(command.journal_records())
+
+            self._call(super().push, command)
+
+    def beginMacro(self, text):
+        self._call(super().beginMacro, text)
+
+    def endMacro(self):
+        self._call(super().endMacro)
+
+    def clear(self):
+        self._call(super().clear)
+
+    def record_change(self, records):
+        # Изменения, которые пока не оформлены командами (группировка и т.п.)
+        if self.journal is not None:
+            self.journal.record(records)
+
+    def _call(self, method, *args):
+        index = self.index()
+        self._in_python_call = True
+        try:
+            method(*args)
+        finally:
+            self._in_python_call = False
+            self._last_index = self.index()
+            self._track_call(method, args, index)
+            self._update_memory()
+
+    def _track_call(self, method, args, index):
+        # push() отбрасывает отменённые команды после index и добавляет новую
+        # или сливает её с верхней; begin/endMacro держат открытый макрос на
+        # месте index. Если при этом превышен undoLimit, Qt удаляет самую старую
+        self._drop(index)
+
+        count = self.count()
+        if method.__name__ == "push":
+            added = count > 0 and self.command(count - 1) is args[0]
+        else:
+            added = method.__name__ != "clear"
+        if added and count == len(self._sizes) and count > 0:
+            self._total -= self._sizes.pop(0)
+            self._compact_from = max(0, self._compact_from - 1)
+
+        start = max(0, min(len(self._sizes), count) - 1)
+        self._drop(start)
+        self._append(start, count)
+
+        if len(self._sizes) != count:
+            # Устаревшие (setObsolete) команды Qt удаляет сам - пересчитываем всё
+            self._drop(0)
+            self._append(0, count)
+
+    def _drop(self, start: int):
+        self._total -= sum(self._sizes[start:])
+        del self._sizes[start:]
+
+    def _append(self, start: int, end: int):
+        sizes = [command_size(self.command(i)) for i in range(start, end)]
+        self._sizes.extend(sizes)
+        self._total += sum(sizes)
+
+    def _on_index_changed(self, index):
+        if self._in_python_call:
+            return
+
+        if self.journal is not None:
+            if index < self._last_index:
+                for i in range(self._last_index - 1, index - 1, -1):
+                    self.journal.record(self._command_records(self.command(i), undo=True))
+            else:
+                for i in range(self._last_index, index):
+                    self.journal.record(self._command_records(self.command(i), undo=False))
+
+        # Выполненные и отменённые команды держат разное: фигура на сцене или у команды
+        first, last = min(self._last_index, index), max(self._last_index, index)
+        if len(self._sizes) == self.count():
+            for i in range(first, last):
+                size = command_size(self.command(i))
+                self._total += size - self._sizes[i]
+                self._sizes[i] = size
+        else:
+            self._drop(0)
+            self._append(0, self.count())
+
+        self._compact_from = min(self._compact_from, index)
+        self._last_index = index
+        self._update_memory()
+
+    def _update_memory(self):
+        total = self._total
+
+        # Сжимаем начиная с самых старых выполненных команд
+        for i in range(self._compact_from, max(0, self.index() - self.keep_live)):
+            if total <= self.memory_budget:
+                break
+
+            for command in walk(self.command(i)):
+                if hasattr(command, "compact") and command.can_compact():
+                    self._compact(command)
+
+            size = command_size(self.command(i))
+            total += size - self._sizes[i]
+            self._sizes[i] = size
+            self._compact_from = i + 1
+
+        self._total = total
+        if total != self.memory_used:
+            self.memory_used = total
+            self.memory_changed.emit(total)
+
+    def _compact(self, command):
+        placeholders = command.compact()
+        command.on_restore = self._on_restore
+        remap_items(self._commands(exclude=command), placeholders)
+
+    def _on_restore(self, command, item):
+        remap_items(self._commands(exclude=command), CommandJournal.tree_index(item))
+
+    def _commands(self, exclude=None):
+        for i in range(self.count()):
+            for command in walk(self.command(i)):
+                if command is not exclude:
+                    yield command
+
+    def _command_records(self, command, undo):
+        if command is None:
+            return []
+
+        if hasattr(command, "journal_records"):
+            return command.journal_records(undo)
+
+        # Макрос: записи дочерних команд, при отмене - в обратном порядке
+        children = [command.child(i) for i in range(command.childCount())]
+        if undo:
+            children.reverse()
+
+        records = []
+        for child in children:
+            records.extend(self._command_records(child, undo))
+        return records
+
+
+class _CompactStrategy:
+    # Сжатие журнала через BackgroundSaver: в UI-потоке - только снимок сцены,
+    # json.dumps и запись с fsync - в потоке сохранения
+    def __init__(self, seq: int, saved_seq=None):
+        self.seq = seq
+        self.saved_seq = saved_seq
+
+    def snapshot(self, scene):
+        from src.logic.strategies import JsonSaveStrategy
+
+        records = [{"op": "snapshot", "seq": self.seq, "data": JsonSaveStrategy().snapshot(scene)}]
+        if self.saved_seq is not None:
+            records.append({"op": "saved", "seq": self.saved_seq})
+        return records
+
+    def write(self, filename, records, progress=None):
+        with open(filename, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class CommandJournal(QObject):
+    def __init__(self, scene, compact_every: int = 1000, sync_interval_ms: int = 2000, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.compact_every = compact_every
+
+        self.path = None
+        self._file = None
+        self._seq = 0
+        self._saved_seq = 0
+        self._since_compact = 0
+        self._compact_pending = False
+        self._dirty = False
+        # Сжатие в фоне: сохранялка, её временный файл и строки, записанные
+        # в журнал после снимка, - они дописываются к сжатому файлу
+        self._saver = None
+        self._compact_path = None
+        self._tail = None
+
+        self._sync_timer = QTimer(self)
+        self._sync_timer.setInterval(sync_interval_ms)
+        self._sync_timer.timeout.connect(self.sync)
+        self._sync_timer.start()
+
+    def start(self, path: str, snapshot: dict = None):
+        # Новый журнал для документа: без снимка основой служит файл проекта,
+        # со снимком (после восстановления) - сам снимок
+        self.close()
+
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._seq = 1 if snapshot is not None else 0
+        self._saved_seq = 0
+        self._rewrite([{"op": "snapshot", "seq": self._seq, "data": snapshot}] if snapshot is not None else [])
+
+    def record(self, records):
+        if self._file is None or not records:
+            return
+
+        for record in records:
+            self._seq += 1
+            record["seq"] = self._seq
+            self._write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        self._file.flush()
+        self._dirty = True
+        self._since_compact += len(records)
+
+        if self._since_compact >= self.compact_every and not self._compact_pending:
+            # Команда записывается до выполнения, поэтому снимок делаем на следующем такте
+            self._compact_pending = True
+            QTimer.singleShot(0, self.compact)
+
+    def compact(self):
+        # Заменяем накопленные записи одним снимком; номера записей не сбрасываются.
+        # Снимок делается сейчас, файл пишется в фоне (_on_compacted подменяет журнал)
+        self._compact_pending = False
+        if self._file is None or self._saver is not None:
+            return
+
+        saved_seq = None if self.has_unsaved_changes() else self._saved_seq
+        self._compact_path = f"{self.path}.{self._seq}.compact"
+        self._tail = []
+        self._since_compact = 0
+
+        saver = BackgroundSaver(_CompactStrategy(self._seq, saved_seq), self._compact_path, parent=self)
+        saver.finished.connect(lambda filename: self._on_compacted(saver, filename))
+        saver.failed.connect(lambda message: self._on_compact_failed(saver, message))
+        self._saver = saver
+        saver.start(self.scene)
+
+    def wait_compaction(self):
+        # Дождаться фонового сжатия и подменить журнал (тесты, выход)
+        if self._saver is not None:
+            self._saver.wait()
+            QCoreApplication.sendPostedEvents()
+
+    def _on_compacted(self, saver, filename):
+        if saver is not self._saver:
+            return
+        tail = self._tail
+        self._finish_compaction()
+
+        with open(filename, 'a', encoding='utf-8') as f:
+            f.writelines(tail)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._file.close()
+        FileManager.replace(filename, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._dirty = False
+
+    def _on_compact_failed(self, saver, message):
+        if saver is not self._saver:
+            return
+        path = self._compact_path
+        self._finish_compaction()
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"Не удалось сжать журнал: {message}")
+
+    def _finish_compaction(self):
+        # Связи с лямбдами держат журнал - разрываем их вместе со сохранялкой
+        saver, self._saver = self._saver, None
+        saver.finished.disconnect()
+        saver.failed.disconnect()
+        saver.deleteLater()
+        self._compact_path = None
+        self._tail = None
+
+    def _drop_compaction(self):
+        # Журнал закрывается или переезжает: незаконченное сжатие не нужно,
+        # несжатый журнал остаётся верным
+        if self._saver is None:
+            return
+        path = self._compact_path
+        self._saver.wait()
+        self._finish_compaction()
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _write(self, line: str):
+        self._file.write(line)
+        if self._tail is not None:
+            self._tail.append(line)
+
+    def mark_saved(self, seq: int, project_path: str):
+        # Проект сохранён в состоянии после записи seq. Если путь сменился,
+        # журнал переезжает к новому файлу и уносит только более поздние записи
+        if self._file is None:
+            return
+
+        new_path = journal_path_for(project_path)
+
+        if new_path != self.path:
+            self._drop_compaction()
+            self._file.close()
+            self._file = None
+
+            records = [{"op": "saved", "seq": seq}]
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if record.get("op") != "saved" and record.get("seq", 0) > seq:
+                        records.append(record)
+
+            os.remove(self.path)
+            self.path = new_path
+            self._rewrite(records)
+        else:
+            self._write(json.dumps({"op": "saved", "seq": seq}) + "\n")
+            self._file.flush()
+            self._dirty = True
+
+        self._saved_seq = seq
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def has_unsaved_changes(self) -> bool:
+        return self._seq != self._saved_seq
+
+    def sync(self):
+        if self._file is not None and self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def close(self, remove: bool = False):
+        self._drop_compaction()
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+        if remove and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _rewrite(self, records):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        with FileManager.atomic_open(self.path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        self._since_compact = 0
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def read(path: str):
+        # Возвращает (снимок или None, записи после снимка) для несохранённой работы,
+        # или None, если восстанавливать нечего
+        if not os.path.exists(path):
+            return None
+
+        snapshot = None
+        records = []
+        saved_seq = 0
+        last_seq = 0
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Последняя строка могла не дописаться при сбое
+                    break
+
+                op = record.get("op")
+                if op == "saved":
+                    saved_seq = record["seq"]
+                    last_seq = max(last_seq, saved_seq)
+                    continue
+
+                last_seq = record.get("seq", last_seq)
+                if op == "snapshot":
+                    snapshot = record["data"]
+                    records = []
+                else:
+                    records.append(record)
+
+        if last_seq == saved_seq:
+            return None
+        return snapshot, records
+
+    @staticmethod
+    def replay(scene, snapshot, records) -> int:
+        if snapshot is not None:
+            scene.clear()
+            styles = style_table.read(snapshot.get("styles", []))
+            for shape in snapshot.get("shapes", []):
+                scene.addItem(ShapeFactory.from_dict(shape, styles))
+        elif getattr(scene, "document", None) is not None:
+            # Записи журнала ссылаются на фигуры по uid - они должны быть на сцене
+            scene.document.materialize_all()
+
+        index = {}
+        for item in scene.items():
+            if hasattr(item, "uid"):
+                index[item.uid] = item
+
+        errors_count = 0
+        for record in records:
+            try:
+                CommandJournal._apply(scene, index, record)
+            except Exception as e:
+                print(f"Ошибка восстановления записи журнала: {e}")
+                errors_count += 1
+
+        return errors_count
+
+    @staticmethod
+    def _apply(scene, index, record):
+        op = record["op"]
+
+        if op == "add":
+            item = ShapeFactory.from_dict(record["shape"])
+            scene.addItem(item)
+            index.update(CommandJournal.tree_index(item))
+        elif op == "remove":
+            scene.removeItem(index.pop(record["id"]))
+        elif op == "move":
+            if "ids" in record:
+                positions = record["positions"]
+                for i, uid in enumerate(record["ids"]):
+                    index[uid].setPos(positions[2 * i], positions[2 * i + 1])
+            else:
+                index[record["id"]].setPos(*record["pos"])
+        elif op == "color":
+            for uid, color in CommandJournal._values(record, "color"):
+                index[uid].set_active_color(color)
+        elif op == "width":
+            for uid, width in CommandJournal._values(record, "width"):
+                index[uid].set_stroke_width(width)
+        elif op == "restyle":
+            style_table.restyle(style_table.intern(*record["from"]), *record["to"])
+        elif op == "transform":
+            items = [index[uid] for uid in record["ids"]]
+            transforms.apply(items, record["state"])
+        elif op == "group":
+            group = Group()
+            group.uid = claim_uid(record["id"])
+            scene.addItem(group)
+            for uid in record["children"]:
+                group.addToGroup(index[uid])
+            index[group.uid] = group
+        elif op == "ungroup":
+            scene.destroyItemGroup(index.pop(record["id"]))
+        else:
+            raise ValueError(f"Unknown journal record: {op}")
+
+    @staticmethod
+    def _values(record, key):
+        # Запись про одну фигуру ("id") или про выделение целиком ("ids"):
+        # одно значение на всех или список значений ("widths"/"colors")
+        if "ids" not in record:
+            return [(record["id"], record[key])]
+        if key in record:
+            return [(uid, record[key]) for uid in record["ids"]]
+        return zip(record["ids"], record[key + "s"])
+
+    @staticmethod
+    def tree_index(item, index=None) -> dict:
+        # uid -> фигура для элемента и всех вложенных
+        if index is None:
+            index = {}
+        index[item.uid] = item
+        for child in item.childItems():
+            if hasattr(child, "uid"):
+                CommandJournal.tree_index(child, index)
+        return index
@@ -0,0 +1,202 @@
+import os
+import threading
+from collections import deque
+from PySide6.QtCore import QObject, QRectF, QThread, QTimer, Signal
+from src.logic.io import FileManager
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.styles import style_table
+from src.logic.svg_import import SvgImporter
+from src.logic.vec_format import VecFormat
+from src.logic.virtual_document import ShapeRecord
+
+class LoadWorker(QObject):
+    header = Signal(object)
+    batch = Signal(object)
+    progress = Signal(int)
+    finished = Signal(int)
+    failed = Signal(str)
+
+    def __init__(self, path: str, batch_size: int = 500, records: bool = False):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        # records - вместо фигур отдавать записи виртуального документа
+        self.records = records
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _iter_entries(self):
+        if self.path.lower().endswith(".vec"):
+            return VecFormat.iter_project(self.path, self.records)
+        if self.path.lower().endswith(".svg"):
+            return SvgImporter.iter_project(self.path, self.records)
+        return FileManager.iter_project(self.path)
+
+    def run(self):
+        errors_count = 0
+        items = []
+        styles = None
+        total = max(os.path.getsize(self.path), 1)
+        last_percent = -1
+
+        try:
+            for key, value, bytes_read in self._iter_entries():
+                if self._cancelled.is_set():
+                    return
+
+                if key == "scene":
+                    self.header.emit(value)
+                    continue
+                elif key == "styles":
+                    styles = style_table.read(value)
+                    continue
+                elif key in ("item", "record"):
+                    items.append(value)
+                elif key == "shape":
+                    try:
+                        items.append(ShapeRecord.from_dict(value, styles) if self.records
+                                     else ShapeFactory.from_dict(value, styles))
+                    except Exception as e:
+                        print(f"Ошибка загрузки фигуры: {e}")
+                        errors_count += 1
+                elif key == "error":
+                    print(f"Пропущен элемент: {value}")
+                    errors_count += 1
+                    continue
+                else:
+                    continue
+
+                if len(items) >= self.batch_size:
+                    self.batch.emit(items)
+                    items = []
+
+                percent = bytes_read * 100 // total
+                if percent != last_percent:
+                    last_percent = percent
+                    self.progress.emit(percent)
+
+            if items:
+                self.batch.emit(items)
+            self.finished.emit(errors_count)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class ProjectLoader(QObject):
+    progress = Signal(int)
+    finished = Signal(int)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, scene, path: str, chunk_size: int = 1000, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.path = path
+        self.chunk_size = chunk_size
+
+        self._pending = deque()
+        self._errors_count = None
+        self._is_cancelled = False
+        self._header_rect = None
+        self._bounds = QRectF()
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._insert_chunk)
+
+        # Если на сцене открыт виртуальный документ, грузим в него записи
+        self.document = getattr(scene, "document", None)
+
+        self._thread = QThread()
+        self._worker = LoadWorker(path, records=self.document is not None)
+        self._worker.moveToThread(self._thread)
+
+        self._thread.started.connect(self._worker.run)
+        self._worker.header.connect(self._on_header)
+        self._worker.batch.connect(self._on_batch)
+        self._worker.progress.connect(self.progress)
+        self._worker.finished.connect(self._on_worker_finished)
+        self._worker.failed.connect(self._on_worker_failed)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        if self._is_cancelled:
+            return
+
+        self._is_cancelled = True
+        self._worker.cancel()
+        self._timer.stop()
+        self._pending.clear()
+        self._stop_thread()
+
+        self.scene.clear()
+        self.cancelled.emit()
+
+    def _stop_thread(self):
+        self._thread.quit()
+        self._thread.wait()
+
+    def _on_header(self, scene_info):
+        # Начало области есть только в новых JSON; фигуры холста могут лежать и
+        # левее/выше него - после загрузки область расширяется до них (_fit_scene)
+        self._header_rect = QRectF(scene_info.get("x", 0), scene_info.get("y", 0),
+                                   scene_info.get("width", 800), scene_info.get("height", 600))
+        self.scene.setSceneRect(self._header_rect)
+
+    def _fit_scene(self):
+        # Границы загруженного копятся при вставке (_insert_chunk): content_rect()
+        # после загрузки пересобрал бы колоночное зеркало всей сцены разом
+        rect = self._bounds
+        if self.document is not None:
+            rect = rect.united(self.document.bounds)
+        if self._header_rect is not None:
+            rect = rect.united(self._header_rect)
+        if not rect.isEmpty():
+            self.scene.setSceneRect(rect)
+
+    def _on_batch(self, items):
+        if self._is_cancelled:
+            return
+
+        self._pending.extend(items)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _insert_chunk(self):
+        count = min(self.chunk_size, len(self._pending))
+        if self.document is not None:
+            self.document.add_records([self._pending.popleft() for _ in range(count)])
+        else:
+            bounds = self._bounds
+            for _ in range(count):
+                item = self._pending.popleft()
+                self.scene.addItem(item)
+                bounds = bounds.united(item.sceneBoundingRect())
+            self._bounds = bounds
+
+        if not self._pending:
+            self._timer.stop()
+            self._try_finish()
+
+    def _on_worker_finished(self, errors_count):
+        self._errors_count = errors_count
+        self._stop_thread()
+        self._try_finish()
+
+    def _on_worker_failed(self, message):
+        self._is_cancelled = True
+        self._timer.stop()
+        self._pending.clear()
+        self._stop_thread()
+
+        self.scene.clear()
+        self.failed.emit(message)
+
+    def _try_finish(self):
+        if self._errors_count is not None and not self._pending and not self._is_cancelled:
+            self._fit_scene()
+            self.finished.emit(self._errors_count)
@@ -0,0 +1,54 @@
+from PySide6.QtGui import QPen
+from PySide6.QtWidgets import QStyleOptionGraphicsItem
+
+# Уровни детализации: пороги - размер на экране в пикселях.
+# Отдельные фигуры рисует сам Qt (переопределённый в Python paint() у каждой
+# фигуры обходится дороже самой отрисовки), поэтому упрощения применяются там,
+# где рисуем мы: в группах, которые рисуют детей сами, и в обзорном растре вида
+CULL_PX = 0.5           # меньше - не рисуется совсем
+BOX_PX = 3.0            # меньше - залитый прямоугольник вместо контура
+GROUP_BITMAP_PX = 128   # группа меньше - рисуется из растровой копии детей,
+GROUP_BITMAP_LOD = 0.5  # но только в виде и при масштабе меньше этого
+
+# Обзорный растр всей сцены для сильного отдаления (см. EditorCanvas)
+OVERVIEW_SIDE = 2048
+OVERVIEW_MIN_ITEMS = 5000
+OVERVIEW_MAX_ZOOM = 0.25
+
+
+def level_of_detail(transform) -> float:
+    return QStyleOptionGraphicsItem.levelOfDetailFromTransform(transform)
+
+
+def screen_extent(rect, level: float) -> float:
+    return max(rect.width(), rect.height()) * level
+
+
+def draw_shapes(painter, shapes, to_target):
+    # shapes - пары (фигура, преобразование фигура -> группа),
+    # to_target - группа -> устройство рисования
+    for shape, transform in shapes:
+        world = transform * to_target
+        level = level_of_detail(world)
+        rect = shape.boundingRect()
+        extent = screen_extent(rect, level)
+
+        if extent < CULL_PX:
+            continue
+
+        painter.setTransform(world)
+        pen = shape.pen()
+
+        if extent < BOX_PX:
+            painter.fillRect(rect, pen.color())
+            continue
+
+        if pen.widthF() * level < 1.0:
+            # Тонкая линия: косметическое перо в пиксель вместо субпиксельной обводки
+            pen = QPen(pen)
+            pen.setCosmetic(True)
+            pen.setWidth(0)
+
+        painter.setPen(pen)
+        painter.setBrush(shape.brush())
+        painter.drawPath(shape.path())
@@ -0,0 +1,160 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from PySide6.QtCore import QObject
+from PySide6.QtNetwork import QHostAddress, QTcpServer
+
+# Границы корзин гистограмм в миллисекундах: 16.7 - кадр при 60 Гц
+BUCKETS_MS = (0.5, 1, 2, 4, 8, 16.7, 33, 66, 133)
+WINDOW = 240
+
+
+class RollingHistogram:
+    # Последние WINDOW замеров: перцентили и корзины считаются по окну,
+    # поэтому регрессия видна сразу, а не размывается средним за сессию
+    def __init__(self, window: int = WINDOW):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.total += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def buckets(self, edges=BUCKETS_MS) -> list:
+        counts = [0] * (len(edges) + 1)
+        for value in self.samples:
+            i = 0
+            while i < len(edges) and value > edges[i]:
+                i += 1
+            counts[i] += 1
+        return counts
+
+    def snapshot(self) -> dict:
+        samples = self.samples
+        return {
+            "count": self.total,
+            "last": samples[-1] if samples else 0.0,
+            "mean": sum(samples) / len(samples) if samples else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": max(samples) if samples else 0.0,
+            "buckets": self.buckets(),
+        }
+
+
+class Metrics:
+    # Счётчики горячих путей редактора: время кадра, обработчики инструментов,
+    # push в стек отмены, обновления пространственного индекса. Замеры дешёвые
+    # и пишутся всегда; дорогие (число фигур в кадре) - только при enabled,
+    # то есть пока открыт HUD или работает сервер метрик
+    def __init__(self):
+        self.enabled = False
+        self.started = time.monotonic()
+        self._histograms = {}
+        self._consumers = set()
+
+    def set_consumer(self, name: str, active: bool):
+        # HUD и сервер включают подробные замеры независимо друг от друга
+        if active:
+            self._consumers.add(name)
+        else:
+            self._consumers.discard(name)
+        self.enabled = bool(self._consumers)
+
+    def histogram(self, name: str) -> RollingHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = RollingHistogram()
+        return histogram
+
+    def record(self, name: str, value: float):
+        self.histogram(name).add(value)
+
+    @contextmanager
+    def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).add((time.perf_counter() - start) * 1000)
+
+    def reset(self):
+        self._histograms.clear()
+        self.started = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "buckets_ms": list(BUCKETS_MS),
+            "metrics": {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+
+metrics = Metrics()
+
+
+class MetricsServer(QTcpServer):
+    # Минимальный HTTP в потоке интерфейса: GET /metrics отдаёт снимок метрик в
+    # JSON. Слушает только localhost; каждый ответ закрывает соединение
+    DEFAULT_PORT = 8765
+
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+        self._requests = {}
+        self.newConnection.connect(self._on_connection)
+
+    def start(self, port: int = DEFAULT_PORT) -> bool:
+        if self.isListening():
+            return True
+        return self.listen(QHostAddress.LocalHost, port)
+
+    def stop(self):
+        self.close()
+
+    def _on_connection(self):
+        while self.hasPendingConnections():
+            socket = self.nextPendingConnection()
+            self._requests[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._on_disconnected(s))
+
+    def _on_disconnected(self, socket):
+        self._requests.pop(socket, None)
+        socket.deleteLater()
+
+    def _on_ready_read(self, socket):
+        if socket not in self._requests:
+            return
+
+        request = self._requests[socket] + bytes(socket.readAll())
+        if b"\r\n\r\n" not in request and len(request) < 8192:
+            self._requests[socket] = request
+            return
+        del self._requests[socket]
+
+        line = request.split(b"\r\n", 1)[0].split()
+        path = line[1].split(b"?", 1)[0] if len(line) > 1 else b""
+
+        if line[:1] != [b"GET"]:
+            self._reply(socket, "405 Method Not Allowed", b"")
+        elif path in (b"/", b"/metrics"):
+            self._reply(socket, "200 OK", metrics.to_json().encode("utf-8"))
+        else:
+            self._reply(socket, "404 Not Found", b"")
+
+    @staticmethod
+    def _reply(socket, status: str, body: bytes):
+        header = (f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        socket.write(header.encode("ascii") + body)
+        socket.disconnectFromHost()
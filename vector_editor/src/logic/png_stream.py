@@ -0,0 +1,69 @@
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+COLOR_TYPE_RGB = 2
+COLOR_TYPE_RGBA = 6
+
+class PngStreamWriter:
+    # Пишет PNG построчно: строки сжимаются сразу и уходят в файл чанками IDAT,
+    # так что целое изображение в памяти не нужно
+    def __init__(self, file, width: int, height: int, has_alpha: bool = True, dpi: float = None,
+                 chunk_size: int = 1 << 16):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.bytes_per_pixel = 4 if has_alpha else 3
+
+        self._compressor = zlib.compressobj(6)
+        self._pending = []
+        self._pending_size = 0
+        self._rows_written = 0
+
+        color_type = COLOR_TYPE_RGBA if has_alpha else COLOR_TYPE_RGB
+
+        self.file.write(PNG_SIGNATURE)
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+        if dpi:
+            pixels_per_meter = round(dpi / 0.0254)
+            self._write_chunk(b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1))
+
+    def write_row(self, row: bytes):
+        if len(row) != self.width * self.bytes_per_pixel:
+            raise ValueError("Неверная длина строки изображения")
+
+        # Фильтр 0 (None) перед каждой строкой
+        self._push(self._compressor.compress(b"\x00"))
+        self._push(self._compressor.compress(row))
+        self._rows_written += 1
+
+    def close(self):
+        if self._rows_written != self.height:
+            raise ValueError(f"Записано {self._rows_written} строк из {self.height}")
+
+        self._push(self._compressor.flush())
+        self._flush_idat()
+        self._write_chunk(b"IEND", b"")
+
+    def _push(self, data: bytes):
+        if not data:
+            return
+
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= self.chunk_size:
+            self._flush_idat()
+
+    def _flush_idat(self):
+        if self._pending:
+            self._write_chunk(b"IDAT", b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
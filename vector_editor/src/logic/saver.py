@@ -0,0 +1,73 @@
+from PySide6.QtCore import QObject, QThread, Signal
+
+class SaveWorker(QObject):
+    progress = Signal(int)
+    finished = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, strategy, filename: str, snapshot):
+        super().__init__()
+        self.strategy = strategy
+        self.filename = filename
+        self.snapshot = snapshot
+
+    def run(self):
+        try:
+            self.strategy.write(self.filename, self.snapshot, self.progress.emit)
+            self.finished.emit(self.filename)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.snapshot = None
+
+
+class BackgroundSaver(QObject):
+    progress = Signal(str)
+    finished = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, strategy, filename: str, parent=None):
+        super().__init__(parent)
+        self.strategy = strategy
+        self.filename = filename
+
+        self._thread = None
+        self._worker = None
+
+    def start(self, scene):
+        # Снимок делается сразу, в UI-потоке: после этого сцену можно менять
+        self.progress.emit("Подготовка данных...")
+        snapshot = self.strategy.snapshot(scene)
+
+        # Поток удаляется вместе с сохраняльщиком, исполнитель - когда поток завершится
+        self._thread = QThread(self)
+        self._worker = SaveWorker(self.strategy, self.filename, snapshot)
+        self._worker.moveToThread(self._thread)
+
+        self._thread.started.connect(self._worker.run)
+        self._thread.finished.connect(self._worker.deleteLater)
+        self._worker.progress.connect(self._on_progress)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.failed.connect(self._on_failed)
+
+        self.progress.emit("Запись файла...")
+        self._thread.start()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.isRunning()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.quit()
+            self._thread.wait()
+
+    def _on_progress(self, percent):
+        self.progress.emit(f"Запись файла... {percent}%")
+
+    def _on_finished(self, filename):
+        self.wait()
+        self.finished.emit(filename)
+
+    def _on_failed(self, message):
+        self.wait()
+        self.failed.emit(message)
@@ -0,0 +1,30 @@
+from PySide6.QtCore import Qt
+
+def top_level_items(scene, order=Qt.SortOrder.AscendingOrder):
+    # parentItem() у элемента верхнего уровня в PySide отдаёт владение Python,
+    # и элемент удаляется вместе с обёрткой, поэтому вложенные отсеиваем через childItems()
+    items = scene.items(order)
+
+    nested = set()
+    for item in items:
+        nested.update(item.childItems())
+
+    return [item for item in items if item not in nested]
+
+
+def content_rect(scene):
+    # Габариты всех фигур: по колонкам IndexedScene (проход по массивам, а не
+    # опрос каждого элемента) плюс записи виртуального документа
+    columns = getattr(scene, "columns", None)
+    rect = columns.bounds() if columns is not None else scene.itemsBoundingRect()
+    document = getattr(scene, "document", None)
+    if document is not None:
+        rect = rect.united(document.bounds)
+    return rect
+
+
+def frame_interval(widget) -> int:
+    # Интервал обновления экрана виджета в мс, чтобы перерисовывать не чаще раза за кадр
+    screen = widget.screen()
+    rate = screen.refreshRate() if screen is not None else 0
+    return max(1, int(1000 / (rate or 60.0)))
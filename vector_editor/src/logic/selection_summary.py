@@ -0,0 +1,103 @@
+from collections import Counter
+
+class SelectionSummary:
+    # Сводка по выделению для панели свойств. Хранит снимок (толщина, цвет, позиция)
+    # каждого выделенного элемента и счётчики значений, поэтому смена выделения
+    # и изменение одной фигуры обновляют сводку без обхода всего выделения
+    def __init__(self):
+        self.items = {}
+        self.widths = Counter()
+        self.colors = Counter()
+        self.positions = Counter()
+        self.types = Counter()
+
+    def set_selection(self, selected):
+        selected = list(selected)
+        selected_set = set(selected)
+
+        for item in [item for item in self.items if item not in selected_set]:
+            self._remove(item)
+
+        for item in selected:
+            if item not in self.items:
+                self._add(item)
+
+    def update_item(self, item) -> bool:
+        if item not in self.items:
+            return False
+
+        self._remove(item)
+        self._add(item)
+        return True
+
+    def clear(self):
+        self.items.clear()
+        self.widths.clear()
+        self.colors.clear()
+        self.positions.clear()
+        self.types.clear()
+
+    @property
+    def first(self):
+        return next(iter(self.items), None)
+
+    @property
+    def width(self):
+        return self._common(self.widths)
+
+    @property
+    def color(self):
+        return self._common(self.colors)
+
+    @property
+    def is_width_mixed(self) -> bool:
+        return len(self.widths) > 1
+
+    @property
+    def is_color_mixed(self) -> bool:
+        return len(self.colors) > 1
+
+    @property
+    def is_position_mixed(self) -> bool:
+        return len(self.positions) > 1
+
+    def __len__(self):
+        return len(self.items)
+
+    def _add(self, item):
+        width = color = None
+        if hasattr(item, "pen"):
+            width = item.style.width
+            color = item.style.color
+            self.widths[width] += 1
+            self.colors[color] += 1
+
+        pos = item.pos()
+        position = (pos.x(), pos.y())
+        type_name = getattr(item, "type_name", type(item).__name__)
+
+        self.positions[position] += 1
+        self.types[type_name] += 1
+        self.items[item] = (width, color, position, type_name)
+
+    def _remove(self, item):
+        width, color, position, type_name = self.items.pop(item)
+
+        if width is not None:
+            self._decrement(self.widths, width)
+            self._decrement(self.colors, color)
+        self._decrement(self.positions, position)
+        self._decrement(self.types, type_name)
+
+    @staticmethod
+    def _decrement(counter, key):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    @staticmethod
+    def _common(counter):
+        # Общее значение, а если значения разные - самое частое
+        if not counter:
+            return None
+        return counter.most_common(1)[0][0]
@@ -1,7 +1,11 @@
-from src.logic.shape_logic.shapes import Shape
+from src.logic.shape_logic.shapes import Shape, transform_fields
+from src.logic.shape_logic.styles import style_props
+from src.logic.snapping import rect_anchors
 from PySide6.QtGui import QPainterPath
 
 class Ellipse(Shape):
+    GEOMETRY_FIELDS = ("x", "y", "w", "h")
+
     def __init__(self, x, y, w, h, color = "black", stroke_width = 2):
         super().__init__(color, stroke_width)
 
@@ -12,34 +16,40 @@ class Ellipse(Shape):
 
         self._create_geometry()
 
-    def _create_geometry(self):
+    @staticmethod
+    def build_path(x, y, w, h) -> QPainterPath:
         path = QPainterPath()
-        path.addEllipse(self.x, self.y, self.w, self.h)
-        self.setPath(path)
+        path.addEllipse(x, y, w, h)
+        return path
 
     @property
     def type_name(self) -> str:
         return "ellipse"
     
-    def to_dict(self) -> dict:
+    def to_dict(self, styles: dict = None) -> dict:
         return {
             "type": self.type_name,
-            "pos": [self.x, self.y],
+            "id": self.uid,
+            "pos": [self.pos().x(), self.pos().y()],
+            **transform_fields(self),
             "props": {
                 "x": self.x, "y": self.y,
                 "h": self.h, "w": self.w,
-                "color": self.pen().color().name(),
-                "stroke_width": self.pen().width()
+                **style_props(self.style, styles)
             }
         }
     
+    def anchor_points(self) -> list:
+        # Центр и крайние точки - середины сторон описанного прямоугольника
+        return rect_anchors(self.x, self.y, self.x + self.w, self.y + self.h)[4:]
+
+    def get_geometry(self) -> tuple:
+        return (self.x, self.y, self.w, self.h)
+
     def set_geometry(self, start_point, end_point):
         self.x = min(start_point.x(), end_point.x())
         self.y = min(start_point.y(), end_point.y())
         self.w = abs(end_point.x() - start_point.x())
         self.h = abs(end_point.y() - start_point.y())
 
-        path = QPainterPath()
-        path.addEllipse(self.x, self.y, self.w, self.h)
-
-        self.setPath(path)
\ No newline at end of file
+        self._create_geometry()
\ No newline at end of file
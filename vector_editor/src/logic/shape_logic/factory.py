@@ -1,16 +1,38 @@
 from src.logic.shape_logic.line import Line
 from  src.logic.shape_logic.rect import Rectangle
 from src.logic.shape_logic.ellipse import Ellipse
+from src.logic.shape_logic.polyline import Polyline, anchored, unpack_points
 from src.logic.shape_logic.group import Group
+from src.logic.shape_logic.shapes import claim_uid
+from src.logic.shape_logic.styles import style_table
 
 class ShapeFactory:
     @staticmethod
     def create_shape(shape_type: str, start_point, end_point, color: str):
+        shape_class, geometry = ShapeFactory._geometry(shape_type, start_point, end_point)
+        return shape_class(*geometry, color)
+
+    @staticmethod
+    def create_polyline(points, color: str):
+        # points - вершины штриха на сцене; фигура встаёт в первую вершину
+        x0, y0, local = anchored(points)
+        obj = Polyline(local, color)
+        obj.setPos(x0, y0)
+        return obj
+
+    @staticmethod
+    def preview_path(shape_type: str, start_point, end_point):
+        # Контур будущей фигуры без создания элемента сцены
+        shape_class, geometry = ShapeFactory._geometry(shape_type, start_point, end_point)
+        return shape_class.build_path(*geometry)
+
+    @staticmethod
+    def _geometry(shape_type: str, start_point, end_point):
         x1, y1 = start_point.x(), start_point.y()
         x2, y2 = end_point.x(), end_point.y()
 
         if shape_type == "line":
-            return Line(x1, y1, x2, y2, color)
+            return Line, (x1, y1, x2, y2)
         
         x = min(x1, x2)
         y = min(y1, y2)
@@ -18,63 +40,103 @@ class ShapeFactory:
         h = abs(y2 - y1)
 
         if shape_type == "rect":
-            return Rectangle(x, y, w, h, color)
+            return Rectangle, (x, y, w, h)
         elif shape_type == "ellipse":
-            return Ellipse(x, y, w, h, color)
+            return Ellipse, (x, y, w, h)
         else:
             raise ValueError(f"Unknown shape: {shape_type}")
         
     @staticmethod
-    def from_dict(data: dict):
+    def from_dict(data: dict, styles: list = None):
+        # styles - таблица "styles" проекта (StyleTable.read), если props ссылаются на неё
         shape_type = data.get("type")
 
         if shape_type == "group":
-            return ShapeFactory._create_group(data)
-        elif shape_type in ["line", "rect", "ellipse"]:
-            return ShapeFactory._create_primitive(data)
+            return ShapeFactory._create_group(data, styles)
+        elif shape_type in ["line", "rect", "ellipse", "polyline"]:
+            return ShapeFactory._create_primitive(data, styles)
         else:
             raise ValueError(f"Unknown type: {shape_type}")
         
     @staticmethod
-    def _create_primitive(data: dict):
+    def from_record(shape_type: str, px, py, a=0, b=0, c=0, d=0, color="black", width=2,
+                    rotation=0.0, scale=1.0):
+        if shape_type == "group":
+            obj = Group()
+        elif shape_type == "line":
+            obj = Line(a, b, c, d, color, width)
+        elif shape_type == "rect":
+            obj = Rectangle(a, b, c, d, color, width)
+        elif shape_type == "ellipse":
+            obj = Ellipse(a, b, c, d, color, width)
+        elif shape_type == "polyline":
+            # У ломаной геометрия - одно значение, кортеж точек
+            obj = Polyline(a, color, width)
+        else:
+            raise ValueError(f"Unknown type: {shape_type}")
+
+        obj.setPos(px, py)
+        if rotation:
+            obj.setRotation(rotation)
+        if scale != 1:
+            obj.setScale(scale)
+        return obj
+
+    @staticmethod
+    def _create_primitive(data: dict, styles: list = None):
         props = data.get("props", {})
         shape_type = data.get("type")
+        style = style_table.from_props(props, styles)
 
         if shape_type == "rect":
-            color = props.get("color", "black")
-            width = props.get("stroke_width", 2)
-            obj = Rectangle(props['x'], props['y'], props['w'], props['h'], color, width)
+            obj = Rectangle(props['x'], props['y'], props['w'], props['h'], style.color, style.width)
 
         elif shape_type == "ellipse":
-            color = props.get("color", "black") 
-            width = props.get("stroke_width", 2)
-            obj = Ellipse(props['x'], props['y'], props['w'], props['h'], color, width)
+            obj = Ellipse(props['x'], props['y'], props['w'], props['h'], style.color, style.width)
 
         elif shape_type == "line":
-            color = props.get("color", "black")
-            width = props.get("stroke_width", 2)
-            obj = Line(props['x1'], props['y1'], props['x2'], props['y2'], color, width)
+            obj = Line(props['x1'], props['y1'], props['x2'], props['y2'], style.color, style.width)
+
+        elif shape_type == "polyline":
+            obj = Polyline(unpack_points(props['points']), style.color, style.width)
 
         if "pos" in data:
             obj.setPos(data["pos"][0], data["pos"][1])
+        ShapeFactory._apply_transform(obj, data)
+
+        if "id" in data:
+            obj.uid = claim_uid(data["id"])
 
         return obj
     
     @staticmethod
-    def _create_group(data: dict):
+    def _create_group(data: dict, styles: list = None):
         group = Group()
 
         x, y = data.get('pos', [0,0])
         group.setPos(x, y)
 
+        if "id" in data:
+            group.uid = claim_uid(data["id"])
+
         children = data.get('children', [])
-        for child in children:
-            child = ShapeFactory.from_dict(child)
+        for child_data in children:
+            child = ShapeFactory.from_dict(child_data, styles)
 
             group.addToGroup(child)
 
-            if "pos" in child:
-                cx, cy = child["pos"]
+            if "pos" in child_data:
+                cx, cy = child_data["pos"]
                 child.setPos(cx, cy)
 
-        return group
\ No newline at end of file
+        # Поворот и масштаб группы - после детей: addToGroup() компенсирует
+        # преобразование группы, пересчитывая transform() ребёнка
+        ShapeFactory._apply_transform(group, data)
+        return group
+
+    @staticmethod
+    def _apply_transform(obj, data: dict):
+        if "rotation" in data:
+            obj.setRotation(data["rotation"])
+        if "scale" in data:
+            obj.setScale(data["scale"])
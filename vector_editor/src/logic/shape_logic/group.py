@@ -1,15 +1,220 @@
+import heapq
+import itertools
 from PySide6.QtWidgets import QGraphicsItemGroup
-from src.logic.shape_logic.shapes import Shape
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QImage, QPainter, QTransform
+from src.logic import lod
+from src.logic.shape_logic.shapes import Shape, next_uid, transform_fields
+from src.logic.spatial_index import index_of, mark_dirty, top_level
+from src.logic.transforms import fold_transform
 
 class Group(QGraphicsItemGroup):
     def __init__(self):
         super().__init__()
 
+        self.uid = next_uid()
+        self._index_parent = None
+        # При отдалении группа рисует детей сама (см. update_lod): растровая
+        # копия и список фигур строятся лениво и сбрасываются при изменении детей
+        self._draws_children = False
+        self._lod_small = False
+        self._cache_active = False
+        self._bitmap = None
+        self._shape_transforms = None
+        self._cost = None
+        # Габариты детей и их прямоугольники по сторонам (см. child_changed)
+        self._bounds = None
+        self._extents = None
+
         self.setFlag(QGraphicsItemGroup.GraphicsItemFlag.ItemIsSelectable, True)
         self.setFlag(QGraphicsItemGroup.GraphicsItemFlag.ItemIsMovable, True)
 
         self.setHandlesChildEvents(True)
 
+    def addToGroup(self, item):
+        # Вложенная фигура перестаёт быть отдельной записью пространственного индекса
+        index = index_of(item)
+        if index is not None:
+            index.remove(item)
+            index.scene.cache_policy.remove(item)
+
+        super().addToGroup(item)
+        item._index_parent = self
+        item._index_scene = None
+        fold_transform(item)
+        if isinstance(item, Group):
+            item._lod_small = False
+            item._set_draws_children(False)
+        item.setVisible(not self._draws_children)
+        if self._cost is not None:
+            self._cost += item.paint_cost()
+        self.child_changed(item)
+        mark_dirty(self)
+
+        # Группа выросла - решение о детализации пересматриваем
+        scene = getattr(self, "_index_scene", None)
+        if scene is not None:
+            self.update_lod(getattr(scene, "view_zoom", 1.0))
+
+    def removeFromGroup(self, item):
+        super().removeFromGroup(item)
+        if self._extents is not None:
+            self._extents.discard(item)
+        item._index_parent = None
+        item._index_scene = getattr(top_level(self), "_index_scene", None)
+        fold_transform(item)
+        item.setVisible(True)
+        if self._cost is not None:
+            self._cost -= item.paint_cost()
+        self.child_changed()
+        mark_dirty(item)
+        mark_dirty(self)
+
+    def setPos(self, *args):
+        super().setPos(*args)
+        mark_dirty(self)
+
+    def moveBy(self, dx: float, dy: float):
+        super().moveBy(dx, dy)
+        mark_dirty(self)
+
+    def setRotation(self, angle: float):
+        super().setRotation(angle)
+        mark_dirty(self)
+
+    def setScale(self, factor: float):
+        super().setScale(factor)
+        mark_dirty(self)
+
+    def boundingRect(self) -> QRectF:
+        # QGraphicsItemGroup запоминает габариты детей только в addToGroup(), а
+        # загрузка ставит pos детей уже после добавления - считаем сами
+        if self._bounds is None:
+            if self._extents is None:
+                self._extents = _Extents()
+                for child in self.childItems():
+                    self._extents.set(child, _child_box(child))
+            self._bounds = self._extents.rect()
+        return self._bounds
+
+    def child_changed(self, child=None):
+        # child - изменившийся ребёнок (см. mark_dirty): габариты обновляются по
+        # нему одному. Без child (снятие ребёнка) - пересчёт при следующем запросе
+        if self._extents is not None and child is not None:
+            self._extents.set(child, _child_box(child))
+            bounds = self._extents.rect()
+            if bounds != self._bounds:
+                self.prepareGeometryChange()
+                self._bounds = bounds
+        elif self._bounds is not None:
+            self.prepareGeometryChange()
+            self._bounds = None
+        self._bitmap = None
+        self._shape_transforms = None
+        # Скрытые дети сами не перерисовываются - перерисовываем группу (и её кэш)
+        if self._draws_children:
+            self.update()
+
+    def child_cost_changed(self, delta: int):
+        # Путь вложенной фигуры сменился (Shape.setPath)
+        if self._cost is not None:
+            self._cost += delta
+
+    def paint_cost(self) -> int:
+        # Оценка: сумма по вложенным фигурам, меняется вместе с их путями
+        if self._cost is None:
+            self._cost = sum(shape.paint_cost() for shape in self._shapes())
+        return self._cost
+
+    def set_cached(self, cached: bool):
+        # Кэш Qt хранит только отрисовку самой группы, поэтому в кэше группа рисует детей сама
+        self._cache_active = cached
+        self._set_draws_children(self._lod_small or cached)
+        self.update()
+
+    def update_lod(self, zoom: float):
+        # Вызывается сценой при смене масштаба вида: маленькая на экране группа
+        # скрывает детей и рисует их сама - из растра или упрощённо
+        if self._index_parent is not None:
+            return
+
+        rect = self.sceneBoundingRect()
+        self._lod_small = zoom < lod.GROUP_BITMAP_LOD and not rect.isEmpty() \
+            and lod.screen_extent(rect, zoom) < lod.GROUP_BITMAP_PX
+        self._set_draws_children(self._lod_small or self._cache_active)
+
+    def _set_draws_children(self, draws: bool):
+        if draws == self._draws_children:
+            return
+
+        # Скрытие ребёнка группы снимает выделение со всей группы - возвращаем его
+        selected = self.isSelected()
+        self._draws_children = draws
+        for child in self.childItems():
+            child.setVisible(not draws)
+        if selected and not self.isSelected():
+            self.setSelected(True)
+        self.update()
+
+    def paint(self, painter, option, widget=None):
+        if self._cache_active:
+            scene = getattr(self, "_index_scene", None)
+            if scene is not None:
+                scene.cache_policy.renders += 1
+
+        if self._draws_children:
+            # Растр - только в виде (widget есть) при сильном отдалении; крупный
+            # масштаб и отрисовка без вида (scene.render, печать) - контуры
+            to_device = painter.worldTransform()
+            level = lod.level_of_detail(to_device)
+            if widget is not None and level < lod.GROUP_BITMAP_LOD \
+                    and lod.screen_extent(self.boundingRect(), level) < lod.GROUP_BITMAP_PX:
+                self._paint_bitmap(painter)
+            else:
+                lod.draw_shapes(painter, self._shape_list(), to_device)
+                painter.setTransform(to_device)
+
+        super().paint(painter, option, widget)
+
+    def _paint_bitmap(self, painter):
+        # QImage, а не QPixmap: экспорт проигрывает записанную отрисовку в других потоках
+        if self._bitmap is None:
+            self._bitmap = self._render_bitmap()
+        if self._bitmap is not None:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(self.boundingRect(), self._bitmap, QRectF(self._bitmap.rect()))
+
+    def _render_bitmap(self):
+        rect = self.boundingRect()
+        if rect.isEmpty():
+            return None
+
+        factor = lod.GROUP_BITMAP_PX / max(rect.width(), rect.height())
+        bitmap = QImage(max(1, round(rect.width() * factor)), max(1, round(rect.height() * factor)),
+                        QImage.Format_ARGB32_Premultiplied)
+        bitmap.fill(Qt.transparent)
+
+        painter = QPainter(bitmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        to_bitmap = QTransform.fromTranslate(-rect.x(), -rect.y()) * QTransform.fromScale(factor, factor)
+        lod.draw_shapes(painter, self._shape_list(), to_bitmap)
+        painter.end()
+        return bitmap
+
+    def _shape_list(self):
+        # Все вложенные фигуры с преобразованием в координаты группы
+        if self._shape_transforms is None:
+            to_group, ok = self.sceneTransform().inverted()
+            self._shape_transforms = [(shape, shape.sceneTransform() * to_group) for shape in self._shapes()]
+        return self._shape_transforms
+
+    def _shapes(self):
+        for child in self.childItems():
+            if isinstance(child, Group):
+                yield from child._shapes()
+            elif isinstance(child, Shape):
+                yield child
+
     def set_stroke_width(self, width: int):
         for child in self.childItems():
             if isinstance(child, Shape):
@@ -27,17 +232,70 @@ class Group(QGraphicsItemGroup):
             if isinstance(child, Shape):
                 child.set_active_color(color)
 
-    def to_dict(self):
+    def to_dict(self, styles: dict = None):
         children = []
         for child in self.childItems():
-            if isinstance(child, Shape):
-                children.append(child.to_dict())
+            if hasattr(child, "to_dict"):
+                children.append(child.to_dict(styles))
 
         return {
             "type": self.type_name,
-            "x": self.pos.x(),
-            "y": self.pos.y(),
+            "id": self.uid,
+            "pos": [self.x(), self.y()],
+            **transform_fields(self),
             "children": children
         }
-    
-    
\ No newline at end of file
+
+
+
+def _child_box(child) -> tuple:
+    rect = child.mapRectToParent(child.boundingRect())
+    return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+
+class _Extents:
+    # Объединение прямоугольников детей с заменой и удалением за O(log n): куча
+    # на каждую сторону, устаревшие записи выбрасываются, когда всплывают наверх
+    def __init__(self):
+        self._boxes = {}
+        self._heaps = ([], [], [], [])
+        self._counter = itertools.count()
+
+    def set(self, key, box: tuple):
+        if self._boxes.get(key) == box:
+            return
+        self._boxes[key] = box
+        if sum(map(len, self._heaps)) > 8 * len(self._boxes) + 64:
+            self._rebuild()
+            return
+        order = next(self._counter)
+        for side, heap in enumerate(self._heaps):
+            heapq.heappush(heap, (_signed(side, box[side]), order, key))
+
+    def discard(self, key):
+        self._boxes.pop(key, None)
+
+    def rect(self) -> QRectF:
+        if not self._boxes:
+            return QRectF()
+
+        edges = []
+        for side, heap in enumerate(self._heaps):
+            while True:
+                value, _, key = heap[0]
+                box = self._boxes.get(key)
+                if box is not None and _signed(side, box[side]) == value:
+                    break
+                heapq.heappop(heap)
+            edges.append(_signed(side, value))
+        return QRectF(edges[0], edges[1], edges[2] - edges[0], edges[3] - edges[1])
+
+    def _rebuild(self):
+        for side, heap in enumerate(self._heaps):
+            heap[:] = [(_signed(side, box[side]), next(self._counter), key) for key, box in self._boxes.items()]
+            heapq.heapify(heap)
+
+
+def _signed(side: int, value: float) -> float:
+    # Левая и верхняя стороны - минимум, правая и нижняя - максимум
+    return value if side < 2 else -value
@@ -1,7 +1,10 @@
-from src.logic.shape_logic.shapes import Shape
+from src.logic.shape_logic.shapes import Shape, transform_fields
+from src.logic.shape_logic.styles import style_props
 from PySide6.QtGui import QPainterPath
 
 class Line(Shape):
+    GEOMETRY_FIELDS = ("x1", "y1", "x2", "y2")
+
     def __init__(self, x1, y1, x2, y2, color = "black", stroke_width = 2):
         super().__init__(color, stroke_width)
         self.x1 = x1
@@ -11,38 +14,42 @@ class Line(Shape):
 
         self._create_geometry()
 
-    def _create_geometry(self):
+    @staticmethod
+    def build_path(x1, y1, x2, y2) -> QPainterPath:
         path = QPainterPath()
 
-        path.moveTo(self.x1, self.y1)
-        path.lineTo(self.x2, self.y2)
+        path.moveTo(x1, y1)
+        path.lineTo(x2, y2)
 
-        self.setPath(path)
+        return path
 
     @property
     def type_name(self) -> str:
         return "line"
     
-    def to_dict(self) -> dict:
+    def to_dict(self, styles: dict = None) -> dict:
         return {
             "type": self.type_name,
+            "id": self.uid,
             "pos": [self.x(), self.y()],
+            **transform_fields(self),
             "props": {
                 "x1": self.x1, "y1": self.y1,
                 "x2": self.x2, "y2": self.y2,
-                "color": self.pen().color().name(),
-                "stroke_width": self.pen().width()
+                **style_props(self.style, styles)
             }
         }
     
+    def anchor_points(self) -> list:
+        return [(self.x1, self.y1), (self.x2, self.y2), ((self.x1 + self.x2) / 2, (self.y1 + self.y2) / 2)]
+
+    def get_geometry(self) -> tuple:
+        return (self.x1, self.y1, self.x2, self.y2)
+
     def set_geometry(self, start_point, end_point):
         self.x1 = start_point.x()
         self.y1 = start_point.y()
         self.x2 = end_point.x()
         self.y2 = end_point.y()
 
-        path = QPainterPath()
-        path.moveTo(self.x1, self.y1)
-        path.lineTo(self.x2, self.y2)
-
-        self.setPath(path)
\ No newline at end of file
+        self._create_geometry()
\ No newline at end of file
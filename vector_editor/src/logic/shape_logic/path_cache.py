@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPainterPath, QPainterPathStroker
+
+class CachedGeometry:
+    # Общие для одинаковых фигур данные. QPainterPath в Qt разделяется неявно,
+    # поэтому setPath() с путём из кэша не копирует сами точки.
+    # filled - попадание и внутри контура, не только по линии пера
+    __slots__ = ("path", "width", "filled", "_outline")
+
+    def __init__(self, path: QPainterPath, width: float, filled: bool = True):
+        self.path = path
+        self.width = width
+        self.filled = filled
+        self._outline = None
+
+    def outline(self) -> QPainterPath:
+        # То же, что QGraphicsPathItem::shape(), но считается один раз на запись
+        if self._outline is None:
+            stroker = QPainterPathStroker()
+            stroker.setWidth(self.width if self.width > 0 else 0.00000001)
+            stroker.setCapStyle(Qt.PenCapStyle.SquareCap)
+            stroker.setJoinStyle(Qt.PenJoinStyle.BevelJoin)
+
+            outline = stroker.createStroke(self.path)
+            if self.filled:
+                outline.addPath(self.path)
+            self._outline = outline
+        return self._outline
+
+
+class PathCache:
+    # Кэш геометрии по (тип, нормализованная геометрия, толщина пера) с вытеснением
+    # давно не использованных записей. Фигуры создаются и в потоке загрузки,
+    # поэтому доступ под блокировкой
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, kind: str, geometry: tuple, width: float, build_path) -> CachedGeometry:
+        # Геометрия уже нормализована фигурой (прямоугольник - левый верхний угол и
+        # неотрицательные размеры), а 0.0 и -0.0 в ключе словаря совпадают
+        key = (kind, geometry, width)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = CachedGeometry(build_path(*geometry), width)
+
+        with self._lock:
+            # Пока строили путь, ту же запись мог добавить другой поток
+            entry = self._entries.setdefault(key, entry)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+path_cache = PathCache()
@@ -0,0 +1,107 @@
+import base64
+import sys
+from array import array
+from src.logic.shape_logic.shapes import Shape, transform_fields
+from src.logic.shape_logic.path_cache import CachedGeometry
+from src.logic.shape_logic.styles import style_props
+from PySide6.QtGui import QPainterPath
+
+# Точки ломаной - плоский кортеж (x0, y0, x1, y1, ...) в локальных координатах.
+# Храним их с точностью float32: в файлах они лежат упакованными (JSON - base64
+# от little-endian float32, .vec - столбец f32), и сохранение ничего не округляет.
+# Нарисованный штрих начинается в (0, 0), его место на сцене - pos.
+
+def quantized(points) -> tuple:
+    return tuple(array('f', points))
+
+
+def pack_points(points) -> str:
+    data = array('f', points)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode("ascii")
+
+
+def unpack_points(value) -> tuple:
+    # Упакованная строка или обычный список чисел (файл, написанный вручную)
+    if not isinstance(value, str):
+        return quantized(value)
+
+    data = array('f')
+    data.frombytes(base64.b64decode(value))
+    if sys.byteorder != "little":
+        data.byteswap()
+    return tuple(data)
+
+
+def anchored(points) -> tuple:
+    # (x0, y0, точки относительно первой): так у float32 меньше потеря точности
+    x0, y0 = points[0], points[1]
+    return x0, y0, [value - (x0 if i % 2 == 0 else y0) for i, value in enumerate(points)]
+
+
+def points_extent(points) -> tuple:
+    # (x, y, w, h) - прямоугольник вершин
+    xs, ys = points[0::2], points[1::2]
+    left, top = min(xs), min(ys)
+    return (left, top, max(xs) - left, max(ys) - top)
+
+
+class Polyline(Shape):
+    GEOMETRY_FIELDS = ("points",)
+
+    def __init__(self, points, color = "black", stroke_width = 2):
+        super().__init__(color, stroke_width)
+        self.points = quantized(points)
+
+        self._create_geometry()
+
+    @staticmethod
+    def build_path(points) -> QPainterPath:
+        path = QPainterPath()
+
+        path.moveTo(points[0], points[1])
+        for i in range(2, len(points), 2):
+            path.lineTo(points[i], points[i + 1])
+
+        return path
+
+    @property
+    def type_name(self) -> str:
+        return "polyline"
+
+    def _create_geometry(self):
+        # Штрихи почти не повторяются: в общий кэш путей не кладём, чтобы не
+        # вытеснять из него одинаковые примитивы. Попадание - только по линии:
+        # незамкнутая ломаная ничего не ограничивает
+        self._geometry = CachedGeometry(self.build_path(self.points), self.style.width, filled=False)
+        self.setPath(self._geometry.path)
+
+    def to_dict(self, styles: dict = None) -> dict:
+        return {
+            "type": self.type_name,
+            "id": self.uid,
+            "pos": [self.pos().x(), self.pos().y()],
+            **transform_fields(self),
+            "props": {
+                "points": pack_points(self.points),
+                **style_props(self.style, styles)
+            }
+        }
+
+    def anchor_points(self) -> list:
+        return list(zip(self.points[0::2], self.points[1::2]))
+
+    def extent(self) -> tuple:
+        return points_extent(self.points)
+
+    def get_geometry(self) -> tuple:
+        return (self.points,)
+
+    def set_geometry(self, start_point, end_point):
+        self.points = quantized((start_point.x(), start_point.y(), end_point.x(), end_point.y()))
+
+        self._create_geometry()
+
+    def assign(self, geometry: tuple, color: str, stroke_width: int):
+        super().assign((quantized(geometry[0]),), color, stroke_width)
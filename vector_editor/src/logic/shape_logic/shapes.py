@@ -1,22 +1,74 @@
 from abc import ABC, abstractmethod
 from PySide6.QtWidgets import QGraphicsPathItem
-from PySide6.QtGui import QPen, QColor
+from PySide6.QtGui import QPainterPath
 from PySide6.QtCore import QPointF
+from src.logic.spatial_index import mark_dirty
+from src.logic.shape_logic.path_cache import path_cache
+from src.logic.shape_logic.styles import style_table
+from src.logic.snapping import rect_anchors
+import itertools
+import threading
+
+_uid_lock = threading.Lock()
+_uid_counter = itertools.count(1)
+_last_uid = 0
+
+def next_uid() -> int:
+    global _last_uid
+    with _uid_lock:
+        _last_uid = next(_uid_counter)
+        return _last_uid
+
+def claim_uid(uid: int) -> int:
+    # Идентификатор из файла: следующие выданные id должны быть больше него
+    global _uid_counter, _last_uid
+    with _uid_lock:
+        if uid > _last_uid:
+            _last_uid = uid
+            _uid_counter = itertools.count(uid + 1)
+        return uid
+
+def transform_fields(item) -> dict:
+    # Поворот и масштаб пишем в to_dict() только если они заданы
+    fields = {}
+    if item.rotation():
+        fields["rotation"] = item.rotation()
+    if item.scale() != 1:
+        fields["scale"] = item.scale()
+    return fields
 
 class Shape(QGraphicsPathItem):
     def __init__(self, color: str = "black", stroke_width: int = 2):
         super().__init__()
 
-        self.color = color
-        self.stroke_width = stroke_width
+        self.uid = next_uid()
+        self._index_parent = None
+        self._geometry = None
+        # Цвет и толщина - ссылка на общий стиль (src/logic/shape_logic/styles.py)
+        self.style = None
 
-        self._setup_pen()
+        self.set_style(style_table.intern(color, stroke_width))
         self._setup_flags()
 
-    def _setup_pen(self):
-        pen = QPen(QColor(self.color))
-        pen.setWidth(self.stroke_width)
-        self.setPen(pen)
+    @property
+    def color(self) -> str:
+        return self.style.color
+
+    @color.setter
+    def color(self, color: str):
+        self.set_active_color(color)
+
+    @property
+    def stroke_width(self) -> int:
+        return self.style.width
+
+    @stroke_width.setter
+    def stroke_width(self, width: int):
+        self.set_stroke_width(width)
+
+    def set_style(self, style):
+        self.style = style
+        self.setPen(style.pen)
 
     def _setup_flags(self):
         self.setFlag(QGraphicsPathItem.GraphicsItemFlag.ItemIsSelectable)
@@ -24,21 +76,87 @@ class Shape(QGraphicsPathItem):
         self.setFlag(QGraphicsPathItem.GraphicsItemFlag.ItemSendsGeometryChanges)
 
     def set_stroke_width(self, width: int):
-        pen = self.pen()
-        pen.setWidth(width)
-        self.setPen(pen)
+        self.set_style(style_table.intern(self.style.color, width))
+
+    def setPath(self, path):
+        delta = path.elementCount() - self.path().elementCount()
+        super().setPath(path)
+        if delta:
+            # Стоимость отрисовки групп выше по цепочке (Group.paint_cost)
+            parent = self._index_parent
+            while parent is not None:
+                parent.child_cost_changed(delta)
+                parent = parent._index_parent
+        mark_dirty(self)
+
+    def setPen(self, pen):
+        super().setPen(pen)
+        if self._geometry is not None and self._geometry.width != pen.width():
+            self._create_geometry()
+        mark_dirty(self)
+
+    def _create_geometry(self):
+        # Одинаковые фигуры получают общий путь и контур из кэша
+        self._geometry = path_cache.lookup(self.type_name, self.get_geometry(), self.style.width, self.build_path)
+        self.setPath(self._geometry.path)
+
+    def anchor_points(self) -> list:
+        # Точки привязки в локальных координатах (src/logic/snapping.py)
+        rect = self.path().boundingRect()
+        return rect_anchors(rect.left(), rect.top(), rect.right(), rect.bottom())
+
+    def paint_cost(self) -> int:
+        # Оценка стоимости отрисовки для политики кэша (src/logic/cache_policy.py)
+        return self.path().elementCount()
+
+    def shape(self):
+        if self._geometry is None:
+            return super().shape()
+        return self._geometry.outline()
+
+    def setPos(self, *args):
+        super().setPos(*args)
+        mark_dirty(self)
+
+    def moveBy(self, dx: float, dy: float):
+        super().moveBy(dx, dy)
+        mark_dirty(self)
+
+    def setRotation(self, angle: float):
+        super().setRotation(angle)
+        mark_dirty(self)
+
+    def setScale(self, factor: float):
+        super().setScale(factor)
+        mark_dirty(self)
 
     @property
     @abstractmethod
     def type_name(self) -> str:
         pass
     @abstractmethod
-    def to_dict(self) -> dict:
+    def to_dict(self, styles: dict = None) -> dict:
         pass
     @abstractmethod
     def set_geometry(self, start_point: QPointF, end_point: QPointF):
         pass
+    @abstractmethod
+    def get_geometry(self) -> tuple:
+        pass
+    @staticmethod
+    @abstractmethod
+    def build_path(*geometry) -> QPainterPath:
+        pass
 
     def set_active_color(self, color: str):
-        self.color = color
-        self._setup_pen()
+        self.set_style(style_table.intern(color, self.style.width))
+
+    def assign(self, geometry: tuple, color: str, stroke_width: int):
+        # Повторное использование элемента для другой фигуры того же типа
+        # (пул VirtualDocument): геометрия в порядке GEOMETRY_FIELDS
+        for name, value in zip(self.GEOMETRY_FIELDS, geometry):
+            setattr(self, name, value)
+        self._geometry = None
+
+        self.set_style(style_table.intern(color, stroke_width))
+        self._create_geometry()
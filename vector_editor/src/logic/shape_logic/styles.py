@@ -0,0 +1,117 @@
+import threading
+from PySide6.QtGui import QColor, QPen
+
+# Фигура ссылается на общий стиль, и перо берёт из него. Смена цвета или
+# толщины отдельных фигур - переход на другой стиль (set_style(), команды
+# BulkChange*). Правка самой записи таблицы (StyleTable.restyle) меняет стиль
+# у всех его фигур сразу: запись меняется за O(1), элементы сцены получают
+# новое перо раз за кадр (IndexedScene.sync_styles).
+
+
+class Style:
+    # Общее перо для всех фигур с этим цветом и толщиной. QPen в Qt разделяется
+    # неявно, поэтому setPen() с пером из таблицы не копирует его данные
+    __slots__ = ("id", "color", "rgb", "width", "pen")
+
+    def __init__(self, style_id: int, color: QColor, width: int):
+        self.id = style_id
+        self.set(color, width)
+
+    def set(self, color: QColor, width: int):
+        # Новое перо, а не правка прежнего: у элементов сцены до синхронизации
+        # остаётся старое значение
+        self.color = color.name()
+        self.rgb = color.rgb() & 0xFFFFFF
+        self.width = width
+
+        self.pen = QPen(color)
+        self.pen.setWidth(width)
+
+
+class StyleTable:
+    # Стили процесса: одна запись на пару (цвет "#rrggbb", толщина), номера не
+    # меняются. Цвет можно задать любым именем QColor - "red" и "#ff0000" дают
+    # один стиль. Фигуры создаются и в потоке загрузки, поэтому новые записи -
+    # под блокировкой
+    def __init__(self):
+        self.styles = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        # Номера стилей по порядку правок restyle(): сцены догоняют их по
+        # своей позиции в этом списке
+        self.edits = []
+
+    def __len__(self):
+        return len(self.styles)
+
+    def __getitem__(self, style_id: int) -> Style:
+        return self.styles[style_id]
+
+    def intern(self, color: str, width: int) -> Style:
+        key = (color, width)
+        style = self._ids.get(key)
+        if style is not None:
+            return style
+
+        qcolor = QColor(color)
+        with self._lock:
+            canonical = (qcolor.name(), width)
+            style = self._ids.get(canonical)
+            if style is None:
+                style = Style(len(self.styles), qcolor, width)
+                self.styles.append(style)
+                self._ids[canonical] = style
+            self._ids[key] = style
+        return style
+
+    def restyle(self, style: Style, color: str, width: int):
+        # Новые цвет и толщина записи - у всех фигур этого стиля. Если такая
+        # пара уже есть, стили остаются разными до сохранения: при чтении
+        # файла одинаковые записи снова сливаются в одну
+        qcolor = QColor(color)
+        with self._lock:
+            for key in [key for key, value in self._ids.items() if value is style]:
+                del self._ids[key]
+            style.set(qcolor, width)
+            self._ids.setdefault((style.color, width), style)
+            self.edits.append(style.id)
+
+    def changed_since(self, revision: int) -> set:
+        # Номера стилей, изменённых после позиции revision в edits
+        return set(self.edits[revision:])
+
+    def matching(self, color=None, width=None) -> set:
+        # Номера стилей с заданным цветом и/или толщиной
+        name = None if color is None else QColor(color).name()
+        return {style.id for style in list(self.styles)
+                if (name is None or style.color == name) and (width is None or style.width == width)}
+
+    def from_props(self, props: dict, styles=None) -> Style:
+        # props фигуры из файла: ссылка "style" на таблицу проекта или цвет и толщина
+        if "style" in props:
+            return styles[props["style"]]
+        return self.intern(props.get("color", "black"), props.get("stroke_width", 2))
+
+    def read(self, entries: list) -> list:
+        # Таблица "styles" проекта -> стили процесса, по номеру в файле
+        return [self.intern(entry["color"], entry["stroke_width"]) for entry in entries]
+
+
+def style_ref(styles: dict, style: Style) -> int:
+    # Номер стиля в таблице сохраняемого файла; styles - {Style: номер}
+    return styles.setdefault(style, len(styles))
+
+
+def style_entries(styles: dict) -> list:
+    return [{"color": style.color, "stroke_width": style.width} for style in styles]
+
+
+def style_props(style: Style, styles=None) -> dict:
+    # Стиль в props из to_dict(): без таблицы файла запись самодостаточна
+    # (журнал, история отмены), с таблицей - только номер
+    if styles is None:
+        return {"color": style.color, "stroke_width": style.width}
+    return {"style": style_ref(styles, style)}
+
+
+style_table = StyleTable()
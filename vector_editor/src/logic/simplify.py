@@ -0,0 +1,87 @@
+import math
+
+# Упрощение ломаных алгоритмом Рамера - Дугласа - Пекера. Точки - плоские
+# списки [x0, y0, x1, y1, ...], как у опорных точек привязки (src/logic/snapping.py)
+
+# Наибольший открытый участок потокового упрощения: проверка новой точки - O(MAX_RUN)
+MAX_RUN = 128
+
+
+def simplify(points: list, tolerance: float) -> list:
+    # Остаются вершины, которые отходят от хорды больше чем на tolerance.
+    # Без рекурсии: длинный штрих не упрётся в глубину стека
+    n = len(points) // 2
+    if n < 3:
+        return list(points)
+
+    keep = bytearray(n)
+    keep[0] = keep[n - 1] = 1
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        index, distance = _farthest(points, first, last)
+        if distance > tolerance:
+            keep[index] = 1
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [value for i in range(n) if keep[i] for value in points[2 * i:2 * i + 2]]
+
+
+class StreamSimplifier:
+    # Упрощение по мере поступления точек мыши. Точки после последней вершины -
+    # открытый участок: пока все они лежат в пределах tolerance от хорды до
+    # новой точки, вершины на участке не нужны (то же условие, что у simplify
+    # для отрезка). Как только хорда перестаёт покрывать участок, предыдущая
+    # точка становится вершиной. Итог стоит ещё раз пропустить через simplify:
+    # жадный проход оставляет немного лишних вершин
+    def __init__(self, tolerance: float):
+        self.tolerance = tolerance
+        self.vertices = []
+        self._run = []
+
+    def __len__(self):
+        return len(self.vertices) // 2
+
+    def add(self, x: float, y: float) -> bool:
+        # True - появилась новая вершина
+        run = self._run
+        if not run:
+            self.vertices += (x, y)
+            self._run = [x, y]
+            return True
+        if run[-2] == x and run[-1] == y:
+            return False
+
+        run += (x, y)
+        count = len(run) // 2
+        if count > 2 and (count > MAX_RUN or _farthest(run, 0, count - 1)[1] > self.tolerance):
+            self.vertices += run[-4:-2]
+            self._run = run[-4:]
+            return True
+        return False
+
+    def points(self) -> list:
+        # Вершины и последняя точка открытого участка
+        if len(self._run) > 2:
+            return self.vertices + self._run[-2:]
+        return list(self.vertices)
+
+
+def _farthest(points: list, first: int, last: int) -> tuple:
+    # Самая далёкая от отрезка first-last точка между ними: (номер, расстояние).
+    # Расстояние до отрезка, а не до прямой: штрих может идти назад вдоль хорды
+    ax, ay = points[2 * first], points[2 * first + 1]
+    dx, dy = points[2 * last] - ax, points[2 * last + 1] - ay
+    length2 = dx * dx + dy * dy
+
+    index, best = first, -1.0
+    for i in range(first + 1, last):
+        px, py = points[2 * i] - ax, points[2 * i + 1] - ay
+        if length2:
+            t = max(0.0, min(1.0, (px * dx + py * dy) / length2))
+            px, py = px - t * dx, py - t * dy
+        distance = math.hypot(px, py)
+        if distance > best:
+            index, best = i, distance
+    return index, best
@@ -0,0 +1,258 @@
+import math
+import shiboken6
+from PySide6.QtCore import QLineF, QPointF, QRectF
+from src.logic.metrics import metrics
+
+# Привязка: к сетке, к опорным точкам фигур (концы и середины линий, углы,
+# середины сторон и центры прямоугольников, центр и крайние точки эллипсов)
+# и к направляющим - линиям, на которых лежат опорные точки соседних фигур.
+#
+# Кандидаты для привязки даёт индекс сцены (SceneIndex): фигуры верхнего
+# уровня, чьи габариты задевают область запроса. Опорные точки фигуры
+# считаются при первом запросе, который её коснулся, и хранятся до её
+# изменения - сцена сообщает о нём через mark_dirty(). Поэтому первое нажатие
+# на большой сцене стоит точек нескольких соседних фигур, а не всех. Точки
+# фигуры, у которой их больше CELL_POINTS (большие группы), раскладываются по
+# ячейкам CELL x CELL, и запрос берёт только ячейки своей области. Запрос
+# смотрит только область в радиусе привязки; при сильном отдалении, когда она
+# больше MAX_CELLS ячеек, привязка к фигурам отключается - остаётся сетка.
+# Точки записей виртуального документа (фигур без элементов) берутся из его
+# R-дерева.
+CELL = 64.0
+MAX_CELLS = 256
+CELL_POINTS = 64
+# Больше точек у перетаскиваемых фигур - привязываем их общие габариты
+MAX_DRAG_POINTS = 64
+
+
+class SnapIndex:
+    def __init__(self, scene):
+        self.scene = scene
+
+        # Фигура верхнего уровня -> её точки плоским списком [x0, y0, x1, y1, ...]
+        # и, для фигур с множеством точек, те же точки по ячейкам {(cx, cy): [...]}
+        self._points = {}
+        self._cells = {}
+
+    def mark_dirty(self, item):
+        while getattr(item, "_index_parent", None) is not None:
+            item = item._index_parent
+        self.remove(item)
+
+    def remove(self, item):
+        self._points.pop(item, None)
+        self._cells.pop(item, None)
+
+    def reset(self):
+        self._points.clear()
+        self._cells.clear()
+
+    def points_of(self, items) -> list:
+        # Точки фигур верхнего уровня
+        result = []
+        for item in items:
+            result.extend(self._points_of(item))
+        return result
+
+    def nearest(self, x: float, y: float, radius: float, exclude=()):
+        # Ближайшая опорная точка не дальше radius: (расстояние, px, py) или None
+        best = None
+        best_distance = radius
+        for points in self._candidates(x - radius, y - radius, x + radius, y + radius, exclude):
+            for i in range(0, len(points), 2):
+                distance = math.hypot(points[i] - x, points[i + 1] - y)
+                if distance <= best_distance:
+                    best_distance = distance
+                    best = (distance, points[i], points[i + 1])
+        return best
+
+    def aligned(self, x: float, y: float, radius: float, reach: float, exclude=()):
+        # Направляющие: ближайшая по x точка из вертикальной полосы ширины 2 * radius
+        # и ближайшая по y - из горизонтальной, не дальше reach вдоль полосы.
+        # Точки - (px, py) или None
+        vertical = self._closest_on_axis(x, y, radius, reach, 0, exclude)
+        horizontal = self._closest_on_axis(y, x, radius, reach, 1, exclude)
+        return vertical, horizontal
+
+    def _closest_on_axis(self, value, other, radius, reach, axis, exclude):
+        if axis == 0:
+            candidates = self._candidates(value - radius, other - reach, value + radius, other + reach, exclude)
+        else:
+            candidates = self._candidates(other - reach, value - radius, other + reach, value + radius, exclude)
+
+        best = None
+        best_key = (radius, reach)
+        for points in candidates:
+            for i in range(0, len(points), 2):
+                offset = abs(points[i + axis] - value)
+                along = abs(points[i + 1 - axis] - other)
+                # Ближе по оси, при равенстве - ближе вдоль направляющей
+                if offset <= radius and along <= reach and (offset, along) <= best_key:
+                    best_key = (offset, along)
+                    best = (points[i], points[i + 1])
+        return best
+
+    def _candidates(self, x1, y1, x2, y2, exclude) -> list:
+        # Списки точек фигур и записей, чьи габариты задевают область
+        cx1, cy1 = math.floor(x1 / CELL), math.floor(y1 / CELL)
+        cx2, cy2 = math.floor(x2 / CELL), math.floor(y2 / CELL)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > MAX_CELLS:
+            return []
+
+        items = self.scene.spatial_index.items_in(QRectF(x1, y1, x2 - x1, y2 - y1), exclude)
+        found = []
+        for item in items:
+            if item in exclude:
+                continue
+            cells = self._cells_of(item)
+            if cells is None:
+                found.append(self._points_of(item))
+                continue
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    points = cells.get((cx, cy))
+                    if points:
+                        found.append(points)
+
+        document = getattr(self.scene, "document", None)
+        if document is not None and document.dormant_count:
+            found.extend(record.anchor_points() for record in document.index.query((x1, y1, x2, y2)))
+        return found
+
+    def _points_of(self, item) -> list:
+        points = self._points.get(item)
+        if points is None:
+            points = []
+            if shiboken6.isValid(item) and getattr(item, "_index_scene", None) is self.scene:
+                _collect(item, points)
+                self._points[item] = points
+        return points
+
+    def _cells_of(self, item):
+        cells = self._cells.get(item)
+        if cells is None:
+            points = self._points_of(item)
+            if len(points) <= 2 * CELL_POINTS or item not in self._points:
+                return None
+            cells = {}
+            for i in range(0, len(points), 2):
+                x, y = points[i], points[i + 1]
+                cells.setdefault((math.floor(x / CELL), math.floor(y / CELL)), []).extend((x, y))
+            self._cells[item] = cells
+        return cells
+
+
+def _collect(item, points: list):
+    # Опорные точки фигуры и детей группы в координатах сцены
+    if item.type_name == "group":
+        for child in item.childItems():
+            if hasattr(child, "type_name"):
+                _collect(child, points)
+        return
+
+    t = item.sceneTransform()
+    m11, m12, m21, m22, dx, dy = t.m11(), t.m12(), t.m21(), t.m22(), t.dx(), t.dy()
+    if m12 == 0.0 and m21 == 0.0 and m11 == 1.0 and m22 == 1.0:
+        # Частый случай - только сдвиг
+        for x, y in item.anchor_points():
+            points += (x + dx, y + dy)
+    else:
+        for x, y in item.anchor_points():
+            points += (m11 * x + m21 * y + dx, m12 * x + m22 * y + dy)
+
+
+def rect_anchors(left: float, top: float, right: float, bottom: float) -> list:
+    # Углы, середины сторон и центр
+    cx, cy = (left + right) / 2, (top + bottom) / 2
+    return [(left, top), (right, top), (right, bottom), (left, bottom),
+            (cx, top), (right, cy), (cx, bottom), (left, cy), (cx, cy)]
+
+
+class Snapper:
+    # Настройки и расчёт привязки для инструментов. Допуск и длина направляющих
+    # заданы в пикселях экрана, поэтому не зависят от масштаба вида
+    def __init__(self, scene):
+        self.scene = scene
+        self.grid = False
+        self.grid_size = 20.0
+        self.objects = True
+        self.guides = True
+        self.tolerance = 8.0
+        self.guide_reach = 400.0
+
+        # Результат последней привязки для отрисовки: точка, к которой
+        # притянуло, и направляющие (QLineF в координатах сцены)
+        self.marker = None
+        self.guide_lines = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.grid or self.objects or self.guides
+
+    def snap_point(self, point: QPointF, zoom: float, exclude=()) -> QPointF:
+        dx, dy = self.snap_offset([point.x(), point.y()], zoom, exclude)
+        return QPointF(point.x() + dx, point.y() + dy)
+
+    def snap_offset(self, points: list, zoom: float, exclude=()) -> tuple:
+        # Сдвиг (dx, dy), который притягивает одну из точек [x0, y0, x1, y1, ...]:
+        # к опорной точке фигуры, иначе по каждой оси к направляющей или сетке
+        self.clear()
+        if not points or not self.enabled:
+            return 0.0, 0.0
+
+        with metrics.timed("snap.query"):
+            index = self.scene.snap_index
+            radius = self.tolerance / zoom
+
+            if self.objects:
+                best = None
+                for i in range(0, len(points), 2):
+                    hit = index.nearest(points[i], points[i + 1], radius, exclude)
+                    if hit is not None and (best is None or hit[0] < best[0]):
+                        best = (hit[0], hit[1] - points[i], hit[2] - points[i + 1], hit[1], hit[2])
+                if best is not None:
+                    self.marker = QPointF(best[3], best[4])
+                    return best[1], best[2]
+
+            snap_x = snap_y = None
+            if self.guides:
+                reach = self.guide_reach / zoom
+                for i in range(0, len(points), 2):
+                    x, y = points[i], points[i + 1]
+                    vertical, horizontal = index.aligned(x, y, radius, reach, exclude)
+                    if vertical is not None and (snap_x is None or abs(vertical[0] - x) < abs(snap_x[0])):
+                        snap_x = (vertical[0] - x, vertical, y)
+                    if horizontal is not None and (snap_y is None or abs(horizontal[1] - y) < abs(snap_y[0])):
+                        snap_y = (horizontal[1] - y, horizontal, x)
+
+            dx = snap_x[0] if snap_x is not None else None
+            dy = snap_y[0] if snap_y is not None else None
+            if self.grid:
+                # По сетке выравнивается первая точка (угол габаритов или сама точка)
+                size = self.grid_size
+                if dx is None:
+                    dx = round(points[0] / size) * size - points[0]
+                if dy is None:
+                    dy = round(points[1] / size) * size - points[1]
+            dx, dy = dx or 0.0, dy or 0.0
+
+            # Направляющая - от опорной точки до притянутой
+            if snap_x is not None:
+                _, (ax, ay), y = snap_x
+                self.guide_lines.append(QLineF(ax, ay, ax, y + dy))
+            if snap_y is not None:
+                _, (ax, ay), x = snap_y
+                self.guide_lines.append(QLineF(ax, ay, x + dx, ay))
+            return dx, dy
+
+    def drag_points(self, items) -> list:
+        # Опорные точки перетаскиваемых фигур; если их много - только габариты
+        points = self.scene.snap_index.points_of(items)
+        if len(points) > 2 * MAX_DRAG_POINTS:
+            xs, ys = points[0::2], points[1::2]
+            points = [value for point in rect_anchors(min(xs), min(ys), max(xs), max(ys)) for value in point]
+        return points
+
+    def clear(self):
+        self.marker = None
+        self.guide_lines = []
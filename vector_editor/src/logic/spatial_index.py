@@ -0,0 +1,715 @@
+import heapq
+import itertools
+import math
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import shiboken6
+from src.logic import transforms
+from src.logic.cache_policy import CachePolicy
+from src.logic.columnar import DocumentColumns
+from src.logic.metrics import metrics
+from src.logic.shape_logic.styles import style_table
+from src.logic.snapping import SnapIndex
+from PySide6.QtCore import Qt, QRectF, Signal
+from PySide6.QtWidgets import QGraphicsItemGroup, QGraphicsScene
+
+# Прямоугольники внутри индексов - кортежи (left, top, right, bottom)
+
+def _box(rect: QRectF) -> tuple:
+    return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+
+def _intersects(a, b) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _distance(box, x, y) -> float:
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+def _union(a, b) -> tuple:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _area(box) -> float:
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+class SpatialIndex(ABC):
+    @abstractmethod
+    def insert(self, item, box: tuple):
+        pass
+
+    @abstractmethod
+    def remove(self, item):
+        pass
+
+    @abstractmethod
+    def query(self, box: tuple) -> list:
+        pass
+
+    @abstractmethod
+    def nearest(self, x: float, y: float, max_distance: float = math.inf):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def __contains__(self, item):
+        pass
+
+    def update(self, item, box: tuple):
+        if item in self:
+            self.remove(item)
+        self.insert(item, box)
+
+
+class GridIndex(SpatialIndex):
+    def __init__(self, cell_size: float = 64.0):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._items = {}
+
+    def _cell_range(self, box):
+        size = self.cell_size
+        return (math.floor(box[0] / size), math.floor(box[1] / size),
+                math.floor(box[2] / size), math.floor(box[3] / size))
+
+    def insert(self, item, box):
+        x1, y1, x2, y2 = self._cell_range(box)
+        cells = []
+
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                self._cells.setdefault((cx, cy), set()).add(item)
+                cells.append((cx, cy))
+
+        self._items[item] = (box, cells)
+
+    def remove(self, item):
+        _, cells = self._items.pop(item)
+
+        for cell in cells:
+            bucket = self._cells[cell]
+            bucket.discard(item)
+            if not bucket:
+                del self._cells[cell]
+
+    def query(self, box):
+        x1, y1, x2, y2 = self._cell_range(box)
+        found = set()
+
+        # Широкий запрос дешевле пройти по заполненным ячейкам
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(self._cells):
+            for (cx, cy), bucket in self._cells.items():
+                if x1 <= cx <= x2 and y1 <= cy <= y2:
+                    found.update(bucket)
+        else:
+            for cx in range(x1, x2 + 1):
+                for cy in range(y1, y2 + 1):
+                    bucket = self._cells.get((cx, cy))
+                    if bucket:
+                        found.update(bucket)
+
+        return [item for item in found if _intersects(self._items[item][0], box)]
+
+    def nearest(self, x, y, max_distance=math.inf):
+        if not self._items:
+            return None
+
+        size = self.cell_size
+        cx, cy = math.floor(x / size), math.floor(y / size)
+
+        xs = [cell[0] for cell in self._cells]
+        ys = [cell[1] for cell in self._cells]
+        max_ring = max(abs(cx - min(xs)), abs(cx - max(xs)), abs(cy - min(ys)), abs(cy - max(ys)))
+
+        best, best_distance = None, max_distance
+        for ring in range(max_ring + 1):
+            # Всё, что дальше этого кольца, не может быть ближе найденного
+            if (ring - 1) * size > best_distance:
+                break
+
+            for cell in self._ring(cx, cy, ring):
+                for item in self._cells.get(cell, ()):
+                    distance = _distance(self._items[item][0], x, y)
+                    if distance <= best_distance:
+                        best, best_distance = item, distance
+
+        return best
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        if ring == 0:
+            yield (cx, cy)
+            return
+
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+    def clear(self):
+        self._cells.clear()
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+
+class _Node:
+    __slots__ = ("leaf", "entries", "parent")
+
+    def __init__(self, leaf: bool, parent=None):
+        self.leaf = leaf
+        self.entries = []
+        self.parent = parent
+
+    def box(self):
+        boxes = [entry[0] for entry in self.entries]
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+class RTreeIndex(SpatialIndex):
+    # R-дерево Гуттмана с квадратичным разбиением узлов
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self.min_entries = max(2, max_entries * 2 // 5)
+        self.clear()
+
+    def clear(self):
+        self._root = _Node(leaf=True)
+        self._leaves = {}
+
+    def __len__(self):
+        return len(self._leaves)
+
+    def __contains__(self, item):
+        return item in self._leaves
+
+    def insert(self, item, box):
+        leaf = self._choose_leaf(box)
+        leaf.entries.append([box, item])
+        self._leaves[item] = leaf
+        self._adjust(leaf)
+
+    def remove(self, item):
+        leaf = self._leaves.pop(item)
+        leaf.entries = [entry for entry in leaf.entries if entry[1] != item]
+        self._condense(leaf)
+
+    def query(self, box):
+        # Проверка пересечения - без вызова _intersects: запрос идёт на каждое
+        # движение мыши (попадание, привязка)
+        x1, y1, x2, y2 = box
+        found = []
+        stack = [self._root]
+
+        while stack:
+            node = stack.pop()
+            target = found if node.leaf else stack
+            for entry_box, child in node.entries:
+                if entry_box[0] <= x2 and x1 <= entry_box[2] and entry_box[1] <= y2 and y1 <= entry_box[3]:
+                    target.append(child)
+
+        return found
+
+    def nearest(self, x, y, max_distance=math.inf):
+        counter = itertools.count()
+        heap = [(0.0, next(counter), False, self._root)]
+
+        while heap:
+            distance, _, is_item, obj = heapq.heappop(heap)
+            if distance > max_distance:
+                return None
+            if is_item:
+                return obj
+
+            for entry_box, child in obj.entries:
+                heapq.heappush(heap, (_distance(entry_box, x, y), next(counter), obj.leaf, child))
+
+        return None
+
+    def _choose_leaf(self, box):
+        node = self._root
+        while not node.leaf:
+            best = min(node.entries, key=lambda entry: (
+                _area(_union(entry[0], box)) - _area(entry[0]), _area(entry[0])
+            ))
+            node = best[1]
+        return node
+
+    def _entry_of(self, node):
+        for entry in node.parent.entries:
+            if entry[1] is node:
+                return entry
+
+    def _adjust(self, node):
+        while True:
+            split = self._split(node) if len(node.entries) > self.max_entries else None
+
+            if node.parent is None:
+                if split is not None:
+                    root = _Node(leaf=False)
+                    for child in (node, split):
+                        child.parent = root
+                        root.entries.append([child.box(), child])
+                    self._root = root
+                return
+
+            self._entry_of(node)[0] = node.box()
+            if split is not None:
+                split.parent = node.parent
+                node.parent.entries.append([split.box(), split])
+
+            node = node.parent
+
+    def _split(self, node):
+        entries = node.entries
+
+        # Квадратичный выбор затравок: пара с наибольшей «пустой» площадью
+        worst, seeds = -math.inf, (0, 1)
+        for i in range(len(entries)):
+            for j in range(i + 1, len(entries)):
+                waste = _area(_union(entries[i][0], entries[j][0])) - _area(entries[i][0]) - _area(entries[j][0])
+                if waste > worst:
+                    worst, seeds = waste, (i, j)
+
+        groups = [[entries[seeds[0]]], [entries[seeds[1]]]]
+        boxes = [entries[seeds[0]][0], entries[seeds[1]][0]]
+        rest = [entry for k, entry in enumerate(entries) if k not in seeds]
+
+        while rest:
+            for g in (0, 1):
+                if len(groups[g]) + len(rest) == self.min_entries:
+                    groups[g].extend(rest)
+                    rest = []
+                    break
+            if not rest:
+                break
+
+            entry = rest.pop()
+            growth = [_area(_union(boxes[g], entry[0])) - _area(boxes[g]) for g in (0, 1)]
+            g = 0 if (growth[0], _area(boxes[0]), len(groups[0])) <= (growth[1], _area(boxes[1]), len(groups[1])) else 1
+            groups[g].append(entry)
+            boxes[g] = _union(boxes[g], entry[0])
+
+        node.entries = groups[0]
+        sibling = _Node(leaf=node.leaf)
+        sibling.entries = groups[1]
+
+        for target in (node, sibling):
+            for entry in target.entries:
+                if target.leaf:
+                    self._leaves[entry[1]] = target
+                else:
+                    entry[1].parent = target
+
+        return sibling
+
+    def _condense(self, node):
+        orphans = []
+
+        while node.parent is not None:
+            parent = node.parent
+            if len(node.entries) < self.min_entries:
+                parent.entries = [entry for entry in parent.entries if entry[1] is not node]
+                self._collect(node, orphans)
+            else:
+                self._entry_of(node)[0] = node.box()
+            node = parent
+
+        if not self._root.leaf and len(self._root.entries) == 1:
+            self._root = self._root.entries[0][1]
+            self._root.parent = None
+        elif not self._root.entries:
+            self._root = _Node(leaf=True)
+
+        for box, item in orphans:
+            del self._leaves[item]
+            self.insert(item, box)
+
+    def _collect(self, node, out):
+        if node.leaf:
+            out.extend(node.entries)
+        else:
+            for _, child in node.entries:
+                self._collect(child, out)
+
+
+class SceneIndex:
+    # Индекс верхнеуровневых фигур сцены. Сцена и фигуры сообщают об изменениях
+    # через mark_dirty(), а пересчёт границ откладывается до ближайшего
+    # запроса - перетаскивание тысячи фигур стоит одного обновления каждой.
+    BACKENDS = {"grid": GridIndex, "rtree": RTreeIndex}
+
+    def __init__(self, scene, backend: str = "rtree"):
+        self.scene = scene
+        self.backend = None
+
+        self._index = None
+        self._dirty = set()
+        self._order = {}
+        self._counter = itertools.count()
+
+        self.set_backend(backend)
+
+    def set_backend(self, name: str):
+        if name != "qt" and name not in self.BACKENDS:
+            raise ValueError(f"Unknown spatial index: {name}")
+
+        self.backend = name
+        self._dirty.clear()
+        self._order.clear()
+
+        # BSP Qt остаётся при любом индексе: по нему вид выбирает, что рисовать
+        # (без него каждый кадр обходит все элементы). Собственный индекс
+        # отвечает только на запросы попадания, рамки и привязки
+        self.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+        if name == "qt":
+            self._index = None
+            return
+
+        self._index = self.BACKENDS[name]()
+        for item in self.scene.items(Qt.SortOrder.AscendingOrder):
+            if getattr(item, "_index_parent", None) is None:
+                self._dirty.add(item)
+
+    def mark_dirty(self, item):
+        if self._index is None:
+            return
+
+        while getattr(item, "_index_parent", None) is not None:
+            item = item._index_parent
+        self._dirty.add(item)
+        # Порядок добавления - как у Qt при равном zValue (см. items_at)
+        if item not in self._order:
+            self._order[item] = next(self._counter)
+
+    def remove(self, item):
+        self._dirty.discard(item)
+        self._order.pop(item, None)
+        if self._index is not None and item in self._index:
+            self._index.remove(item)
+
+    def reset(self):
+        self._dirty.clear()
+        self._order.clear()
+        if self._index is not None:
+            self._index.clear()
+
+    def flush(self, skip=()):
+        # skip - фигуры, которые сейчас перетаскивают: они остаются помеченными
+        # и пересчитываются один раз, когда их отпустят
+        if self._index is None or not self._dirty:
+            return
+
+        dirty = self._dirty - skip if skip else self._dirty
+        self._dirty = self._dirty - dirty if skip else set()
+        with metrics.timed("index.flush"):
+            for item in dirty:
+                if not self._is_live(item) or not hasattr(item, "type_name") \
+                        or getattr(item, "_index_parent", None) is not None:
+                    self.remove(item)
+                    continue
+
+                self._index.update(item, _box(item.sceneBoundingRect()))
+        metrics.record("index.flush_items", len(dirty))
+
+    def items_in(self, rect: QRectF, skip=()) -> list:
+        # Фигуры из skip могут прийти со старыми границами (см. flush)
+        if self._index is None:
+            items = self.scene.items(rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect)
+            return [item for item in items if self._is_top_shape(item)]
+
+        self.flush(skip)
+        return self._live(self._index.query(_box(rect)))
+
+    def items_at(self, point) -> list:
+        # Фигуры под точкой, сверху вниз
+        if self._index is None:
+            return [item for item in self.scene.items(point) if self._is_top_shape(item)]
+
+        self.flush()
+        x, y = point.x(), point.y()
+        candidates = [item for item in self._live(self._index.query((x, y, x, y)))
+                      if item.contains(item.mapFromScene(point))]
+
+        # Сверху - больший zValue, при равном - добавленный позже
+        candidates.sort(key=lambda item: (item.zValue(), self._order.get(item, 0)), reverse=True)
+        return candidates
+
+    def item_at(self, point):
+        items = self.items_at(point)
+        return items[0] if items else None
+
+    def nearest(self, point, max_distance: float = math.inf):
+        # Ближайшая по ограничивающему прямоугольнику фигура не дальше max_distance
+        x, y = point.x(), point.y()
+
+        if self._index is None:
+            area = self.scene.itemsBoundingRect() | QRectF(x, y, 1, 1)
+            if max_distance != math.inf:
+                area = QRectF(x - max_distance, y - max_distance, 2 * max_distance, 2 * max_distance)
+
+            best, best_distance = None, max_distance
+            for item in self.items_in(area):
+                distance = _distance(_box(item.sceneBoundingRect()), x, y)
+                if distance <= best_distance:
+                    best, best_distance = item, distance
+            return best
+
+        self.flush()
+        while True:
+            item = self._index.nearest(x, y, max_distance)
+            if item is None or self._is_live(item):
+                return item
+            self.remove(item)
+
+    def estimated_count(self) -> int:
+        # Без пересчёта отложенных изменений - для порогов, где точность не важна
+        if self._index is None:
+            return len(self.scene.items())
+        return len(self._index) + len(self._dirty)
+
+    def __len__(self):
+        self.flush()
+        if self._index is None:
+            return sum(1 for item in self.scene.items() if self._is_top_shape(item))
+        return len(self._index)
+
+    def _is_top_shape(self, item) -> bool:
+        return hasattr(item, "type_name") and getattr(item, "_index_parent", None) is None
+
+    def _is_live(self, item) -> bool:
+        # Страховка от элементов, удалённых в обход сцены
+        return shiboken6.isValid(item) and getattr(item, "_index_scene", None) is self.scene
+
+    def _live(self, items) -> list:
+        result = []
+        for item in items:
+            if self._is_live(item):
+                result.append(item)
+            else:
+                self.remove(item)
+        return result
+
+
+UNGROUP_CHUNK = 64
+
+
+def _refresh_pens(item):
+    style = getattr(item, "style", None)
+    if style is not None and item.pen() != style.pen:
+        item.setPen(style.pen)
+    for child in item.childItems():
+        _refresh_pens(child)
+
+
+class IndexedScene(QGraphicsScene):
+    # Сцена, которая держит пространственный индекс в курсе добавлений и удалений.
+    # Перемещения и изменения геометрии и пера фигуры сообщают сами через mark_dirty()
+    document_changed = Signal()
+
+    def __init__(self, parent=None, backend: str = "rtree"):
+        super().__init__(parent)
+        self.spatial_index = SceneIndex(self, backend)
+        self._change_listeners = []
+        self._batched = None
+
+        # Масштаб вида и элементы, которые меняют детализацию вслед за ним (update_lod)
+        self.view_zoom = 1.0
+        self._lod_items = set()
+        self.cache_policy = CachePolicy()
+        # Колоночное зеркало фигур для фильтров и габаритов (src/logic/columnar.py)
+        self.columns = DocumentColumns(self)
+        # Опорные точки фигур для привязки (src/logic/snapping.py)
+        self.snap_index = SnapIndex(self)
+        # Позиция в style_table.edits, до которой перья элементов уже обновлены
+        self._style_revision = len(style_table.edits)
+
+        # Виртуальный документ (src/logic/virtual_document.py): фигуры вне вида -
+        # записи, которые сцена рисует в фоне
+        self.document = None
+
+    def set_document(self, document):
+        self.document = document
+        self.document_changed.emit()
+        self.update()
+
+    def drawBackground(self, painter, rect):
+        # Перья после правок таблицы стилей и решения о кэше - раз за кадр,
+        # до отрисовки элементов
+        self.sync_styles()
+        self.cache_policy.flush()
+        super().drawBackground(painter, rect)
+        if self.document is not None:
+            self.document.paint(painter, rect)
+
+    def sync_styles(self):
+        # У элемента Qt своя копия пера: после style_table.restyle() её получают
+        # только фигуры изменённых стилей, по индексу стилей столбцов
+        revision = len(style_table.edits)
+        if revision == self._style_revision:
+            return
+        restyled = style_table.changed_since(self._style_revision)
+        self._style_revision = revision
+        with self.batch_changes():
+            for item in self.columns.styled(restyled):
+                item.setPen(item.style.pen)
+
+    def add_change_listener(self, listener):
+        # listener(item) вызывается при изменении фигуры верхнего уровня
+        self._change_listeners.append(listener)
+
+    def item_changed(self, item):
+        if self._batched is not None:
+            self._batched.add(item)
+            return
+
+        self.spatial_index.mark_dirty(item)
+        self.columns.mark_dirty(item)
+        self.snap_index.mark_dirty(item)
+        self.cache_policy.item_changed(item)
+        for listener in self._change_listeners:
+            listener(item)
+
+    @contextmanager
+    def batch_changes(self):
+        # Массовые операции: уведомления копятся и рассылаются по разу на фигуру в конце
+        if self._batched is not None:
+            yield
+            return
+
+        self._batched = set()
+        try:
+            yield
+        finally:
+            changed, self._batched = self._batched, None
+            for item in changed:
+                self.item_changed(item)
+
+    def set_view_zoom(self, zoom: float):
+        self.view_zoom = zoom
+        for item in self._lod_items:
+            item.update_lod(zoom)
+        self.cache_policy.set_zoom(zoom)
+
+    def addItem(self, item):
+        super().addItem(item)
+        if style_table.edits:
+            # Фигура могла быть вне сцены, пока правили таблицу стилей
+            _refresh_pens(item)
+        item._index_scene = self
+        self.spatial_index.mark_dirty(item)
+        self.columns.mark_dirty(item)
+        self.snap_index.mark_dirty(item)
+
+        if hasattr(item, "update_lod"):
+            self._lod_items.add(item)
+            item.update_lod(self.view_zoom)
+        self.cache_policy.evaluate(item)
+        if self.document is not None:
+            self.document.adopt(item)
+
+    def removeItem(self, item):
+        if self.document is not None:
+            self.document.release(item)
+        self.spatial_index.remove(item)
+        self.columns.remove(item)
+        self.snap_index.remove(item)
+        self._lod_items.discard(item)
+        self.cache_policy.remove(item)
+        item._index_scene = None
+        super().removeItem(item)
+
+    def clear(self):
+        # Сначала Qt удаляет элементы, потом отпускаем ссылки на обёртки: если
+        # последняя ссылка на обёртку пропадёт раньше, PySide удалит элемент
+        # (детей групп) сам, и clear() сцены обратится к уже удалённому
+        super().clear()
+        self.spatial_index.reset()
+        self.columns.reset()
+        self.snap_index.reset()
+        self._lod_items.clear()
+        self.cache_policy.clear()
+        self.document = None
+
+    def destroyItemGroup(self, group):
+        children = group.childItems()
+        self.spatial_index.remove(group)
+        self.columns.remove(group)
+        self.snap_index.remove(group)
+        self._lod_items.discard(group)
+        self.cache_policy.remove(group)
+        if self.document is not None:
+            self.document.release(group)
+
+        # QGraphicsItemGroup::removeFromGroup() после каждого ребёнка заново считает
+        # границы по всем оставшимся - разгруппировка тысяч фигур квадратична.
+        # Переносим детей кусками во временные группы с тем же преобразованием
+        # (setParentItem сохраняет локальные координаты) и разбираем их Qt.
+        # setParentItem(None) из Python не годится: PySide отдаёт владение
+        # элементом Python, и он удаляется вместе с обёрткой
+        if len(children) > UNGROUP_CHUNK:
+            for start in range(0, len(children), UNGROUP_CHUNK):
+                part = QGraphicsItemGroup()
+                QGraphicsScene.addItem(self, part)
+                part.setTransform(group.sceneTransform())
+                for child in children[start:start + UNGROUP_CHUNK]:
+                    child.setParentItem(part)
+                QGraphicsScene.destroyItemGroup(self, part)
+        super().destroyItemGroup(group)
+
+        for child in children:
+            child._index_parent = None
+            child._index_scene = self
+            child.setVisible(True)
+            transforms.fold_transform(child)
+            if hasattr(child, "update_lod"):
+                self._lod_items.add(child)
+                child.update_lod(self.view_zoom)
+            self.cache_policy.evaluate(child)
+            self.spatial_index.mark_dirty(child)
+            self.columns.mark_dirty(child)
+            self.snap_index.mark_dirty(child)
+            if self.document is not None:
+                self.document.adopt(child)
+
+
+def top_level(item):
+    # Верхний элемент по отслеживаемым ссылкам: scene() и parentItem() у элемента
+    # без сцены или без родителя в PySide отдают владение Python, и элемент
+    # удаляется вместе с обёрткой
+    while getattr(item, "_index_parent", None) is not None:
+        item = item._index_parent
+    return item
+
+
+def index_of(item):
+    return getattr(getattr(top_level(item), "_index_scene", None), "spatial_index", None)
+
+
+def mark_dirty(item):
+    # Вызывается на каждое изменение фигуры, в том числе при создании вне сцены.
+    # Для групп выше по цепочке это изменение содержимого (сбрасывает их растр)
+    while getattr(item, "_index_parent", None) is not None:
+        child, item = item, item._index_parent
+        item.child_changed(child)
+    scene = getattr(item, "_index_scene", None)
+    if scene is not None:
+        scene.item_changed(item)
@@ -1,56 +1,285 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import json
+import math
 from src.logic.io import FileManager
-from PySide6.QtGui import QImage, QPainter, QColor
-from PySide6.QtCore import QRectF, QSize
+from src.logic.scene_utils import content_rect, top_level_items
+from src.logic.shape_logic.styles import style_entries
+from src.logic.vec_format import VecFormat
+from src.logic.virtual_document import ShapeRecord
+from src.logic.png_stream import PngStreamWriter
+from src.logic.svg_stream import column_bounds, write_svg
+from PySide6.QtGui import QImage, QPainter, QColor, QPicture
+from PySide6.QtCore import Qt, QFile, QFileDevice, QIODevice
 
 class SaveStrategy(ABC):
-    @abstractmethod
+    # snapshot() вызывается в UI-потоке и должен быть дешёвым,
+    # write() может выполняться в фоновом потоке и не трогает сцену
     def save(self, filename: str, scene):
+        self.write(filename, self.snapshot(scene))
+
+    @abstractmethod
+    def snapshot(self, scene):
+        pass
+
+    @abstractmethod
+    def write(self, filename: str, snapshot, progress=None):
         pass
 
 
 class JsonSaveStrategy(SaveStrategy):
-    def save(self, filename, scene):
+    def snapshot(self, scene):
+        # Цвет и толщина записываются один раз в таблицу "styles", фигуры ссылаются
+        # на неё номером. Таблица идёт перед "shapes": загрузчик читает файл потоком
         data = {
-            "version": "1.0",
+            "version": "1.1",
             "scene": {
+                "x": scene.sceneRect().x(),
+                "y": scene.sceneRect().y(),
                 "width": scene.width(),
                 "height": scene.height()
             },
+            "styles": [],
             "shapes": []
         }
+        styles = {}
 
-        items = scene.items()[::-1]
+        # В виртуальном документе часть фигур - записи вне сцены, у них тоже есть to_dict()
+        document = getattr(scene, "document", None)
+        items = document.nodes() if document is not None else top_level_items(scene)
         
         for item in items:
             if hasattr(item, "to_dict"):
-                data["shapes"].append(item.to_dict())
-        
-        FileManager.save_project(filename, data)
+                data["shapes"].append(item.to_dict(styles))
+
+        data["styles"] = style_entries(styles)
+        return data
+
+    def write(self, filename, snapshot, progress=None):
+        FileManager.save_project(filename, snapshot)
+
+class BinarySaveStrategy(SaveStrategy):
+    def snapshot(self, scene):
+        return VecFormat.collect(scene)
+
+    def write(self, filename, snapshot, progress=None):
+        VecFormat.write(filename, snapshot)
+
+class SvgSaveStrategy(SaveStrategy):
+    # Снимок - те же колонки, что и у .vec: проход по всем фигурам в UI-потоке,
+    # порядка 80 байт на фигуру (около 0,9 с и 8 МБ на 100 тыс. фигур). Всё
+    # остальное - в фоне: viewBox по колонкам и потоковая разметка
+    # (src/logic/svg_stream.py), без дерева SVG в памяти
+    def snapshot(self, scene):
+        return VecFormat.columns(scene)
+
+    def write(self, filename, snapshot, progress=None):
+        try:
+            with FileManager.atomic_open(filename, 'w', encoding='utf-8') as f:
+                write_svg(f, snapshot, column_bounds(snapshot), progress)
+        except OSError as e:
+            raise IOError(f"Не удалось сохранить: {e}")
 
 class ImageSaveStrategy(SaveStrategy):
-    def __init__(self, format_name="PNG", background="white"):
+    # Снимок в UI-потоке - лёгкие записи фигур верхнего уровня (ShapeRecord, как у
+    # виртуального документа), каждая фигура хранится один раз. Тайлы рисуются
+    # из записей в пуле потоков; PNG собирается полосами высотой в тайл и сразу
+    # сжимается в файл, для JPEG нужен целый кадр - этого требует кодировщик Qt.
+    # Целый кадр ограничен MAX_WHOLE_PIXELS (4 байта на пиксель - 256 МБ, как
+    # предел выделения QImageReader): больший JPEG отклоняется ещё до рисования.
+    MAX_WHOLE_PIXELS = 64_000_000
+
+    def __init__(self, format_name="PNG", background="white", scale=1.0, tile_size=512, threads=None):
         self.format_name = format_name
         self.background = background
+        self.scale = scale
+        self.tile_size = tile_size
+        self.threads = threads
+
+    def snapshot(self, scene):
+        rect = content_rect(scene)
+        if rect.isEmpty():
+            rect = scene.sceneRect()
+
+        width = max(1, math.ceil(rect.width() * self.scale))
+        height = max(1, math.ceil(rect.height() * self.scale))
+        if self.format_name.upper() != "PNG" and width * height > self.MAX_WHOLE_PIXELS:
+            raise ValueError(f"Изображение {width}x{height} слишком велико для {self.format_name}: "
+                             f"не больше {self.MAX_WHOLE_PIXELS} пикселей. Уменьшите масштаб или сохраните в PNG")
+
+        bands = [(y, min(self.tile_size, height - y)) for y in range(0, height, self.tile_size)]
+        columns = [(x, min(self.tile_size, width - x)) for x in range(0, width, self.tile_size)]
+
+        return rect, width, height, bands, columns, _export_nodes(scene)
+
+    def write(self, filename, snapshot, progress=None):
+        if self.format_name.upper() == "PNG":
+            self._write_png(filename, snapshot, progress)
+        else:
+            self._write_whole(filename, snapshot, progress)
+
+    def _render_bands(self, snapshot, image_format, progress):
+        rect, _, _, bands, columns, nodes = snapshot
+        boxes, members = self._band_members(snapshot)
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for index, (y, band_height) in enumerate(bands):
+                band = members[index]
+                members[index] = None
+                tiles = list(pool.map(
+                    lambda column: self._render_tile(nodes, boxes, band, rect, column[0], y,
+                                                     column[1], band_height, image_format),
+                    columns
+                ))
 
-    def save(self, filename, scene):
-        rect = scene.sceneRect()
-        width = int(rect.width())
-        height = int(rect.height())
+                yield y, band_height, tiles
 
-        image = QImage(width, height, QImage.Format_ARGB32)
+                if progress is not None:
+                    progress((index + 1) * 100 // len(bands))
+
+    def _band_members(self, snapshot):
+        # Границы фигур на сцене и номера фигур, задевающих каждую полосу (по порядку наложения).
+        # Запас в пару пикселей, чтобы сглаженные края не обрезались на стыке тайлов
+        rect, _, _, bands, _, nodes = snapshot
+        margin = 2 / self.scale
+        boxes = []
+        members = [[] for _ in bands]
+
+        for index, (node, box) in enumerate(nodes):
+            left, top, right, bottom = box if box is not None else node.scene_box()
+            boxes.append((left - margin, top - margin, right + margin, bottom + margin))
+
+            first = math.floor((top - margin - rect.y()) * self.scale) // self.tile_size
+            last = math.floor((bottom + margin - rect.y()) * self.scale) // self.tile_size
+            for band in range(max(0, first), min(len(bands) - 1, last) + 1):
+                members[band].append(index)
+        return boxes, members
+
+    def _render_tile(self, nodes, boxes, band, rect, x, y, width, height, image_format):
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
 
         if self.background == "transparent":
             image.fill(QColor(0, 0, 0, 0))
         else:
             image.fill(QColor(self.background))
 
+        left = rect.x() + x / self.scale
+        right = left + width / self.scale
+
         painter = QPainter(image)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setBrush(Qt.NoBrush)
+        painter.translate(-x, -y)
+        painter.scale(self.scale, self.scale)
+        painter.translate(-rect.x(), -rect.y())
+        base = painter.worldTransform()
+
+        for index in band:
+            box = boxes[index]
+            if box[2] >= left and box[0] <= right:
+                _draw_node(painter, nodes[index][0], base)
+        painter.end()
+
+        return image.convertToFormat(image_format)
+
+    def _write_png(self, filename, snapshot, progress):
+        _, width, height, _, _, _ = snapshot
+        has_alpha = self.background == "transparent"
+        image_format = QImage.Format_RGBA8888 if has_alpha else QImage.Format_RGB888
+        bytes_per_pixel = 4 if has_alpha else 3
+
+        try:
+            with FileManager.atomic_open(filename, 'wb') as f:
+                writer = PngStreamWriter(f, width, height, has_alpha, dpi=96 * self.scale)
+
+                for _, band_height, tiles in self._render_bands(snapshot, image_format, progress):
+                    for row in range(band_height):
+                        writer.write_row(b"".join(
+                            bytes(tile.constScanLine(row))[:tile.width() * bytes_per_pixel]
+                            for tile in tiles
+                        ))
 
-        scene.render(painter, QRectF(image.rect()), rect)
+                writer.close()
+        except OSError as e:
+            raise IOError(f"Не удалось сохранить: {e}")
 
+    def _write_whole(self, filename, snapshot, progress):
+        _, width, height, _, columns, _ = snapshot
+        image = QImage(width, height, QImage.Format_RGB32)
+        dots_per_meter = round(96 * self.scale / 0.0254)
+        image.setDotsPerMeterX(dots_per_meter)
+        image.setDotsPerMeterY(dots_per_meter)
+
+        painter = QPainter(image)
+        for y, _, tiles in self._render_bands(snapshot, QImage.Format_RGB32, progress):
+            for (x, _), tile in zip(columns, tiles):
+                painter.drawImage(x, y, tile)
         painter.end()
 
-        image.save(filename, self.format_name)
\ No newline at end of file
+        # Кодирование - самая долгая часть, она идёт в фоне. Кодировщик пишет
+        # прямо во временный файл atomic_open, без копии кадра в памяти
+        try:
+            with FileManager.atomic_open(filename, 'wb') as f:
+                device = QFile()
+                if not device.open(f.fileno(), QIODevice.OpenModeFlag.WriteOnly,
+                                   QFileDevice.FileHandleFlag.DontCloseHandle):
+                    raise OSError(device.errorString())
+                encoded = image.save(device, self.format_name)
+                device.close()
+                if not encoded:
+                    raise IOError(f"Не удалось закодировать изображение в {self.format_name}")
+        except OSError as e:
+            raise IOError(f"Не удалось сохранить: {e}")
+
+
+def _export_nodes(scene) -> list:
+    # Фигуры верхнего уровня в порядке наложения: (запись, границы на сцене или None).
+    # Элемент с произвольным transform() запись не передаёт - он записывается в QPicture
+    document = getattr(scene, "document", None)
+    nodes = []
+    for item in document.nodes() if document is not None else top_level_items(scene):
+        if isinstance(item, ShapeRecord):
+            nodes.append((item, item.box))
+        elif hasattr(item, "type_name"):
+            record = ShapeRecord.from_item(item)
+            if record is not None:
+                nodes.append((record, None))
+            else:
+                rect = item.sceneBoundingRect()
+                nodes.append((_picture(item), (rect.left(), rect.top(), rect.right(), rect.bottom())))
+    return nodes
+
+
+def _picture(item) -> QPicture:
+    # Контуры фигуры (у группы - всех её фигур) в координатах сцены
+    picture = QPicture()
+    painter = QPainter(picture)
+    painter.setBrush(Qt.NoBrush)
+    stack = [item]
+    while stack:
+        node = stack.pop()
+        if node.type_name == "group":
+            stack.extend(reversed([child for child in node.childItems() if hasattr(child, "type_name")]))
+            continue
+        painter.setTransform(node.sceneTransform())
+        painter.setPen(node.style.pen)
+        painter.drawPath(node.path())
+    painter.end()
+    return picture
+
+
+def _draw_node(painter, node, world):
+    if isinstance(node, QPicture):
+        painter.setTransform(world)
+        painter.drawPicture(0, 0, node)
+        return
+
+    world = node.transform() * world
+    if node.kind == "group":
+        for child in node.children:
+            _draw_node(painter, child, world)
+        return
+
+    painter.setTransform(world)
+    painter.setPen(node.style.pen)
+    node.draw(painter)
@@ -0,0 +1,448 @@
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+from PySide6.QtGui import QColor
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.polyline import anchored
+from src.logic.shape_logic.shapes import next_uid
+from src.logic.virtual_document import ShapeRecord
+
+# Импорт SVG потоком: iterparse отдаёт элементы по мере чтения, разобранные
+# сразу удаляются из дерева, поэтому память не растёт с размером файла.
+# Матрица преобразования считается один раз на группу (<g>), элемент без
+# своего transform берёт готовое размещение группы.
+#
+# Группа SVG становится Group, но пока она открыта, её дети копятся в памяти.
+# Если детей больше GROUP_LIMIT (обычно это обёртка вокруг всего рисунка),
+# группа распускается: дети уходят на уровень выше по мере чтения.
+GROUP_LIMIT = 1000
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Не рисуются сами по себе - пропускаем вместе с содержимым
+SKIPPED = {"defs", "symbol", "clipPath", "mask", "pattern", "marker", "metadata", "title", "desc",
+           "linearGradient", "radialGradient", "filter", "style", "script"}
+UNSUPPORTED = {"text", "image", "use", "foreignObject"}
+CONTAINERS = {"svg", "g", "a", "switch"}
+STYLE_KEYS = ("stroke", "stroke-width", "fill", "display")
+
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+PATH_TOKEN = re.compile(r"([MmLlHhVvZzCcSsQqTtAa])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+CSS_RULE = re.compile(r"([^{}]+)\{([^}]*)\}")
+RGB = re.compile(r"rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)")
+
+
+class _Frame:
+    # Открытый элемент-контейнер: итоговая матрица, унаследованный стиль и,
+    # для <g>, накопленные дети (None - группа не строится или распущена)
+    __slots__ = ("ctm", "style", "children", "skip", "_placement")
+
+    def __init__(self, ctm, style, children=None, skip=False):
+        self.ctm = ctm
+        self.style = style
+        self.children = children
+        self.skip = skip
+        self._placement = None
+
+    def placement(self):
+        if self._placement is None:
+            self._placement = _placement(self.ctm)
+        return self._placement
+
+
+class SvgImporter:
+    def __init__(self, records: bool = False):
+        # records - отдавать записи виртуального документа вместо фигур
+        self.records = records
+        self._frames = []
+        self._ready = []
+        self._class_rules = {}
+        self._tag_rules = {}
+
+    @staticmethod
+    def iter_project(filename: str, records: bool = False):
+        # Те же записи, что и у VecFormat.iter_project, плюс ("error", текст, байты)
+        # для пропущенных элементов
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"Файл не найден: {filename}")
+
+        try:
+            with open(filename, 'rb') as f:
+                yield from SvgImporter(records).read(f)
+        except ET.ParseError as e:
+            raise ValueError(f"Файл повреждён или имеет неверный формат: {e}")
+        except OSError as e:
+            raise IOError(f"Ошибка чтения файла: {e}")
+
+    def read(self, f):
+        root = None
+        parents = []
+
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            tag = element.tag.rsplit("}", 1)[-1]
+
+            if event == "start":
+                if root is None:
+                    root = element
+                    if tag != "svg":
+                        raise ValueError("Это не SVG-файл")
+                    yield "scene", _scene_size(element), f.tell()
+
+                error = self._start(tag, element)
+                if error is not None:
+                    yield "error", error, f.tell()
+                parents.append(element)
+            else:
+                parents.pop()
+                self._end(tag, element)
+
+                # Разобранный элемент больше не нужен: отцепляем его от родителя
+                element.clear()
+                if parents:
+                    parents[-1].remove(element)
+
+            if self._ready:
+                position = f.tell()
+                for node in self._ready:
+                    yield ("record" if self.records else "item"), node, position
+                self._ready.clear()
+
+    def _start(self, tag, element):
+        parent = self._frames[-1] if self._frames else _Frame(IDENTITY, {})
+        if parent.skip or tag in SKIPPED:
+            self._frames.append(_Frame(parent.ctm, parent.style, skip=True))
+            return None
+
+        style = self._style(tag, element, parent.style)
+        if style.get("display") == "none":
+            self._frames.append(_Frame(parent.ctm, style, skip=True))
+            return None
+
+        ctm = parent.ctm
+        transform = element.get("transform")
+        if tag == "svg" and self._frames:
+            # Вложенный <svg> - сдвиг на x, y
+            ctm = _multiply(ctm, (1.0, 0.0, 0.0, 1.0, _length(element.get("x")), _length(element.get("y"))))
+        if transform:
+            ctm = _multiply(ctm, _parse_transform(transform))
+
+        if tag in CONTAINERS:
+            self._frames.append(_Frame(ctm, style, [] if tag == "g" else None))
+            return None
+
+        # Листовые элементы тоже попадают в стек, чтобы _end был симметричным
+        self._frames.append(_Frame(ctm, style, skip=True))
+        if tag in UNSUPPORTED:
+            return f"<{tag}> не поддерживается"
+
+        try:
+            placement = parent.placement() if ctm is parent.ctm else _placement(ctm)
+            node = self._shape(tag, element, style, ctm, placement)
+        except ValueError as e:
+            return f"<{tag}>: {e}"
+
+        if node is not None:
+            self._emit(node, len(self._frames) - 1)
+        return None
+
+    def _end(self, tag, element):
+        frame = self._frames.pop()
+        if tag == "style" and not (self._frames and self._frames[-1].skip):
+            self._parse_css(element.text or "")
+        if frame.skip or not frame.children:
+            return
+
+        self._emit(self._group(frame.children), len(self._frames))
+
+    def _emit(self, node, level):
+        # Узел уходит в ближайшую собираемую группу ниже level или на верхний уровень
+        for i in range(level - 1, -1, -1):
+            frame = self._frames[i]
+            if frame.children is None:
+                continue
+
+            frame.children.append(node)
+            if len(frame.children) > GROUP_LIMIT:
+                children, frame.children = frame.children, None
+                for child in children:
+                    self._emit(child, i)
+            return
+
+        self._ready.append(node)
+
+    def _group(self, children):
+        if self.records:
+            return ShapeRecord(next_uid(), "group", 0.0, 0.0, color=None, width=0, children=children)
+
+        group = ShapeFactory.from_record("group", 0.0, 0.0)
+        for child in children:
+            group.addToGroup(child)
+        return group
+
+    def _shape(self, tag, element, style, ctm, placement):
+        color = _color(style)
+        width = _length(style.get("stroke-width"), 1.0)
+
+        if tag == "line":
+            return self._line(ctm, width, color, *(_length(element.get(name)) for name in ("x1", "y1", "x2", "y2")))
+        if tag in ("polyline", "polygon"):
+            values = [float(value) for value in NUMBER.findall(element.get("points", ""))]
+            points = list(zip(values[0::2], values[1::2]))
+            if tag == "polygon" and len(points) > 2:
+                points.append(points[0])
+            return self._polyline([points], ctm, width, color)
+        if tag == "path":
+            return self._polyline(_parse_path(element.get("d", "")), ctm, width, color)
+
+        if tag == "rect":
+            kind = "rect"
+            x, y = _length(element.get("x")), _length(element.get("y"))
+            w, h = _length(element.get("width")), _length(element.get("height"))
+        elif tag == "circle":
+            kind = "ellipse"
+            r = _length(element.get("r"))
+            x, y, w, h = _length(element.get("cx")) - r, _length(element.get("cy")) - r, 2 * r, 2 * r
+        elif tag == "ellipse":
+            kind = "ellipse"
+            rx, ry = _length(element.get("rx")), _length(element.get("ry"))
+            x, y, w, h = _length(element.get("cx")) - rx, _length(element.get("cy")) - ry, 2 * rx, 2 * ry
+        else:
+            return None
+
+        if w <= 0 or h <= 0:
+            return None
+
+        axis, px, py, rotation, scale, sx, sy = placement
+        # Растяжение и отражение по осям переносим в геометрию, иначе перо
+        # масштабирует сама фигура (а отражать фигуры редактор не умеет)
+        x, w = _stretched(x, w, sx)
+        y, h = _stretched(y, h, sy)
+        if axis:
+            width *= math.sqrt(abs(sx * sy))
+        return self._create(kind, px, py, x, y, w, h, color, width, rotation, scale)
+
+    def _line(self, ctm, width, color, x1, y1, x2, y2):
+        # Концы линии переводим на сцену точно при любой матрице
+        a, b, c, d, e, f = ctm
+        return self._create("line", 0.0, 0.0, a * x1 + c * y1 + e, b * x1 + d * y1 + f,
+                            a * x2 + c * y2 + e, b * x2 + d * y2 + f,
+                            color, width * math.sqrt(abs(a * d - b * c)), 0.0, 1.0)
+
+    def _polyline(self, subpaths, ctm, width, color):
+        # Каждый подпуть - одна ломаная, точки переводим на сцену, как у линии
+        a, b, c, d, e, f = ctm
+        width = max(1, round(width * math.sqrt(abs(a * d - b * c))))
+        shapes = []
+        for points in subpaths:
+            if len(points) < 2:
+                continue
+            px, py, local = anchored([value for x, y in points for value in (a * x + c * y + e, b * x + d * y + f)])
+            if self.records:
+                shapes.append(ShapeRecord(next_uid(), "polyline", px, py, color=color, width=width, points=local))
+            else:
+                shapes.append(ShapeFactory.from_record("polyline", px, py, local, color=color, width=width))
+
+        if not shapes:
+            return None
+        return shapes[0] if len(shapes) == 1 else self._group(shapes)
+
+    def _create(self, kind, px, py, a, b, c, d, color, width, rotation, scale):
+        width = max(1, round(width))
+        if self.records:
+            return ShapeRecord(next_uid(), kind, px, py, a, b, c, d, color, width, rotation, scale)
+        return ShapeFactory.from_record(kind, px, py, a, b, c, d, color, width, rotation, scale)
+
+    def _style(self, tag, element, inherited):
+        # Приоритет: style="" > правила классов > правила тегов > атрибуты > родитель
+        style = dict(inherited)
+        for key in STYLE_KEYS:
+            value = element.get(key)
+            if value is not None:
+                style[key] = value.strip()
+
+        style.update(self._tag_rules.get(tag, ()))
+        for name in (element.get("class") or "").split():
+            style.update(self._class_rules.get(name, ()))
+
+        inline = element.get("style")
+        if inline:
+            style.update(_declarations(inline))
+        return style
+
+    def _parse_css(self, text):
+        # Только простые селекторы: .класс и тег
+        for selectors, body in CSS_RULE.findall(text):
+            declarations = _declarations(body)
+            for selector in selectors.split(","):
+                selector = selector.strip()
+                if selector.startswith(".") and selector[1:].replace("-", "").replace("_", "").isalnum():
+                    self._class_rules.setdefault(selector[1:], {}).update(declarations)
+                elif selector.isalpha():
+                    self._tag_rules.setdefault(selector, {}).update(declarations)
+
+
+def _scene_size(element) -> dict:
+    view_box = [float(value) for value in NUMBER.findall(element.get("viewBox", ""))]
+    if len(view_box) == 4:
+        return {"width": view_box[2], "height": view_box[3]}
+    return {"width": _length(element.get("width"), 800.0), "height": _length(element.get("height"), 600.0)}
+
+
+def _declarations(text) -> dict:
+    result = {}
+    for declaration in text.split(";"):
+        key, _, value = declaration.partition(":")
+        key = key.strip()
+        if key in STYLE_KEYS:
+            result[key] = value.strip()
+    return result
+
+
+def _color(style) -> str:
+    # В редакторе нет заливки: без обводки берём цвет заливки (по умолчанию в SVG - чёрный)
+    for key, default in (("stroke", "none"), ("fill", "black")):
+        value = style.get(key, default)
+        if value in ("none", "transparent"):
+            continue
+        if value == "currentColor":
+            return "black"
+
+        match = RGB.fullmatch(value)
+        if match:
+            return "#{:02x}{:02x}{:02x}".format(*(min(255, int(part)) for part in match.groups()))
+        if QColor(value).isValid():
+            return value
+    return "black"
+
+
+def _length(value, default: float = 0.0) -> float:
+    # Единицы измерения (px, mm, ...) не пересчитываем - берём число как есть
+    if value is None:
+        return default
+    match = NUMBER.match(value.strip())
+    return float(match.group()) if match else default
+
+
+def _multiply(m, n) -> tuple:
+    # m·n в обозначениях SVG (a b c d e f): сначала применяется n
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + c * b2, b * a2 + d * b2,
+            a * c2 + c * d2, b * c2 + d * d2,
+            a * e2 + c * f2 + e, b * e2 + d * f2 + f)
+
+
+def _parse_transform(text) -> tuple:
+    ctm = IDENTITY
+    for name, arguments in TRANSFORM.findall(text):
+        values = [float(value) for value in NUMBER.findall(arguments)]
+        if name == "matrix" and len(values) == 6:
+            m = tuple(values)
+        elif name == "translate" and values:
+            m = (1.0, 0.0, 0.0, 1.0, values[0], values[1] if len(values) > 1 else 0.0)
+        elif name == "scale" and values:
+            m = (values[0], 0.0, 0.0, values[1] if len(values) > 1 else values[0], 0.0, 0.0)
+        elif name == "rotate" and values:
+            radians = math.radians(values[0])
+            cos_a, sin_a = math.cos(radians), math.sin(radians)
+            m = (cos_a, sin_a, -sin_a, cos_a, 0.0, 0.0)
+            if len(values) == 3:
+                cx, cy = values[1], values[2]
+                m = _multiply(_multiply((1.0, 0.0, 0.0, 1.0, cx, cy), m), (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        elif name == "skewX" and values:
+            m = (1.0, 0.0, math.tan(math.radians(values[0])), 1.0, 0.0, 0.0)
+        elif name == "skewY" and values:
+            m = (1.0, math.tan(math.radians(values[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        ctm = _multiply(ctm, m)
+    return ctm
+
+
+def _placement(ctm) -> tuple:
+    # (по осям?, pos x, pos y, поворот, масштаб, растяжение x, растяжение y).
+    # Фигуры редактора умеют только поворот с равномерным масштабом; растяжение
+    # по осям (и отражение) уходит в геометрию, а наклон приближается ближайшим
+    # поворотом
+    a, b, c, d, e, f = ctm
+    if b == 0 and c == 0 and a != 0 and d != 0:
+        return True, e, f, 0.0, 1.0, a, d
+
+    # Матрица с отражением (det < 0) - это отражение y -> -y в геометрии, а
+    # затем матрица (a, b, -c, -d) уже без отражения
+    det = a * d - b * c
+    sy = -1.0 if det < 0 else 1.0
+    rotation = math.degrees(math.atan2(b, a)) % 360.0
+    scale = math.sqrt(abs(det)) or 1.0
+    return False, e, f, rotation, scale, 1.0, sy
+
+
+def _stretched(start: float, size: float, factor: float) -> tuple:
+    # Отрезок [start, start + size] после умножения на factor: начало и длина >= 0
+    p1, p2 = start * factor, (start + size) * factor
+    return min(p1, p2), abs(p2 - p1)
+
+
+def _parse_path(text) -> list:
+    # Простые пути из отрезков: M, L, H, V, Z (и относительные варианты)
+    subpaths = []
+    points = None
+    command = None
+    x = y = 0.0
+    numbers = []
+
+    def flush_numbers():
+        nonlocal x, y, points
+        if command in "Zz":
+            if numbers:
+                raise ValueError("лишние числа после Z")
+            return
+
+        relative = command.islower()
+        upper = command.upper()
+        arity = 1 if upper in "HV" else 2
+        if len(numbers) % arity or not numbers:
+            raise ValueError(f"неверное число координат для {command}")
+
+        for i in range(0, len(numbers), arity):
+            if upper == "H":
+                x = numbers[i] + (x if relative else 0.0)
+            elif upper == "V":
+                y = numbers[i] + (y if relative else 0.0)
+            else:
+                dx, dy = numbers[i], numbers[i + 1]
+                x, y = (x + dx, y + dy) if relative else (dx, dy)
+
+            if upper == "M" and i == 0:
+                points = [(x, y)]
+                subpaths.append(points)
+            else:
+                if points is None:
+                    raise ValueError("путь не начинается с M")
+                points.append((x, y))
+
+    for letter, number in PATH_TOKEN.findall(text):
+        if number:
+            if command is None:
+                raise ValueError("путь не начинается с команды")
+            numbers.append(float(number))
+            continue
+
+        if command is not None:
+            flush_numbers()
+        numbers.clear()
+        if letter in "CcSsQqTtAa":
+            raise ValueError("кривые не поддерживаются")
+
+        if letter in "Zz" and points:
+            # Замыкание: текущей точкой снова становится начало контура
+            points.append(points[0])
+            x, y = points[0]
+            points = [(x, y)]
+            subpaths.append(points)
+        command = letter
+
+    if command is not None:
+        flush_numbers()
+    return subpaths
@@ -0,0 +1,145 @@
+import math
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QTransform
+from src.logic.vec_format import KIND_GROUP, KIND_NAMES, KIND_POLYLINE
+
+# SVG пишется потоком из колонок VecFormat.columns(): узел за узлом, строки
+# копятся пачками по CHUNK_LINES и сразу уходят в файл, дерева документа в
+# памяти нет - сверх самих колонок запись держит одну пачку строк.
+# Повторяющиеся перья - общие CSS-классы .s<номер стиля>.
+CHUNK_LINES = 1024
+SVG_NS = "http://www.w3.org/2000/svg"
+# Перо Qt по умолчанию: квадратные концы, скошенные стыки, без заливки
+BASE_STYLE = "line,rect,ellipse,polyline{fill:none;stroke-linecap:square;stroke-linejoin:bevel}"
+SQUARE_CAP = math.sqrt(2) / 2
+
+
+def write_svg(file, columns, bounds, progress=None):
+    styles, kinds = columns[0], columns[1]
+    total = len(styles) + len(kinds) or 1
+    lines = []
+
+    for count, line in enumerate(iter_svg(columns, bounds), 1):
+        lines.append(line)
+        if len(lines) >= CHUNK_LINES:
+            file.write("".join(lines))
+            lines.clear()
+            if progress is not None:
+                progress(min(99, count * 100 // total))
+
+    file.write("".join(lines))
+    if progress is not None:
+        progress(100)
+
+
+def iter_svg(columns, bounds):
+    styles, kinds, style_ids, parents, uids, coords, rotations, point_counts, points = columns
+    x, y, width, height = bounds
+    if width <= 0 or height <= 0:
+        x, y, width, height = 0.0, 0.0, 1.0, 1.0
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield (f'<svg xmlns="{SVG_NS}" width="{_num(width)}" height="{_num(height)}" '
+           f'viewBox="{_num(x)} {_num(y)} {_num(width)} {_num(height)}">\n')
+
+    yield f"<style>\n{BASE_STYLE}\n"
+    for style_id, (rgb, stroke_width) in enumerate(styles):
+        yield f".s{style_id}{{{_stroke(rgb, stroke_width)}}}\n"
+    yield "</style>\n"
+
+    # Узлы идут в порядке обхода: группа перед детьми. Открытые группы - стек,
+    # </g> закрывает группу, как только следующий узел не её потомок
+    open_groups = []
+    point_offset = 0
+    for i in range(len(kinds)):
+        parent = parents[i]
+        while open_groups and open_groups[-1] != parent:
+            open_groups.pop()
+            yield "</g>\n"
+
+        px, py, a, b, c, d = coords[6 * i:6 * i + 6]
+        transform = _transform(px, py, rotations[2 * i], rotations[2 * i + 1])
+        kind = kinds[i]
+
+        if kind == KIND_GROUP:
+            open_groups.append(i)
+            yield f"<g{transform}>\n"
+            continue
+
+        name = KIND_NAMES[kind]
+        style = f' class="s{style_ids[i]}"'
+        if kind == KIND_POLYLINE:
+            end = point_offset + 2 * point_counts[i]
+            values = points[point_offset:end]
+            point_offset = end
+            pairs = " ".join(f"{_num(values[j])},{_num(values[j + 1])}" for j in range(0, len(values), 2))
+            yield f'<polyline points="{pairs}"{style}{transform}/>\n'
+        elif name == "line":
+            yield f'<line x1="{_num(a)}" y1="{_num(b)}" x2="{_num(c)}" y2="{_num(d)}"{style}{transform}/>\n'
+        elif name == "rect":
+            # Qt допускает отрицательные размеры, SVG - нет
+            yield (f'<rect x="{_num(min(a, a + c))}" y="{_num(min(b, b + d))}" '
+                   f'width="{_num(abs(c))}" height="{_num(abs(d))}"{style}{transform}/>\n')
+        else:
+            yield (f'<ellipse cx="{_num(a + c / 2)}" cy="{_num(b + d / 2)}" '
+                   f'rx="{_num(abs(c) / 2)}" ry="{_num(abs(d) / 2)}"{style}{transform}/>\n')
+
+    for _ in open_groups:
+        yield "</g>\n"
+    yield "</svg>\n"
+
+
+def column_bounds(columns) -> tuple:
+    # Габариты узлов на сцене вместе с пером, (x, y, w, h): с небольшим запасом
+    # покрывают scene_utils.content_rect(), но считаются по колонкам, без сцены
+    styles, kinds, style_ids, parents, uids, coords, rotations, point_counts, points = columns
+    group_transforms = {}
+    bounds = QRectF()
+
+    for i in range(len(kinds)):
+        px, py, a, b, c, d = coords[6 * i:6 * i + 6]
+        transform = QTransform.fromTranslate(px, py)
+        if rotations[2 * i]:
+            transform.rotate(rotations[2 * i])
+        if rotations[2 * i + 1] != 1.0:
+            transform.scale(rotations[2 * i + 1], rotations[2 * i + 1])
+        if parents[i] >= 0:
+            transform *= group_transforms[parents[i]]
+
+        if kinds[i] == KIND_GROUP:
+            group_transforms[i] = transform
+            continue
+
+        if KIND_NAMES[kinds[i]] == "line":
+            rect = QRectF(min(a, c), min(b, d), abs(c - a), abs(d - b))
+        else:
+            rect = QRectF(a, b, c, d).normalized()
+        # Квадратный конец пера выступает за вершину до половины толщины * sqrt(2)
+        pad = styles[style_ids[i]][1] * SQUARE_CAP
+        bounds = bounds.united(transform.mapRect(rect.adjusted(-pad, -pad, pad, pad)))
+
+    return bounds.x(), bounds.y(), bounds.width(), bounds.height()
+
+
+def _stroke(rgb: int, width: int) -> str:
+    if width == 0:
+        # Толщина 0 в Qt - "косметическое" перо в 1 пиксель при любом масштабе
+        return f"stroke:#{rgb:06x};stroke-width:1;vector-effect:non-scaling-stroke"
+    return f"stroke:#{rgb:06x};stroke-width:{width}"
+
+
+def _transform(px: float, py: float, rotation: float, scale: float) -> str:
+    # Qt поворачивает и масштабирует вокруг локального (0, 0), затем сдвигает на pos
+    parts = []
+    if px or py:
+        parts.append(f"translate({_num(px)} {_num(py)})")
+    if rotation:
+        parts.append(f"rotate({_num(rotation)})")
+    if scale != 1.0:
+        parts.append(f"scale({_num(scale)})")
+    return f' transform="{" ".join(parts)}"' if parts else ""
+
+
+def _num(value: float) -> str:
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
@@ -1,58 +1,96 @@
 from src.logic.shape_logic.factory import ShapeFactory
 from src.logic.tools_logic.tools import Tool
 from src.logic.commands.commands import AddShapeCommand
-from PySide6.QtCore import Qt
+from src.logic.scene_utils import frame_interval
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QPen, QColor, QPainterPath
 
 class CreationTool(Tool):
+    # Пока кнопка зажата, фигура рисуется только как контур в переднем слое вида:
+    # сцена и её индекс не трогаются, а движения мыши копятся до следующего кадра
     def __init__(self, canvas_view, shape_type: str, undo_stack, color: str = "black"):
         super().__init__(canvas_view)
         self.shape_type = shape_type
         self.undo_stack = undo_stack
         self.color = color
         self.start_pos = None
-        self.temp_shape = None
+        self.current_pos = None
+
+        self.preview_path = QPainterPath()
+        self.preview_pen = QPen(QColor(color), 2)
+
+        self._frame_timer = QTimer(canvas_view)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._update_preview)
 
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
-            self.start_pos = self.view.mapToScene(event.pos())
-
-            try:
-                self.temp_shape = ShapeFactory.create_shape(
-                    self.shape_type,
-                    self.start_pos,
-                    self.start_pos,
-                    self.color
-                )
-                self.scene.addItem(self.temp_shape)
-            except ValueError as e:
-                print(e)
+            self.start_pos = self._snapped(event)
+            self.current_pos = self.start_pos
+            self.preview_pen = QPen(QColor(self.color), 2)
 
     def mouse_move(self, event):
-        if self.temp_shape and self.start_pos:
-            current_pos = self.view.mapToScene(event.pos())
-            self.temp_shape.set_geometry(self.start_pos, current_pos)
+        if self.start_pos is None:
+            return
+
+        # Берём только последнее положение, перерисовка - не чаще раза за кадр
+        self.current_pos = self._snapped(event)
+        if not self._frame_timer.isActive():
+            self._frame_timer.start(frame_interval(self.view))
 
     def mouse_release(self, event):
-        if self.temp_shape:
-            self.scene.removeItem(self.temp_shape)
-            self.temp_shape = None
+        if event.button() != Qt.LeftButton or self.start_pos is None:
+            return
 
-            end_pos = self.view.mapToScene(event.pos())
-            try:
-                final_shape = ShapeFactory.create_shape(
-                    self.shape_type, self.start_pos, end_pos, "black"
-                )
+        end_pos = self._snapped(event)
+        start_pos = self.start_pos
+        self.cancel()
 
-                command = AddShapeCommand(self.scene, final_shape)
-                self.undo_stack.push(command)
+        try:
+            final_shape = ShapeFactory.create_shape(self.shape_type, start_pos, end_pos, self.color)
 
-                print(f"Command pushed: {command.text()}")
-            except ValueError as e:
-                print("daun)")
-                print(e)
+            command = AddShapeCommand(self.scene, final_shape)
+            self.undo_stack.push(command)
 
-        '''
-        if event.button() == Qt.LeftButton:
-            self.start_pos = None
-            self.temp_shape = None
-        '''
\ No newline at end of file
+            print(f"Command pushed: {command.text()}")
+        except ValueError as e:
+            print(e)
+
+    def cancel(self):
+        self._frame_timer.stop()
+        self.start_pos = None
+        self.current_pos = None
+        self._set_preview(QPainterPath())
+        self.view.clear_snap()
+
+    def draw_foreground(self, painter, rect):
+        if self.preview_path.isEmpty():
+            return
+
+        painter.setPen(self.preview_pen)
+        painter.setBrush(Qt.NoBrush)
+        painter.drawPath(self.preview_path)
+
+    def _snapped(self, event):
+        # Alt временно отключает привязку
+        return self.view.snap_point(self.view.mapToScene(event.pos()),
+                                    free=bool(event.modifiers() & Qt.AltModifier))
+
+    def _update_preview(self):
+        if self.start_pos is None:
+            return
+
+        try:
+            self._set_preview(ShapeFactory.preview_path(self.shape_type, self.start_pos, self.current_pos))
+        except ValueError as e:
+            print(e)
+
+    def _set_preview(self, path):
+        # Перерисовываем только область старого и нового контура
+        margin = self.preview_pen.widthF() + 2
+        dirty = self.preview_path.boundingRect() | path.boundingRect()
+        self.preview_path = path
+
+        if not dirty.isNull():
+            area = self.view.mapFromScene(dirty.adjusted(-margin, -margin, margin, margin)).boundingRect()
+            self.view.viewport().update(area.adjusted(-2, -2, 2, 2))
@@ -0,0 +1,66 @@
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.polyline import Polyline
+from src.logic.tools_logic.creation_tool import CreationTool
+from src.logic.commands.commands import AddShapeCommand
+from src.logic.simplify import StreamSimplifier, simplify
+from src.logic.scene_utils import frame_interval
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPen, QColor, QPainterPath
+
+class FreehandTool(CreationTool):
+    # Штрих упрощается по мере рисования (src/logic/simplify.py): в превью и в
+    # фигуре остаются только вершины, от пути мыши ломаная отходит не больше
+    # чем на tolerance пикселей экрана. Привязка к штриху не применяется
+    def __init__(self, canvas_view, undo_stack, color: str = "black", tolerance: float = 1.5):
+        super().__init__(canvas_view, "polyline", undo_stack, color)
+        self.tolerance = tolerance
+        self.simplifier = None
+
+    def mouse_press(self, event):
+        if event.button() != Qt.LeftButton:
+            return
+
+        pos = self.view.mapToScene(event.pos())
+        self.start_pos = pos
+        self.preview_pen = QPen(QColor(self.color), 2)
+        self.simplifier = StreamSimplifier(self.tolerance / self.view.zoom())
+        self.simplifier.add(pos.x(), pos.y())
+
+    def mouse_move(self, event):
+        if self.simplifier is None:
+            return
+
+        pos = self.view.mapToScene(event.pos())
+        self.simplifier.add(pos.x(), pos.y())
+        if not self._frame_timer.isActive():
+            self._frame_timer.start(frame_interval(self.view))
+
+    def mouse_release(self, event):
+        if event.button() != Qt.LeftButton or self.simplifier is None:
+            return
+
+        pos = self.view.mapToScene(event.pos())
+        self.simplifier.add(pos.x(), pos.y())
+        points = simplify(self.simplifier.points(), self.simplifier.tolerance)
+        self.cancel()
+
+        if len(points) < 4:
+            # Клик без движения - рисовать нечего
+            return
+
+        final_shape = ShapeFactory.create_polyline(points, self.color)
+        command = AddShapeCommand(self.scene, final_shape)
+        self.undo_stack.push(command)
+
+        print(f"Command pushed: {command.text()}")
+
+    def cancel(self):
+        self.simplifier = None
+        super().cancel()
+
+    def _update_preview(self):
+        if self.simplifier is None:
+            return
+
+        points = self.simplifier.points()
+        self._set_preview(Polyline.build_path(points) if len(points) >= 4 else QPainterPath())
@@ -1,7 +1,8 @@
 from src.logic.tools_logic.tools import Tool
-from src.logic.commands.commands import MoveCommand
-from PySide6.QtWidgets import QGraphicsView
-from PySide6.QtCore import Qt
+from src.logic.commands.commands import BatchMoveCommand
+from src.logic.spatial_index import top_level
+from PySide6.QtWidgets import QGraphicsView, QRubberBand
+from PySide6.QtCore import Qt, QRect
 
 class SelectionTool(Tool):
     def __init__(self, canvas_view, undo_stack):
@@ -9,31 +10,65 @@ class SelectionTool(Tool):
         self.undo_stack = undo_stack
 
         self.item_positions = {}
+        # Перетаскиваемые фигуры верхнего уровня и их опорные точки до начала движения
+        self.moving = set()
+        self.drag_points = []
+
+        self.rubber_band = None
+        self.rubber_origin = None
 
     def mouse_press(self, event):
+        item = self.view.spatial_index.item_at(self.view.mapToScene(event.pos()))
+
+        if item is None and event.button() == Qt.LeftButton:
+            # Рамка выделения по пустому месту, выборка через пространственный индекс
+            if not (event.modifiers() & Qt.ControlModifier):
+                self.scene.clearSelection()
+
+            self.rubber_origin = event.pos()
+            if self.rubber_band is None:
+                self.rubber_band = QRubberBand(QRubberBand.Rectangle, self.view.viewport())
+            self.rubber_band.setGeometry(QRect(self.rubber_origin, self.rubber_origin))
+            self.rubber_band.show()
+            return
+
         QGraphicsView.mousePressEvent(self.view, event)
 
-        if self.view.scene.itemAt(self.view.mapToScene(event.pos()), self.view.transform()):
+        if item:
             self.view.setCursor(Qt.ClosedHandCursor)
 
         self.item_positions.clear()
         for item in self.scene.selectedItems():
             self.item_positions[item] = item.pos()
 
+        self.moving = {top_level(item) for item in self.item_positions}
+        self.drag_points = self.view.snapper.drag_points(self.moving) if self.view.snapper.enabled else []
+
     def mouse_move(self, event):
+        if self.rubber_origin is not None:
+            self.rubber_band.setGeometry(QRect(self.rubber_origin, event.pos()).normalized())
+            return
+
         QGraphicsView.mouseMoveEvent(self.view, event)
 
-        item = self.view.itemAt(event.pos())
+        if event.buttons() & Qt.LeftButton and self.drag_points:
+            self._snap_drag(event)
 
         if not (event.buttons() & Qt.LeftButton):
+            item = self.view.spatial_index.item_at(self.view.mapToScene(event.pos()))
             if item:
                 self.view.setCursor(Qt.OpenHandCursor)
             else:
                 self.view.setCursor(Qt.ArrowCursor)
 
     def mouse_release(self, event):
+        if self.rubber_origin is not None:
+            self._finish_rubber_band(event)
+            return
+
         QGraphicsView.mouseReleaseEvent(self.view, event)
         self.view.setCursor(Qt.ArrowCursor)
+        self.view.clear_snap()
 
         moved_items = []
         for item, start in self.item_positions.items():
@@ -42,11 +77,37 @@ class SelectionTool(Tool):
                 moved_items.append((item, start, end))
 
         if moved_items:
-            self.undo_stack.beginMacro("Move Items")
+            items, starts, ends = zip(*moved_items)
+            self.undo_stack.push(BatchMoveCommand(self.scene, items, starts, ends))
+
+        self.item_positions.clear()
+        self.moving = set()
+        self.drag_points = []
+
+    def _snap_drag(self, event):
+        # Qt ставит фигуры в начальное положение плюс сдвиг мыши, поэтому
+        # поправка привязки не накапливается от события к событию
+        item = next((item for item in self.item_positions if item in self.moving), None)
+        if item is None or item.pos() == self.item_positions[item]:
+            return
+
+        delta = item.pos() - self.item_positions[item]
+        dx, dy = delta.x(), delta.y()
+        points = [value + (dx if i % 2 == 0 else dy) for i, value in enumerate(self.drag_points)]
+        offset_x, offset_y = self.view.snap_offset(points, self.moving,
+                                                   free=bool(event.modifiers() & Qt.AltModifier))
+        if offset_x or offset_y:
+            for item in self.moving:
+                if item in self.item_positions:
+                    item.moveBy(offset_x, offset_y)
 
-            for item, start, end in moved_items:
-                cmd = MoveCommand(item, start, end)
-                self.undo_stack.push(cmd)
-            self.undo_stack.endMacro()
+    def _finish_rubber_band(self, event):
+        self.rubber_band.hide()
+        rect = QRect(self.rubber_origin, event.pos()).normalized()
+        self.rubber_origin = None
 
-        self.item_positions.clear()
\ No newline at end of file
+        area = self.view.mapToScene(rect).boundingRect()
+        for item in self.view.spatial_index.items_in(area):
+            # Как у Qt по умолчанию: выделяем только целиком попавшие фигуры
+            if area.contains(item.sceneBoundingRect()):
+                item.setSelected(True)
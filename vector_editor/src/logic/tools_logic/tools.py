@@ -15,4 +15,10 @@ class Tool(ABC):
 
     @abstractmethod
     def mouse_release(self, event):
-        pass
\ No newline at end of file
+        pass
+
+    def draw_foreground(self, painter, rect):
+        pass
+
+    def cancel(self):
+        pass
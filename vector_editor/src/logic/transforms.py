@@ -0,0 +1,146 @@
+import math
+from array import array
+
+# Состояние выделения - плоский массив по STRIDE чисел на элемент:
+# [x, y, rotation, scale, ...]. Поворот и масштаб задаются относительно
+# локального (0, 0) элемента (transformOriginPoint не меняется), поэтому
+# поворот/масштаб группы вокруг точки сводится к пересчёту этих четырёх чисел.
+STRIDE = 4
+
+ALIGN_MODES = ("left", "hcenter", "right", "top", "vcenter", "bottom")
+
+
+def capture(items) -> array:
+    state = array('d')
+    for item in items:
+        pos = item.pos()
+        state.extend((pos.x(), pos.y(), item.rotation(), item.scale()))
+    return state
+
+
+def apply(items, state):
+    for i, item in enumerate(items):
+        x, y, rotation, scale = state[STRIDE * i:STRIDE * i + STRIDE]
+        item.setPos(x, y)
+        if item.rotation() != rotation:
+            item.setRotation(rotation)
+        if item.scale() != scale:
+            item.setScale(scale)
+
+
+def translated(state, dx: float, dy: float) -> array:
+    result = array('d', state)
+    for i in range(0, len(result), STRIDE):
+        result[i] += dx
+        result[i + 1] += dy
+    return result
+
+
+def translated_each(state, offsets) -> array:
+    # offsets - [dx0, dy0, dx1, dy1, ...]
+    result = array('d', state)
+    for i in range(len(result) // STRIDE):
+        result[STRIDE * i] += offsets[2 * i]
+        result[STRIDE * i + 1] += offsets[2 * i + 1]
+    return result
+
+
+def rotated_scaled(state, angle: float, factor: float, px: float, py: float) -> array:
+    # Поворот (в градусах, по часовой, как у Qt) и равномерный масштаб вокруг (px, py)
+    radians = math.radians(angle)
+    cos_a = math.cos(radians) * factor
+    sin_a = math.sin(radians) * factor
+
+    result = array('d', state)
+    for i in range(0, len(result), STRIDE):
+        dx = result[i] - px
+        dy = result[i + 1] - py
+        result[i] = px + dx * cos_a - dy * sin_a
+        result[i + 1] = py + dx * sin_a + dy * cos_a
+        result[i + 2] = (result[i + 2] + angle) % 360.0
+        result[i + 3] *= factor
+    return result
+
+
+def fold_transform(item):
+    # removeFromGroup()/addToGroup() сохраняют положение на сцене через transform()
+    # элемента. Поворот с равномерным масштабом переносим обратно в pos/rotation/scale,
+    # чтобы они попадали в сохранение и в состояние выделения
+    t = item.transform()
+    if t.isIdentity():
+        return
+
+    factor = math.hypot(t.m11(), t.m12())
+    if factor == 0 or not (math.isclose(t.m11(), t.m22(), abs_tol=1e-9)
+                           and math.isclose(t.m12(), -t.m21(), abs_tol=1e-9)):
+        return
+
+    angle = math.degrees(math.atan2(t.m12(), t.m11()))
+    # pos + R·s·(T(p)) = (pos + R·s·t) + R·s·T0(p)
+    radians = math.radians(item.rotation())
+    cos_a = math.cos(radians) * item.scale()
+    sin_a = math.sin(radians) * item.scale()
+    pos = item.pos()
+
+    item.resetTransform()
+    item.setPos(pos.x() + t.dx() * cos_a - t.dy() * sin_a,
+                pos.y() + t.dx() * sin_a + t.dy() * cos_a)
+    item.setRotation((item.rotation() + angle) % 360.0)
+    item.setScale(item.scale() * factor)
+
+
+def bounds(rects):
+    left = min(rect.left() for rect in rects)
+    top = min(rect.top() for rect in rects)
+    right = max(rect.right() for rect in rects)
+    bottom = max(rect.bottom() for rect in rects)
+    return left, top, right, bottom
+
+
+def align_offsets(rects, mode: str) -> array:
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"Unknown align mode: {mode}")
+
+    left, top, right, bottom = bounds(rects)
+    offsets = array('d')
+
+    for rect in rects:
+        dx = dy = 0.0
+        if mode == "left":
+            dx = left - rect.left()
+        elif mode == "right":
+            dx = right - rect.right()
+        elif mode == "hcenter":
+            dx = (left + right) / 2 - rect.center().x()
+        elif mode == "top":
+            dy = top - rect.top()
+        elif mode == "bottom":
+            dy = bottom - rect.bottom()
+        else:
+            dy = (top + bottom) / 2 - rect.center().y()
+        offsets.extend((dx, dy))
+
+    return offsets
+
+
+def distribute_offsets(rects, axis: str) -> array:
+    # Центры равномерно между крайними, порядок элементов по оси сохраняется
+    if axis not in ("horizontal", "vertical"):
+        raise ValueError(f"Unknown axis: {axis}")
+
+    horizontal = axis == "horizontal"
+    centers = [rect.center().x() if horizontal else rect.center().y() for rect in rects]
+    order = sorted(range(len(rects)), key=centers.__getitem__)
+
+    offsets = array('d', bytes(16 * len(rects)))
+    if len(rects) < 3:
+        return offsets
+
+    first, last = centers[order[0]], centers[order[-1]]
+    step = (last - first) / (len(rects) - 1)
+
+    for rank, index in enumerate(order):
+        delta = first + step * rank - centers[index]
+        offsets[2 * index + (0 if horizontal else 1)] = delta
+
+    return offsets
@@ -0,0 +1,300 @@
+import array
+import mmap
+import os
+import struct
+import sys
+from src.logic.io import FileManager
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.shapes import claim_uid
+from src.logic.virtual_document import ShapeRecord
+
+# Формат .vec (little-endian), все секции выровнены по 8 байт:
+#   заголовок   - magic, версия, резерв u16, область сцены f64 x, y, ширина, высота,
+#                 число стилей и узлов
+#   стили       - цвет u32[styles] (0xRRGGBB), толщина u32[styles]
+#   узлы        - тип u8[n], стиль u32[n], родитель i32[n] (-1 - верхний уровень),
+#                 id u32[n], координаты f64[6 * n]: pos x, pos y и 4 числа геометрии,
+#                 преобразования f64[2 * n]: поворот и масштаб,
+#                 число точек u32[n] (не 0 только у ломаных)
+#   точки       - f32[2 * сумма чисел точек]: точки ломаных подряд, в порядке узлов
+# Группа хранится перед своими детьми, поэтому родитель всегда уже создан.
+# У ломаной 4 числа геометрии - прямоугольник её точек.
+# Читается только текущая версия.
+MAGIC = b"VEC1"
+VERSION = 5
+HEADER = struct.Struct("<4sHHddddII")
+
+KIND_GROUP = 0
+KIND_POLYLINE = 4
+KINDS = {"group": KIND_GROUP, "line": 1, "rect": 2, "ellipse": 3, "polyline": KIND_POLYLINE}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+NO_STYLE = 0xFFFFFFFF
+
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class VecFormat:
+    @staticmethod
+    def save(filename: str, scene):
+        VecFormat.write(filename, VecFormat.collect(scene))
+
+    @staticmethod
+    def collect(scene) -> list:
+        # Снимок сцены в виде колонок, которые потом можно записать из другого потока
+        styles, kinds, style_ids, parents, uids, coords, rotations, point_counts, points = VecFormat.columns(scene)
+
+        colors = array.array('I', (color for color, _ in styles))
+        widths = array.array('I', (width for _, width in styles))
+
+        if sys.byteorder != "little":
+            for column in (colors, widths, style_ids, parents, uids, coords, rotations, point_counts, points):
+                column.byteswap()
+
+        rect = scene.sceneRect()
+        header = HEADER.pack(MAGIC, VERSION, 0, rect.x(), rect.y(), rect.width(), rect.height(),
+                             len(styles), len(kinds))
+        return [header, colors, widths, kinds, style_ids, parents, uids, coords, rotations, point_counts, points]
+
+    @staticmethod
+    def columns(scene) -> tuple:
+        # Узлы в порядке обхода (группа перед детьми) и список стилей (0xRRGGBB, толщина);
+        # колонки в порядке байт машины
+        styles = {}
+        kinds = array.array('B')
+        style_ids = array.array('I')
+        parents = array.array('i')
+        uids = array.array('I')
+        coords = array.array('d')
+        rotations = array.array('d')
+        point_counts = array.array('I')
+        points = array.array('f')
+
+        def add_record(record, parent):
+            kind = KINDS[record.kind]
+            index = len(kinds)
+
+            kinds.append(kind)
+            parents.append(parent)
+            uids.append(record.uid)
+            coords.extend((record.px, record.py))
+            rotations.extend((record.rotation, record.scale))
+            point_counts.append(len(record.points) // 2 if kind == KIND_POLYLINE else 0)
+
+            if kind == KIND_GROUP:
+                style_ids.append(NO_STYLE)
+                coords.extend((0.0, 0.0, 0.0, 0.0))
+                for child in record.children:
+                    add_record(child, index)
+            elif kind == KIND_POLYLINE:
+                style_ids.append(styles.setdefault(record.style, len(styles)))
+                coords.extend((record.a, record.b, record.c, record.d))
+                points.extend(record.points)
+            else:
+                style_ids.append(styles.setdefault(record.style, len(styles)))
+                coords.extend((record.a, record.b, record.c, record.d))
+
+        def add_node(item, parent):
+            if isinstance(item, ShapeRecord):
+                add_record(item, parent)
+                return
+
+            kind = KINDS[item.type_name]
+            index = len(kinds)
+
+            kinds.append(kind)
+            parents.append(parent)
+            uids.append(item.uid)
+            pos = item.pos()
+            coords.extend((pos.x(), pos.y()))
+            rotations.extend((item.rotation(), item.scale()))
+            point_counts.append(len(item.points) // 2 if kind == KIND_POLYLINE else 0)
+
+            if kind == KIND_GROUP:
+                style_ids.append(NO_STYLE)
+                coords.extend((0.0, 0.0, 0.0, 0.0))
+
+                for child in item.childItems():
+                    if hasattr(child, "type_name"):
+                        add_node(child, index)
+            elif kind == KIND_POLYLINE:
+                style_ids.append(styles.setdefault(item.style, len(styles)))
+                coords.extend(item.extent())
+                points.extend(item.points)
+            else:
+                style_ids.append(styles.setdefault(item.style, len(styles)))
+                coords.extend(item.get_geometry())
+
+        # В виртуальном документе часть фигур - записи вне сцены
+        document = getattr(scene, "document", None)
+        for item in document.nodes() if document is not None else top_level_items(scene):
+            if isinstance(item, ShapeRecord) or (hasattr(item, "type_name") and item.type_name in KINDS):
+                add_node(item, -1)
+
+        return ([(style.rgb, style.width) for style in styles], kinds, style_ids, parents, uids, coords, rotations,
+                point_counts, points)
+
+    @staticmethod
+    def write(filename: str, blocks: list):
+        try:
+            with FileManager.atomic_open(filename, 'wb') as f:
+                for block in blocks:
+                    data = bytes(block)
+                    f.write(data)
+                    f.write(b"\0" * (_padded(len(data)) - len(data)))
+        except OSError as e:
+            raise IOError(f"Не удалось сохранить: {e}")
+
+    @staticmethod
+    def iter_project(filename: str, records: bool = False):
+        # Те же записи, что и у FileManager.iter_project, но вместо словарей
+        # отдаются уже готовые фигуры ("item") или, для виртуального
+        # документа, записи ShapeRecord ("record")
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"Файл не найден: {filename}")
+
+        try:
+            with open(filename, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < HEADER.size:
+                    raise ValueError("Файл повреждён или имеет неверный формат")
+
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    yield from VecFormat._iter_items(mm, size, records)
+        except OSError as e:
+            raise IOError(f"Ошибка чтения файла: {e}")
+
+    @staticmethod
+    def _iter_items(mm, size, records=False):
+        magic, version, _, x, y, width, height, style_count, count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Файл повреждён или имеет неверный формат")
+
+        yield "scene", {"x": x, "y": y, "width": width, "height": height}, HEADER.size
+
+        view = memoryview(mm)
+        columns = []
+        offset = _padded(HEADER.size)
+
+        layout = [('I', style_count), ('I', style_count), ('B', count), ('I', count),
+                  ('i', count), ('I', count), ('d', 6 * count), ('d', 2 * count), ('I', count)]
+
+        try:
+            for code, length in layout:
+                columns.append(VecFormat._read_column(view, offset, size, code, length))
+                offset += _padded(length * struct.calcsize(code))
+
+            colors, widths, kinds, style_ids, parents, uids, coords, rotations, point_counts = columns
+            # Длина секции точек известна только после чтения чисел точек
+            columns.append(VecFormat._read_column(view, offset, size, 'f', 2 * sum(point_counts)))
+            points = columns[-1]
+            point_offset = 0
+            styles = [(f"#{colors[i]:06x}", widths[i]) for i in range(style_count)]
+
+            groups = {}
+            # Поворот и масштаб групп применяем после добавления детей,
+            # иначе addToGroup() перенесёт их в transform() детей
+            group_transforms = []
+            current = None
+            key = "record" if records else "item"
+
+            for i in range(count):
+                kind = kinds[i]
+                parent = parents[i]
+                VecFormat._check_node(i, kind, style_ids[i], style_count, parent, groups)
+                px, py, a, b, c, d = coords[6 * i:6 * i + 6]
+                rotation, scale = rotations[2 * i:2 * i + 2]
+                if kind == KIND_POLYLINE:
+                    end = point_offset + 2 * point_counts[i]
+                    geometry = (tuple(points[point_offset:end]),)
+                    point_offset = end
+                else:
+                    geometry = (a, b, c, d)
+
+                if records:
+                    # Записи хранят поворот и масштаб как есть - откладывать нечего
+                    if kind == KIND_GROUP:
+                        item = ShapeRecord(claim_uid(uids[i]), "group", px, py, color=None, width=0,
+                                           rotation=rotation, scale=scale, children=[])
+                    elif kind == KIND_POLYLINE:
+                        color, stroke_width = styles[style_ids[i]]
+                        item = ShapeRecord(claim_uid(uids[i]), "polyline", px, py, color=color, width=stroke_width,
+                                           rotation=rotation, scale=scale, points=geometry[0])
+                    else:
+                        color, stroke_width = styles[style_ids[i]]
+                        item = ShapeRecord(claim_uid(uids[i]), KIND_NAMES[kind], px, py, a, b, c, d,
+                                           color, stroke_width, rotation, scale)
+                elif kind == KIND_GROUP:
+                    item = ShapeFactory.from_record("group", px, py)
+                else:
+                    color, stroke_width = styles[style_ids[i]]
+                    item = ShapeFactory.from_record(KIND_NAMES[kind], px, py, *geometry, color=color,
+                                                    width=stroke_width, rotation=rotation, scale=scale)
+                if not records:
+                    item.uid = claim_uid(uids[i])
+
+                if parent >= 0:
+                    if records:
+                        groups[parent].children.append(item)
+                    else:
+                        groups[parent].addToGroup(item)
+                        item.setPos(px, py)
+                else:
+                    if current is not None:
+                        VecFormat._apply_group_transforms(group_transforms)
+                        yield key, current, size * i // count
+                    current = item
+                    groups.clear()
+
+                if kind == KIND_GROUP:
+                    groups[i] = item
+                    # Только после того, как предыдущая фигура верхнего уровня
+                    # отдана: её отложенные преобразования применяются выше
+                    if not records and (rotation != 0.0 or scale != 1.0):
+                        group_transforms.append((item, rotation, scale))
+
+            if current is not None:
+                VecFormat._apply_group_transforms(group_transforms)
+                yield key, current, size
+        finally:
+            for column in columns:
+                if isinstance(column, memoryview):
+                    column.release()
+            view.release()
+
+    @staticmethod
+    def _check_node(index, kind, style_id, style_count, parent, groups):
+        # Родитель - группа из дерева текущей фигуры верхнего уровня, она всегда раньше ребёнка
+        if kind not in KIND_NAMES:
+            raise ValueError(f"Файл повреждён: узел {index} неизвестного типа {kind}")
+        if kind != KIND_GROUP and style_id >= style_count:
+            raise ValueError(f"Файл повреждён: у узла {index} нет стиля {style_id}")
+        if parent != -1 and parent not in groups:
+            raise ValueError(f"Файл повреждён: родитель узла {index} - не группа выше него ({parent})")
+
+    @staticmethod
+    def _apply_group_transforms(pending):
+        for group, rotation, scale in pending:
+            group.setRotation(rotation)
+            group.setScale(scale)
+        pending.clear()
+
+    @staticmethod
+    def _read_column(view, offset, size, code, length):
+        nbytes = length * struct.calcsize(code)
+        if offset + nbytes > size:
+            raise ValueError("Файл повреждён или имеет неверный формат")
+        return VecFormat._column(view[offset:offset + nbytes], code)
+
+    @staticmethod
+    def _column(data, code):
+        if sys.byteorder == "little":
+            return data.cast(code)
+
+        column = array.array(code)
+        column.frombytes(data)
+        column.byteswap()
+        return column
@@ -0,0 +1,492 @@
+import heapq
+import math
+import sys
+import shiboken6
+from PySide6.QtCore import Qt, QLineF, QRectF
+from PySide6.QtGui import QPen, QTransform
+from PySide6.QtWidgets import QGraphicsScene
+from src.logic import lod
+from src.logic.commands.history import referenced_uids
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.ellipse import Ellipse
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.line import Line
+from src.logic.shape_logic.polyline import Polyline, pack_points, points_extent, quantized, unpack_points
+from src.logic.shape_logic.rect import Rectangle
+from src.logic.shape_logic.shapes import claim_uid, next_uid
+from src.logic.shape_logic.styles import style_props, style_table
+from src.logic.snapping import rect_anchors
+from src.logic.spatial_index import RTreeIndex
+
+# Виртуальный документ: фигуры хранятся лёгкими записями ShapeRecord в своём
+# R-дереве, а элементы сцены создаются только для того, что попадает в вид
+# с запасом MARGIN (доля размера вида с каждой стороны). Элементы, ушедшие
+# дальше RECYCLE_MARGIN, снова становятся записями, а их объекты идут в пул
+# для следующих фигур того же типа. Элементов не больше MAX_LIVE: при сильном
+# отдалении создаются ближайшие к центру вида, остальные записи рисует сама
+# сцена в drawBackground. Записи видят и запросы: "Select Where" и "Select
+# Same" создают элементы найденных записей (where, similar), привязка берёт
+# их опорные точки (ShapeRecord.anchor_points).
+MARGIN = 0.5
+RECYCLE_MARGIN = 1.0
+MAX_LIVE = 20000
+POOL_SIZE = 1000
+
+_EVERYWHERE = (-math.inf, -math.inf, math.inf, math.inf)
+
+# Ключи props в to_dict() совпадают с полями геометрии фигур
+GEOMETRY_KEYS = {
+    "line": Line.GEOMETRY_FIELDS,
+    "rect": Rectangle.GEOMETRY_FIELDS,
+    "ellipse": Ellipse.GEOMETRY_FIELDS,
+    "polyline": Polyline.GEOMETRY_FIELDS,
+}
+
+
+class ShapeRecord:
+    # Фигура вне вида. Для группы children - записи детей с координатами
+    # относительно группы; box - границы на сцене (left, top, right, bottom),
+    # order - место в порядке наложения (zValue созданного элемента),
+    # style - общий стиль из style_table (у группы None). У ломаной points -
+    # её точки, а a, b, c, d - их прямоугольник (x, y, w, h)
+    __slots__ = ("uid", "kind", "px", "py", "a", "b", "c", "d", "style",
+                 "rotation", "scale", "children", "order", "box", "points")
+
+    def __init__(self, uid, kind, px, py, a=0.0, b=0.0, c=0.0, d=0.0, color="black", width=2,
+                 rotation=0.0, scale=1.0, children=None, points=None):
+        self.uid = uid
+        self.kind = sys.intern(kind)
+        self.px = px
+        self.py = py
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.style = style_table.intern(color, width) if color is not None else None
+        self.rotation = rotation
+        self.scale = scale
+        self.children = children
+        self.order = 0.0
+        self.box = None
+        self.points = None
+        if points is not None:
+            self.points = quantized(points)
+            self.a, self.b, self.c, self.d = points_extent(self.points)
+
+    @property
+    def color(self):
+        return self.style.color if self.style is not None else None
+
+    @color.setter
+    def color(self, color: str):
+        self.style = style_table.intern(color, self.width)
+
+    @property
+    def width(self) -> int:
+        return self.style.width if self.style is not None else 0
+
+    @width.setter
+    def width(self, width: int):
+        self.style = style_table.intern(self.style.color, width)
+
+    def geometry(self) -> tuple:
+        # Как get_geometry() у фигуры этого типа
+        if self.kind == "polyline":
+            return (self.points,)
+        return (self.a, self.b, self.c, self.d)
+
+    def transform(self) -> QTransform:
+        # Как sceneTransform() элемента: масштаб и поворот вокруг начала координат, затем pos
+        t = QTransform.fromTranslate(self.px, self.py)
+        if self.rotation:
+            t.rotate(self.rotation)
+        if self.scale != 1:
+            t.scale(self.scale, self.scale)
+        return t
+
+    def local_rect(self) -> QRectF:
+        # То же, что boundingRect() у QGraphicsPathItem: контур плюс половина пера
+        if self.kind == "group":
+            rect = QRectF()
+            for child in self.children:
+                rect = rect.united(child.transform().mapRect(child.local_rect()))
+            return rect
+
+        if self.kind == "line":
+            rect = QRectF(min(self.a, self.c), min(self.b, self.d), abs(self.c - self.a), abs(self.d - self.b))
+        else:
+            rect = QRectF(self.a, self.b, self.c, self.d).normalized()
+        pad = self.width / 2
+        return rect.adjusted(-pad, -pad, pad, pad)
+
+    def draw(self, painter):
+        # Контур фигуры текущим пером painter, в локальных координатах
+        if self.kind == "line":
+            painter.drawLine(QLineF(self.a, self.b, self.c, self.d))
+        elif self.kind == "rect":
+            painter.drawRect(QRectF(self.a, self.b, self.c, self.d))
+        elif self.kind == "polyline":
+            painter.drawPath(Polyline.build_path(self.points))
+        else:
+            painter.drawEllipse(QRectF(self.a, self.b, self.c, self.d))
+
+    def anchor_points(self, parent: QTransform = None) -> list:
+        # Опорные точки на сцене [x0, y0, x1, y1, ...] - те же, что у созданного
+        # элемента (snapping._collect)
+        world = self.transform() if parent is None else self.transform() * parent
+        if self.kind == "group":
+            points = []
+            for child in self.children:
+                points += child.anchor_points(world)
+            return points
+
+        a, b, c, d = self.a, self.b, self.c, self.d
+        if self.kind == "line":
+            local = [(a, b), (c, d), ((a + c) / 2, (b + d) / 2)]
+        elif self.kind == "polyline":
+            local = zip(self.points[0::2], self.points[1::2])
+        else:
+            rect = QRectF(a, b, c, d).normalized()
+            local = rect_anchors(rect.left(), rect.top(), rect.right(), rect.bottom())
+            if self.kind == "ellipse":
+                local = local[4:]
+
+        m11, m12, m21, m22, dx, dy = world.m11(), world.m12(), world.m21(), world.m22(), world.dx(), world.dy()
+        points = []
+        for x, y in local:
+            points += (m11 * x + m21 * y + dx, m12 * x + m22 * y + dy)
+        return points
+
+    def scene_box(self) -> tuple:
+        rect = self.transform().mapRect(self.local_rect())
+        return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+    def to_dict(self, styles: dict = None) -> dict:
+        data = {"type": self.kind, "id": self.uid, "pos": [self.px, self.py]}
+        if self.rotation:
+            data["rotation"] = self.rotation
+        if self.scale != 1:
+            data["scale"] = self.scale
+
+        if self.kind == "group":
+            data["children"] = [child.to_dict(styles) for child in self.children]
+        elif self.kind == "polyline":
+            data["props"] = {"points": pack_points(self.points), **style_props(self.style, styles)}
+        else:
+            props = dict(zip(GEOMETRY_KEYS[self.kind], (self.a, self.b, self.c, self.d)))
+            props.update(style_props(self.style, styles))
+            data["props"] = props
+        return data
+
+    @staticmethod
+    def from_dict(data: dict, styles: list = None):
+        kind = data.get("type")
+        px, py = data.get("pos", [0, 0])
+        uid = claim_uid(data["id"]) if "id" in data else next_uid()
+        rotation, scale = data.get("rotation", 0.0), data.get("scale", 1.0)
+
+        if kind == "group":
+            children = [ShapeRecord.from_dict(child, styles) for child in data.get("children", [])]
+            return ShapeRecord(uid, kind, px, py, color=None, width=0, rotation=rotation, scale=scale,
+                               children=children)
+        if kind not in GEOMETRY_KEYS:
+            raise ValueError(f"Unknown type: {kind}")
+
+        props = data.get("props", {})
+        style = style_table.from_props(props, styles)
+        if kind == "polyline":
+            return ShapeRecord(uid, kind, px, py, color=style.color, width=style.width, rotation=rotation,
+                               scale=scale, points=unpack_points(props["points"]))
+
+        a, b, c, d = (props[key] for key in GEOMETRY_KEYS[kind])
+        return ShapeRecord(uid, kind, px, py, a, b, c, d, style.color, style.width, rotation, scale)
+
+    @staticmethod
+    def from_item(item):
+        # None - элемент не записать: произвольный transform() записи не хранят
+        if not item.transform().isIdentity() or getattr(item, "type_name", None) not in ("group", *GEOMETRY_KEYS):
+            return None
+
+        if item.type_name == "group":
+            children = []
+            for child in item.childItems():
+                if hasattr(child, "type_name"):
+                    record = ShapeRecord.from_item(child)
+                    if record is None:
+                        return None
+                    children.append(record)
+            pos = item.pos()
+            return ShapeRecord(item.uid, "group", pos.x(), pos.y(), color=None, width=0,
+                               rotation=item.rotation(), scale=item.scale(), children=children)
+
+        # У фигур атрибуты x/y - геометрия, они заслоняют QGraphicsItem.x()
+        pos = item.pos()
+        if item.type_name == "polyline":
+            return ShapeRecord(item.uid, "polyline", pos.x(), pos.y(), color=item.style.color,
+                               width=item.style.width, rotation=item.rotation(), scale=item.scale(),
+                               points=item.points)
+        return ShapeRecord(item.uid, item.type_name, pos.x(), pos.y(), *item.get_geometry(),
+                           item.style.color, item.style.width, item.rotation(), item.scale())
+
+
+class VirtualDocument:
+    def __init__(self, scene, undo_stack=None):
+        self.scene = scene
+        self.undo_stack = undo_stack
+
+        self.index = RTreeIndex()
+        self.live = set()
+        self.bounds = QRectF()
+
+        # zValue 0 - признак ещё не упорядоченного элемента (см. adopt)
+        self._next_order = 1.0
+        self._pool = {}
+        self._pinned = None
+
+        if undo_stack is not None:
+            undo_stack.indexChanged.connect(self._on_history_changed)
+
+    def __len__(self):
+        # Число фигур верхнего уровня: записи и созданные элементы
+        return len(self.index) + len(self.live)
+
+    @property
+    def dormant_count(self) -> int:
+        return len(self.index)
+
+    def add_records(self, records):
+        rect = QRectF()
+        for record in records:
+            record.order = self._take_order()
+            self._insert(record)
+            rect = rect.united(_rect(record.box))
+
+        # Новые записи видны сразу: их рисует фон сцены
+        self.scene.invalidate(rect, QGraphicsScene.SceneLayer.BackgroundLayer)
+        self.scene.document_changed.emit()
+
+    def adopt(self, item):
+        # Элемент верхнего уровня добавлен на сцену (создан, восстановлен отменой, ...)
+        if item.zValue() == 0:
+            item.setZValue(self._take_order())
+        self.live.add(item)
+
+    def release(self, item):
+        self.live.discard(item)
+
+    def update_view(self, rect: QRectF):
+        self._recycle(_expanded(rect, RECYCLE_MARGIN))
+
+        area = _expanded(rect, MARGIN)
+        records = self.index.query(_box(area))
+        budget = MAX_LIVE - len(self.live)
+        if len(records) > budget:
+            # Сильное отдаление: ближайшие к центру вида, остальные рисует фон
+            cx, cy = rect.center().x(), rect.center().y()
+            records = heapq.nsmallest(max(budget, 0), records, key=lambda record: math.hypot(
+                (record.box[0] + record.box[2]) / 2 - cx, (record.box[1] + record.box[3]) / 2 - cy))
+        self.materialize(records)
+
+    def materialize(self, records):
+        # Создаёт элементы записей верхнего уровня (из index)
+        if not records:
+            return
+
+        records = sorted(records, key=lambda record: record.order)
+        with self.scene.batch_changes():
+            for record in records:
+                self._materialize(record)
+
+    def materialize_all(self):
+        self.materialize(self.index.query(_EVERYWHERE))
+
+    def where(self, kind=None, color=None, width=None, min_w=None, min_h=None,
+              max_w=None, max_h=None, area: QRectF = None) -> list:
+        # Записи верхнего уровня, в дереве которых есть фигура под все условия -
+        # те же, что у DocumentColumns.where()
+        styles = None
+        if color is not None or width is not None:
+            styles = style_table.matching(color, width)
+        limits = (min_w, min_h, max_w, max_h)
+        box = _box(area) if area is not None else None
+        return [record for record in self.index.query(box or _EVERYWHERE)
+                if _matches(record, None, 1.0, kind, styles, limits, box)]
+
+    def similar(self, kinds: set = None, styles: set = None) -> list:
+        # Записи верхнего уровня типа из kinds или с фигурой стиля из styles
+        # (номера style_table) - как DocumentColumns.similar()
+        records = self.index.query(_EVERYWHERE)
+        if kinds is not None:
+            return [record for record in records if record.kind in kinds]
+        return [record for record in records if _has_style(record, styles)]
+
+    def nodes(self) -> list:
+        # Все фигуры верхнего уровня в порядке наложения: элементы сцены и записи
+        nodes = [(record.order, record) for record in self.index.query(_EVERYWHERE)]
+        nodes.extend((item.zValue(), item) for item in top_level_items(self.scene) if hasattr(item, "uid"))
+        nodes.sort(key=lambda node: node[0])
+        return [node for _, node in nodes]
+
+    def paint(self, painter, rect: QRectF):
+        # Записи в области рисуются напрямую, без элементов сцены
+        records = self.index.query(_box(rect))
+        if not records:
+            return
+
+        records.sort(key=lambda record: record.order)
+        base = painter.worldTransform()
+        painter.save()
+        painter.setBrush(Qt.NoBrush)
+        for record in records:
+            self._paint_record(painter, record, record.transform() * base)
+        painter.restore()
+
+    def _paint_record(self, painter, record, world):
+        level = lod.level_of_detail(world)
+        rect = record.local_rect()
+        extent = lod.screen_extent(rect, level)
+        if extent < lod.CULL_PX:
+            return
+
+        painter.setTransform(world)
+        if record.kind == "group":
+            for child in record.children:
+                self._paint_record(painter, child, child.transform() * world)
+            return
+
+        pen = record.style.pen
+        if extent < lod.BOX_PX:
+            painter.fillRect(rect, pen.color())
+            return
+
+        if pen.widthF() * level < 1.0:
+            pen = QPen(pen)
+            pen.setCosmetic(True)
+            pen.setWidth(0)
+        painter.setPen(pen)
+        record.draw(painter)
+
+    def _take_order(self) -> float:
+        order = self._next_order
+        self._next_order += 1
+        return order
+
+    def _insert(self, record):
+        if record.box is None:
+            record.box = record.scene_box()
+        self.index.insert(record, record.box)
+        self.bounds = self.bounds.united(_rect(record.box))
+
+    def _materialize(self, record):
+        self.index.remove(record)
+        item = self._create(record)
+        item.setZValue(record.order)
+        self.scene.addItem(item)
+
+    def _create(self, record):
+        if record.kind == "group":
+            item = ShapeFactory.from_record("group", record.px, record.py)
+            for child in record.children:
+                node = self._create(child)
+                item.addToGroup(node)
+                node.setPos(child.px, child.py)
+        else:
+            pool = self._pool.get(record.kind)
+            if pool:
+                item = pool.pop()
+                item.assign(record.geometry(), record.color, record.width)
+                item.setPos(record.px, record.py)
+            else:
+                item = ShapeFactory.from_record(record.kind, record.px, record.py, *record.geometry(),
+                                                color=record.color, width=record.width)
+
+        # Поворот и масштаб группы - после детей, как в ShapeFactory._create_group
+        item.setRotation(record.rotation)
+        item.setScale(record.scale)
+        item.uid = record.uid
+        return item
+
+    def _recycle(self, keep: QRectF):
+        pinned = self._pinned_uids()
+        grabber = self.scene.mouseGrabberItem()
+
+        recycled = []
+        for item in list(self.live):
+            if not shiboken6.isValid(item) or getattr(item, "_index_parent", None) is not None \
+                    or getattr(item, "_index_scene", None) is not self.scene:
+                self.live.discard(item)
+                continue
+            if item.isSelected() or item is grabber or item.uid in pinned \
+                    or item.sceneBoundingRect().intersects(keep):
+                continue
+
+            record = ShapeRecord.from_item(item)
+            if record is not None:
+                record.order = item.zValue()
+                recycled.append((item, record))
+
+        for item, record in recycled:
+            self.scene.removeItem(item)
+            self._insert(record)
+            if record.kind != "group":
+                pool = self._pool.setdefault(record.kind, [])
+                if len(pool) < POOL_SIZE:
+                    item.setZValue(0)
+                    pool.append(item)
+
+    def _pinned_uids(self) -> set:
+        # Элементы, на которые ссылается история отмены, остаются на сцене:
+        # команды держат сами объекты
+        if self._pinned is None:
+            stack = self.undo_stack
+            commands = [stack.command(i) for i in range(stack.count())] if stack is not None else []
+            self._pinned = referenced_uids(commands)
+        return self._pinned
+
+    def _on_history_changed(self, index):
+        self._pinned = None
+
+
+def _matches(record, parent, factor: float, kind, styles, limits, box) -> bool:
+    # Проверка дерева записи по условиям where(): размеры - с масштабом по
+    # цепочке групп, габариты - на сцене вместе с пером, как в DocumentColumns
+    world = record.transform() if parent is None else record.transform() * parent
+    factor *= record.scale
+    group = record.kind == "group"
+
+    if (kind is None or record.kind == kind) and (styles is None or not group and record.style.id in styles):
+        rect = world.mapRect(record.local_rect())
+        if group:
+            w, h = rect.width(), rect.height()
+        elif record.kind == "line":
+            w, h = abs(record.c - record.a) * factor, abs(record.d - record.b) * factor
+        else:
+            w, h = abs(record.c) * factor, abs(record.d) * factor
+
+        min_w, min_h, max_w, max_h = limits
+        if (min_w is None or w > min_w) and (min_h is None or h > min_h) \
+                and (max_w is None or w <= max_w) and (max_h is None or h <= max_h) \
+                and (box is None or rect.left() <= box[2] and rect.right() >= box[0]
+                     and rect.top() <= box[3] and rect.bottom() >= box[1]):
+            return True
+
+    return group and any(_matches(child, world, factor, kind, styles, limits, box) for child in record.children)
+
+
+def _has_style(record, styles: set) -> bool:
+    if record.kind == "group":
+        return any(_has_style(child, styles) for child in record.children)
+    return record.style.id in styles
+
+
+def _rect(box: tuple) -> QRectF:
+    return QRectF(box[0], box[1], box[2] - box[0], box[3] - box[1])
+
+
+def _box(rect: QRectF) -> tuple:
+    return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+
+def _expanded(rect: QRectF, fraction: float) -> QRectF:
+    dx, dy = rect.width() * fraction, rect.height() * fraction
+    return rect.adjusted(-dx, -dy, dx, dy)
@@ -1,41 +1,107 @@
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene
-from PySide6.QtCore import Qt, QPointF
-from PySide6.QtGui import QUndoStack
+import math
+from PySide6.QtWidgets import QGraphicsView
+from PySide6.QtCore import Qt, QLineF, QPointF, QRectF, QTimer, Signal
+from PySide6.QtGui import QColor, QImage, QPainter, QPen
 from src.logic.shape_logic.factory import ShapeFactory
 from src.logic.tools_logic.creation_tool import CreationTool
 from src.logic.tools_logic.selection_tool import SelectionTool
+from src.logic.tools_logic.freehand_tool import FreehandTool
 from src.logic.shape_logic.group import Group
-from src.logic.commands.commands import DeleteCommand
+from src.logic.commands.commands import DeleteCommand, TransformCommand
+from src.logic import lod, transforms
+from src.logic.journal import JournaledUndoStack
+from src.logic.metrics import metrics
+from src.logic.scene_utils import content_rect
+from src.logic.snapping import Snapper
+from src.logic.spatial_index import IndexedScene, top_level
+from src.logic.virtual_document import VirtualDocument
+from src.widgets.perf_hud import PerformanceHud
+
+# Холст "бесконечный": область прокрутки - квадрат со стороной 2 * CANVAS_EXTENT
+CANVAS_EXTENT = 1_000_000
+ZOOM_MIN = 0.01
+ZOOM_MAX = 100.0
+ZOOM_STEP = 1.15
+# Линии сетки привязки не чаще GRID_MIN_PX пикселей; маркер и поля перерисовки - в пикселях
+GRID_MIN_PX = 8
+GRID_COLOR = QColor(0, 0, 0, 24)
+SNAP_COLOR = QColor(255, 0, 128)
+SNAP_MARKER_PX = 8
 
 class EditorCanvas(QGraphicsView):
+    zoom_changed = Signal(float)
+
     def __init__(self):
         super().__init__()
 
-        self.scene = QGraphicsScene(self)
+        self.scene = IndexedScene(self)
         self.setScene(self.scene)
-        
-        self.setSceneRect(0, 0, 800, 600)
+
+        # Виртуальный документ подстраивается под вид после прокрутки и масштаба,
+        # один раз на такт цикла событий. Таймер нужен уже setSceneRect()
+        self._document_timer = QTimer(self)
+        self._document_timer.setSingleShot(True)
+        self._document_timer.setInterval(0)
+        self._document_timer.timeout.connect(self._sync_document)
+        self.scene.document_changed.connect(self._document_timer.start)
+
+        # Метрика "frame.items" считается запросом к индексу уже после кадра,
+        # вне замера "frame", не чаще раза на такт цикла событий
+        self._frame_visible = None
+        self._frame_items_timer = QTimer(self)
+        self._frame_items_timer.setSingleShot(True)
+        self._frame_items_timer.setInterval(0)
+        self._frame_items_timer.timeout.connect(self._record_frame_items)
+
+        self.setSceneRect(-CANVAS_EXTENT, -CANVAS_EXTENT, 2 * CANVAS_EXTENT, 2 * CANVAS_EXTENT)
         self.setRenderHint(self.renderHints())
         self.setAlignment(Qt.AlignCenter)
+        # Точку под курсором при масштабировании держим сами (см. zoom_by)
+        self.setTransformationAnchor(QGraphicsView.NoAnchor)
+        self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
+        self.centerOn(400, 300)
         
         self.scene.setBackgroundBrush(Qt.white)
 
-        self.undo_stack = QUndoStack(self)
-        self.undo_stack.setUndoLimit(50)
+        self._pan_origin = None
+        self._pan_cursor = None
+
+        # Обзорный растр: при сильном отдалении большой сцены кадр - это один
+        # вывод картинки, а не отрисовка каждой фигуры. Пока сцена меняется,
+        # вид рисуется как обычно, растр перестраивается после паузы
+        self._overview = None
+        self._scene_extent = None
+        self._overview_timer = QTimer(self)
+        self._overview_timer.setSingleShot(True)
+        self._overview_timer.setInterval(300)
+        self._overview_timer.timeout.connect(self.viewport().update)
+        self.scene.changed.connect(self._on_scene_changed)
+        # Записи виртуального документа не меняют элементы сцены - changed не приходит
+        self.scene.document_changed.connect(lambda: self._on_scene_changed(None))
+
+        self.spatial_index = self.scene.spatial_index
+        self.snapper = Snapper(self.scene)
+
+        # Глубина истории ограничена оценкой памяти, а не числом шагов
+        self.undo_stack = JournaledUndoStack(self, memory_budget=64 * 1024 * 1024)
 
         self.tools = {
             "select": SelectionTool(self, self.undo_stack),
             "line": CreationTool(self, "line", self.undo_stack),
             "rect": CreationTool(self, "rect", self.undo_stack),
-            "ellipse": CreationTool(self, "ellipse", self.undo_stack)
+            "ellipse": CreationTool(self, "ellipse", self.undo_stack),
+            "freehand": FreehandTool(self, self.undo_stack)
         }
 
         self.active_tool = self.tools["select"]
 
         self.setMouseTracking(True)
 
+        self.hud = PerformanceHud(self.viewport())
+
     def set_tool(self, tool_name):
         if tool_name in self.tools:
+            self.active_tool.cancel()
             self.active_tool = self.tools[tool_name]
             print(f"Выбран инструмент: {tool_name}")
 
@@ -44,14 +110,270 @@ class EditorCanvas(QGraphicsView):
             else:
                 self.setCursor(Qt.CrossCursor)
 
+    def set_spatial_index(self, backend: str):
+        self.spatial_index.set_backend(backend)
+        print(f"Пространственный индекс: {backend}")
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if self.snapper.grid:
+            self._draw_grid(painter, rect)
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        self.active_tool.draw_foreground(painter, rect)
+        self._draw_snap(painter)
+
+    def set_snapping(self, option: str, enabled: bool):
+        # option - "grid", "objects" или "guides" (атрибуты Snapper)
+        setattr(self.snapper, option, enabled)
+        self.viewport().update()
+
+    def snap_point(self, point: QPointF, exclude=(), free: bool = False) -> QPointF:
+        dx, dy = self.snap_offset([point.x(), point.y()], exclude, free)
+        return QPointF(point.x() + dx, point.y() + dy)
+
+    def snap_offset(self, points: list, exclude=(), free: bool = False) -> tuple:
+        # free - привязка временно выключена (зажат Alt); exclude - множество
+        # перетаскиваемых фигур верхнего уровня
+        old = self._snap_rect()
+        if free:
+            self.snapper.clear()
+            offset = (0.0, 0.0)
+        else:
+            offset = self.snapper.snap_offset(points, self.zoom(), exclude)
+        self._update_snap(old)
+        return offset
+
+    def clear_snap(self):
+        old = self._snap_rect()
+        self.snapper.clear()
+        self._update_snap(old)
+
+    def _snap_rect(self) -> QRectF:
+        rect = QRectF()
+        for line in self.snapper.guide_lines:
+            rect = rect.united(QRectF(line.p1(), line.p2()).normalized())
+        if self.snapper.marker is not None:
+            rect = rect.united(QRectF(self.snapper.marker, self.snapper.marker))
+        return rect
+
+    def _update_snap(self, old: QRectF):
+        # Как у превью CreationTool: перерисовываем только старые и новые направляющие
+        dirty = old.united(self._snap_rect())
+        if dirty.isNull():
+            return
+        margin = SNAP_MARKER_PX / self.zoom()
+        area = self.mapFromScene(dirty.adjusted(-margin, -margin, margin, margin)).boundingRect()
+        self.viewport().update(area.adjusted(-2, -2, 2, 2))
+
+    def _draw_snap(self, painter):
+        if self.snapper.marker is None and not self.snapper.guide_lines:
+            return
+
+        painter.save()
+        pen = QPen(SNAP_COLOR, 0, Qt.DashLine)
+        painter.setPen(pen)
+        painter.setBrush(Qt.NoBrush)
+        for line in self.snapper.guide_lines:
+            painter.drawLine(line)
+        if self.snapper.marker is not None:
+            pen.setStyle(Qt.SolidLine)
+            painter.setPen(pen)
+            half = SNAP_MARKER_PX / 2 / self.zoom()
+            painter.drawRect(QRectF(self.snapper.marker, self.snapper.marker).adjusted(-half, -half, half, half))
+        painter.restore()
+
+    def _draw_grid(self, painter, rect):
+        # При отдалении рисуем каждую 5-ю, 25-ю... линию, привязка остаётся к шагу сетки
+        size = self.snapper.grid_size
+        while size * self.zoom() < GRID_MIN_PX:
+            size *= 5
+
+        left, top = math.floor(rect.left() / size) * size, math.floor(rect.top() / size) * size
+        lines = [QLineF(left + i * size, rect.top(), left + i * size, rect.bottom())
+                 for i in range(int((rect.right() - left) / size) + 1)]
+        lines += [QLineF(rect.left(), top + i * size, rect.right(), top + i * size)
+                  for i in range(int((rect.bottom() - top) / size) + 1)]
+
+        painter.save()
+        painter.setPen(QPen(GRID_COLOR, 0))
+        painter.drawLines(lines)
+        painter.restore()
+
+    def zoom(self) -> float:
+        return self.transform().m11()
+
+    def zoom_by(self, factor: float, anchor=None):
+        # anchor - точка вьюпорта, которая остаётся на месте (по умолчанию центр)
+        zoom = self.zoom()
+        factor = min(max(zoom * factor, ZOOM_MIN), ZOOM_MAX) / zoom
+        if factor == 1:
+            return
+
+        if anchor is None:
+            anchor = self.viewport().rect().center()
+        anchor_scene = self.mapToScene(anchor)
+
+        self.scale(factor, factor)
+
+        shift = self.mapFromScene(anchor_scene) - anchor
+        self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() + shift.x())
+        self.verticalScrollBar().setValue(self.verticalScrollBar().value() + shift.y())
+
+        self.scene.set_view_zoom(self.zoom())
+        self._document_timer.start()
+        self.zoom_changed.emit(self.zoom())
+
+    def reset_zoom(self):
+        self.zoom_by(1.0 / self.zoom())
+
+    def fit_all(self):
+        rect = content_rect(self.scene)
+        if rect.isEmpty():
+            return
+
+        viewport = self.viewport().rect()
+        factor = min(viewport.width() / rect.width(), viewport.height() / rect.height()) * 0.95
+        self.zoom_by(factor / self.zoom())
+        self.centerOn(rect.center())
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.zoom_by(ZOOM_STEP ** steps, event.position().toPoint())
+        event.accept()
+
     def mousePressEvent(self, event):
-        self.active_tool.mouse_press(event)
+        if event.button() == Qt.MiddleButton:
+            # Панорамирование средней кнопкой - при любом инструменте
+            self._pan_origin = event.position().toPoint()
+            self._pan_cursor = self.cursor()
+            self.setCursor(Qt.ClosedHandCursor)
+            return
+        with metrics.timed("tool.mouse_press"):
+            self.active_tool.mouse_press(event)
 
     def mouseReleaseEvent(self, event):
-        self.active_tool.mouse_release(event)
+        if event.button() == Qt.MiddleButton and self._pan_origin is not None:
+            self._pan_origin = None
+            self.setCursor(self._pan_cursor)
+            return
+        with metrics.timed("tool.mouse_release"):
+            self.active_tool.mouse_release(event)
 
     def mouseMoveEvent(self, event):
-        self.active_tool.mouse_move(event)
+        if self._pan_origin is not None:
+            pos = event.position().toPoint()
+            delta = pos - self._pan_origin
+            self._pan_origin = pos
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+            return
+        with metrics.timed("tool.mouse_move"):
+            self.active_tool.mouse_move(event)
+
+    def paintEvent(self, event):
+        visible = self.mapToScene(event.rect()).boundingRect()
+        with metrics.timed("frame"):
+            overview = self._paint_overview(event)
+            if not overview:
+                super().paintEvent(event)
+                self.scene.cache_policy.count_frame(visible)
+
+        if metrics.enabled:
+            self._frame_visible = None if overview else visible
+            self._frame_items_timer.start()
+
+    def _record_frame_items(self):
+        # Верхнеуровневые фигуры в области последнего кадра; в режиме обзора - один растр
+        visible, self._frame_visible = self._frame_visible, None
+        metrics.record("frame.items", 1 if visible is None else len(self.spatial_index.items_in(visible)))
+
+    def set_hud_visible(self, visible: bool):
+        self.hud.setVisible(visible)
+        metrics.set_consumer("hud", visible)
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        super().scrollContentsBy(dx, dy)
+        self._document_timer.start()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._document_timer.start()
+
+    def open_virtual_document(self) -> VirtualDocument:
+        # Следующая загрузка пойдёт в записи, а не в элементы (см. ProjectLoader)
+        document = VirtualDocument(self.scene, self.undo_stack)
+        self.scene.set_document(document)
+        return document
+
+    def _sync_document(self):
+        if self.scene.document is not None:
+            self.scene.document.update_view(self.mapToScene(self.viewport().rect()).boundingRect())
+
+    def set_item_cache(self, enabled: bool):
+        self.scene.cache_policy.set_enabled(enabled)
+        print(f"Кэш отрисовки: {'вкл' if enabled else 'выкл'}")
+
+    def _paint_overview(self, event) -> bool:
+        if self.zoom() > lod.OVERVIEW_MAX_ZOOM:
+            return False
+
+        if self._overview is not None:
+            rect = self._overview[1]
+        elif self._overview_timer.isActive():
+            return False
+        else:
+            # Границы и число фигур считаем один раз на изменение сцены, а не на кадр
+            if self._scene_extent is None:
+                count = self.spatial_index.estimated_count()
+                if self.scene.document is not None:
+                    count += self.scene.document.dormant_count
+                self._scene_extent = (content_rect(self.scene), count)
+            rect, count = self._scene_extent
+            if count < lod.OVERVIEW_MIN_ITEMS or rect.isEmpty():
+                return False
+
+        # Растр не грубее экрана: режим включается, только пока пиксель растра не крупнее пикселя вида
+        scale = lod.OVERVIEW_SIDE / max(rect.width(), rect.height())
+        if self.zoom() > scale:
+            return False
+
+        if self._overview is None:
+            self._overview = (self._render_overview(rect, scale), rect)
+        image, rect = self._overview
+
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), self.scene.backgroundBrush())
+        painter.setTransform(self.viewportTransform())
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(rect, image, QRectF(image.rect()))
+
+        painter.setPen(QPen(Qt.black, 0, Qt.DashLine))
+        painter.setBrush(Qt.NoBrush)
+        for item in self.selected_top_items():
+            painter.drawRect(item.sceneBoundingRect())
+
+        self.drawForeground(painter, self.mapToScene(event.rect()).boundingRect())
+        painter.end()
+        return True
+
+    def _render_overview(self, rect, scale):
+        image = QImage(max(1, round(rect.width() * scale)), max(1, round(rect.height() * scale)),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.scene.render(painter, QRectF(image.rect()), rect)
+        painter.end()
+        return image
+
+    def _on_scene_changed(self, region):
+        self._scene_extent = None
+        self._overview = None
+        self._overview_timer.start()
         
     def group_selection(self):
         try:
@@ -65,6 +387,11 @@ class EditorCanvas(QGraphicsView):
                 item.setSelected(False)
                 group.addToGroup(item)
             group.setSelected(True)
+            self.undo_stack.record_change([{
+                "op": "group",
+                "id": group.uid,
+                "children": [item.uid for item in selected_items]
+            }])
             print("Group is created")
         except Exception as e:
             print (e)
@@ -74,9 +401,106 @@ class EditorCanvas(QGraphicsView):
 
         for item in selected_items:
             if isinstance(item, Group):
+                self.undo_stack.record_change([{"op": "ungroup", "id": item.uid}])
                 self.scene.destroyItemGroup(item)
                 print("Group is ungrouped")
 
+    def selected_top_items(self):
+        # Вложенные в группы фигуры двигаются вместе с группой
+        items = [item for item in self.scene.selectedItems()
+                 if hasattr(item, "uid") and getattr(item, "_index_parent", None) is None]
+        return sorted(items, key=lambda item: item.uid)
+
+    def select_where(self, **filters) -> int:
+        # Условия - как у DocumentColumns.where(); найденные дети групп выделяются группой.
+        # Подходящие записи виртуального документа сначала становятся элементами
+        document = self.scene.document
+        if document is not None:
+            document.materialize(document.where(**filters))
+
+        items = {top_level(item) for item in self.scene.columns.where(**filters)}
+        self._select(items)
+        return len(items)
+
+    def select_same(self, attribute: str) -> int:
+        # "type", "color" или "width" - как у текущего выделения (DocumentColumns.similar)
+        sample = self.selected_top_items()
+        if not sample:
+            return 0
+
+        document = self.scene.document
+        if document is not None:
+            if attribute == "type":
+                records = document.similar(kinds={item.type_name for item in sample})
+            else:
+                records = document.similar(styles=self.scene.columns.similar_styles(sample, attribute))
+            document.materialize(records)
+
+        items = self.scene.columns.similar(sample, attribute)
+        self._select(items)
+        return len(items)
+
+    def _select(self, items):
+        self.scene.clearSelection()
+        for item in items:
+            item.setSelected(True)
+
+    def translate_selection(self, dx: float, dy: float, merge_key: str = None):
+        items = self.selected_top_items()
+        if not items or (dx == 0 and dy == 0):
+            return
+
+        before = transforms.capture(items)
+        self._push_transform(items, before, transforms.translated(before, dx, dy),
+                             f"Move {len(items)} items", merge_key)
+
+    def rotate_selection(self, angle: float, pivot: QPointF = None):
+        self._rotate_scale(angle, 1.0, pivot, f"Rotate by {angle:g}°")
+
+    def scale_selection(self, factor: float, pivot: QPointF = None):
+        if factor <= 0:
+            raise ValueError(f"Invalid scale factor: {factor}")
+        self._rotate_scale(0.0, factor, pivot, f"Scale by {factor:g}")
+
+    def align_selection(self, mode: str):
+        items = self.selected_top_items()
+        if len(items) < 2:
+            return
+
+        rects = [item.sceneBoundingRect() for item in items]
+        before = transforms.capture(items)
+        after = transforms.translated_each(before, transforms.align_offsets(rects, mode))
+        self._push_transform(items, before, after, f"Align {mode}")
+
+    def distribute_selection(self, axis: str):
+        items = self.selected_top_items()
+        if len(items) < 3:
+            return
+
+        rects = [item.sceneBoundingRect() for item in items]
+        before = transforms.capture(items)
+        after = transforms.translated_each(before, transforms.distribute_offsets(rects, axis))
+        self._push_transform(items, before, after, f"Distribute {axis}")
+
+    def _rotate_scale(self, angle, factor, pivot, text):
+        items = self.selected_top_items()
+        if not items:
+            return
+
+        if pivot is None:
+            # По умолчанию - центр общей рамки выделения
+            left, top, right, bottom = transforms.bounds([item.sceneBoundingRect() for item in items])
+            pivot = QPointF((left + right) / 2, (top + bottom) / 2)
+
+        before = transforms.capture(items)
+        after = transforms.rotated_scaled(before, angle, factor, pivot.x(), pivot.y())
+        self._push_transform(items, before, after, text)
+
+    def _push_transform(self, items, before, after, text, merge_key=None):
+        if after == before:
+            return
+        self.undo_stack.push(TransformCommand(self.scene, items, before, after, text, merge_key))
+
     def delete_selected(self):
         selected = self.scene.selectedItems()
         if not selected:
@@ -0,0 +1,66 @@
+from PySide6.QtWidgets import QLabel
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont
+from src.logic.metrics import BUCKETS_MS, RollingHistogram, metrics
+
+# Что показываем и как подписываем (время в мс или количество);
+# полный набор метрик отдаёт JSON (см. MetricsServer)
+ROWS = (
+    ("frame", "Кадр", True),
+    ("frame.items", "Фигур в кадре", False),
+    ("tool.mouse_press", "press", True),
+    ("tool.mouse_move", "move", True),
+    ("tool.mouse_release", "release", True),
+    ("undo.push", "Undo push", True),
+    ("index.flush", "Индекс", True),
+    ("index.flush_items", "Индекс, фигур", False),
+)
+BARS = " ▁▂▃▄▅▆▇█"
+
+
+def sparkline(counts) -> str:
+    top = max(counts) or 1
+    return "".join(BARS[round(count / top * (len(BARS) - 1))] for count in counts)
+
+
+class PerformanceHud(QLabel):
+    # Полупрозрачная панель в углу вида. Непрозрачный фон важен: обновление
+    # текста тогда не перерисовывает сцену под панелью и не искажает время кадра
+    def __init__(self, parent=None, interval_ms: int = 500):
+        super().__init__(parent)
+
+        self.setFont(QFont("monospace", 8))
+        self.setTextFormat(Qt.PlainText)
+        self.setAutoFillBackground(True)
+        self.setStyleSheet("background-color: #202020; color: #e0e0e0; padding: 4px;")
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.move(8, 8)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._timer.stop()
+
+    def refresh(self):
+        header = f"{'':14} {'посл':>7} {'p50':>7} {'p95':>7} {'макс':>7}  ≤{BUCKETS_MS[0]}…>{BUCKETS_MS[-1]} мс"
+        lines = [header]
+        stats = metrics.snapshot()["metrics"]
+        empty = RollingHistogram().snapshot()
+        for name, title, is_time in ROWS:
+            row = stats.get(name, empty)
+            line = f"{title:14} {row['last']:7.2f} {row['p50']:7.2f} {row['p95']:7.2f} {row['max']:7.2f}"
+            if is_time:
+                line += f"  {sparkline(row['buckets'])}"
+            lines.append(line)
+
+        self.setText("\n".join(lines))
+        self.adjustSize()
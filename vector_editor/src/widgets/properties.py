@@ -1,16 +1,40 @@
+import itertools
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QSpinBox, QPushButton, QFrame, QColorDialog, QHBoxLayout, QDoubleSpinBox
-from PySide6.QtCore import Qt
-from src.logic.commands.commands import ChangeColorCommand, ChangeWidthCommand
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QColor
+from src.logic.commands.commands import BulkChangeColorCommand, BulkChangeWidthCommand, RestyleCommand
+from src.logic.scene_utils import frame_interval
+from src.logic.selection_summary import SelectionSummary
+
+# Номера интерактивных правок (выбор цвета, ввод толщины) - ключи слияния их команд
+_edits = itertools.count(1)
 
 class PropertiesPanel(QWidget):
-    def __init__(self, scene, undo_stack):
+    def __init__(self, scene, undo_stack, canvas):
         super().__init__()
         self.scene = scene
         self.undo_stack = undo_stack
+        self.canvas = canvas
+
+        # Панель обновляется лениво: события только помечают её устаревшей,
+        # а виджеты перерисовываются не чаще раза за кадр из сводки по выделению
+        self.summary = SelectionSummary()
+        self._selection_stale = True
+        self._changed_items = set()
+        self._shown = {}
+        self._width_edit = None
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self.refresh)
 
         self._init_ui()
 
         self.scene.selectionChanged.connect(self.on_selection_changed)
+        # changed нужен для перетаскивания мышью: его Qt выполняет мимо Python
+        self.scene.changed.connect(self.mark_stale)
+        if hasattr(self.scene, "add_change_listener"):
+            self.scene.add_change_listener(self.on_item_changed)
 
     def _init_ui(self):
         self.setFixedWidth(200)
@@ -38,11 +62,16 @@ class PropertiesPanel(QWidget):
 
         layout.addWidget(self.btn_color)
 
+        self.btn_style_color = QPushButton("Цвет всех фигур стиля...")
+        layout.addWidget(self.btn_style_color)
+
         layout.addStretch()
 
         self.setEnabled(False)
         self.spin_width.valueChanged.connect(self.on_width_changed)
+        self.spin_width.editingFinished.connect(self.end_width_edit)
         self.btn_color.clicked.connect(self.on_color_clicked)
+        self.btn_style_color.clicked.connect(self.on_style_color_clicked)
 
         geo_layout = QHBoxLayout()
 
@@ -61,64 +90,100 @@ class PropertiesPanel(QWidget):
         layout.addLayout(geo_layout)
 
     def on_selection_changed(self):
-        selected_items = self.scene.selectedItems()
-
-        if not selected_items:
-            self.setEnabled(False)
-            self.spin_width.setValue(1)
-            self.btn_color.setStyleSheet("background-color: transparent")
-
-            self.spin_width.setStyleSheet("background-color: #000000;")
-            self.spin_width.setToolTip("")
+        # Во время выделения рамкой сигнал приходит на каждый элемент
+        self._selection_stale = True
+        self._width_edit = None
+        self.mark_stale()
+
+    def on_item_changed(self, item):
+        # Фигура сообщает о каждом setPen/setPath, поэтому пересчёт откладываем до кадра
+        if item in self.summary.items:
+            self._changed_items.add(item)
+            self.mark_stale()
+
+    def mark_stale(self, *args):
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start(frame_interval(self))
+
+    def refresh(self):
+        if self._selection_stale:
+            self._selection_stale = False
+            self.summary.set_selection(self.scene.selectedItems())
+
+        for item in self._changed_items:
+            self.summary.update_item(item)
+        self._changed_items.clear()
+
+        summary = self.summary
+        item = summary.first
+
+        if item is None:
+            self._show("enabled", False, self.setEnabled)
+            self._show("width", (1, False), self._show_width)
+            self._show("color", None, self._show_color)
+            self._show("pos", (0.0, 0.0, False), self._show_pos)
+            self._show("type", "Тип не выбран", self.lbl_type.setText)
+            return
+        
+        self._show("enabled", True, self.setEnabled)
 
-            self.lbl_type.setText("Тип не выбран")
+        width = summary.width if summary.width is not None else 1
+        self._show("width", (width, summary.is_width_mixed), self._show_width)
+        self._show("color", summary.color or "#000000", self._show_color)
 
-            self.spin_x.blockSignals(True)
-            self.spin_y.blockSignals(True)
-            self.spin_x.setValue(0)
-            self.spin_y.setValue(0)
-            self.spin_x.blockSignals(False)
-            self.spin_y.blockSignals(False)
+        # Позицию первого читаем напрямую: при перетаскивании мышью она меняется без уведомлений
+        pos = item.pos()
+        self._show("pos", (float(pos.x()), float(pos.y()), summary.is_position_mixed), self._show_pos)
 
-            return
-        
-        self.setEnabled(True)
+        if hasattr(item, "type_name"):
+            type_text = item.type_name.capitalize()
+        else:
+            type_text = type(item).__name__
 
-        self.update_width_ui(selected_items)
+        if len(summary) > 1:
+            type_text += f" (+{len(summary)-1})"
 
-        item = selected_items[0]
+        self._show("type", type_text, self.lbl_type.setText)
 
-        current_width = 1
-        current_color = "#000000"
+    def _show(self, key, value, apply):
+        # Виджет трогаем, только если показываемое значение изменилось
+        if self._shown.get(key, self) != value:
+            self._shown[key] = value
+            apply(value)
 
-        if hasattr(item, "pen") and item.pen() is not None:
-            current_width = item.pen().width()
-            current_color = item.pen().color().name()
+    def _show_width(self, state):
+        width, is_mixed = state
 
         self.spin_width.blockSignals(True)
-        self.spin_width.setValue(current_width)
+        self.spin_width.setValue(width)
         self.spin_width.blockSignals(False)
 
-        self.btn_color.setStyleSheet(f"background-color: {current_color}; border: 1px solid gray;")
+        if is_mixed:
+            self.spin_width.setStyleSheet("background-color: #fffacd;")
+            self.spin_width.setToolTip("Выбраны оюъекты с разной толщиной")
+        else:
+            self.spin_width.setStyleSheet("")
+            self.spin_width.setToolTip("")
+
+    def _show_color(self, color):
+        if color is None:
+            self.btn_color.setStyleSheet("background-color: transparent")
+        else:
+            self.btn_color.setStyleSheet(f"background-color: {color}; border: 1px solid gray;")
+
+    def _show_pos(self, state):
+        x, y, is_mixed = state
 
         self.spin_x.blockSignals(True)
         self.spin_y.blockSignals(True)
-        
-        self.spin_x.setValue(float(item.pos().x()))
-        self.spin_y.setValue(float(item.pos().y()))
-
+        self.spin_x.setValue(x)
+        self.spin_y.setValue(y)
         self.spin_x.blockSignals(False)
         self.spin_y.blockSignals(False)
 
-        if hasattr(item, "type_name"):
-            type_text = item.type_name.capitalize()
-        else:
-            type_text = type(item).__name__
-
-        if len(selected_items) > 1:
-            type_text += f" (+{len(selected_items)-1})"
-
-        self.lbl_type.setText(type_text)
+        style = "background-color: #fffacd;" if is_mixed else ""
+        self.spin_x.setStyleSheet(style)
+        self.spin_y.setStyleSheet(style)
 
     def on_width_changed(self, value):
         selected_items = self.scene.selectedItems()
@@ -126,69 +191,69 @@ class PropertiesPanel(QWidget):
         if not selected_items:
             return
 
-        self.undo_stack.beginMacro("Change Width All")
-
-        for item in selected_items:
-            cmd = ChangeWidthCommand(item, value)
-            self.undo_stack.push(cmd)
-        self.undo_stack.endMacro()
+        # Шаги спинбокса сливаются в одну команду до конца редактирования
+        if self._width_edit is None:
+            self._width_edit = f"panel-width-{next(_edits)}"
+        self.undo_stack.push(BulkChangeWidthCommand(self.scene, selected_items, value, self._width_edit))
         self.scene.update()
 
+    def end_width_edit(self):
+        self._width_edit = None
+
     def on_color_clicked(self):
-        color = QColorDialog.getColor(title="Выберите цвет линии")
+        selected_items = self.scene.selectedItems()
+        dialog = QColorDialog(self)
+        dialog.setWindowTitle("Выберите цвет линии")
+        if self.summary.color:
+            dialog.setCurrentColor(QColor(self.summary.color))
+
+        # Предпросмотр: выделение перекрашивается, пока цвет выбирается в диалоге.
+        # Шаги одного выбора сливаются в одну команду, отмена диалога её убирает
+        start = self.undo_stack.index()
+        merge_key = f"panel-color-{next(_edits)}"
+
+        def preview(color):
+            if selected_items and color.isValid():
+                self.undo_stack.push(BulkChangeColorCommand(self.scene, selected_items, color.name(), merge_key))
+
+        dialog.currentColorChanged.connect(preview)
+        accepted = dialog.exec()
+        dialog.currentColorChanged.disconnect(preview)
+
+        if not accepted:
+            if self.undo_stack.index() > start:
+                # Устаревшую команду стек удаляет при redo(), не выполняя её
+                self.undo_stack.undo()
+                self.undo_stack.command(self.undo_stack.index()).setObsolete(True)
+                self.undo_stack.redo()
+            return
 
+        color = dialog.selectedColor()
         if color.isValid():
-            hex_color = color.name()
-            current_width = self.spin_width.value()
-
-            self.btn_color.setStyleSheet(f"background-color: {hex_color}; border: 1px solid gray;")
-            selected_items = self.scene.selectedItems()
-
-            if not selected_items:
-                return
-            
-            self.undo_stack.beginMacro("Change Color All")
+            self.btn_color.setStyleSheet(f"background-color: {color.name()}; border: 1px solid gray;")
+            preview(color)
+
+    def on_style_color_clicked(self):
+        # Правка записи таблицы стилей: перекрашиваются все фигуры документа
+        # с этим стилем, не только выделенные
+        self.refresh()
+        summary = self.summary
+        style = getattr(summary.first, "style", None)
+        if style is None or summary.is_color_mixed or summary.is_width_mixed:
+            return
 
-            for item in selected_items:
-                cmd = ChangeColorCommand(item, hex_color)
-                self.undo_stack.push(cmd)
-                
-            self.undo_stack.endMacro()
+        color = QColorDialog.getColor(QColor(style.color), self, "Цвет всех фигур стиля")
+        if color.isValid():
+            self.undo_stack.push(RestyleCommand(self.scene, style, color.name(), style.width))
 
     def on_geo_changed(self):
-        selected_items = self.scene.selectedItems()
-        for item in selected_items:
-            new_x = self.spin_x.value()
-            new_y = self.spin_y.value()
-            item.setPos(new_x, new_y)
-
-        self.scene.update()
-
-    def update_width_ui(self, selected_items):
-        self.spin_width.blockSignals(True)
-
-        first_width = -1
-        is_mixed = False
-
-        for i, item in enumerate(selected_items):
-            if not hasattr(item, "pen"): continue
-
-            w = item.pen().width()
-
-            if i == 0:
-                first_width = w
-            else:
-                if w != first_width:
-                    is_mixed = True
-                    break
+        # X/Y показывают позицию первого элемента: выделение сдвигается целиком,
+        # сохраняя взаимное расположение, а шаги спинбоксов сливаются в одну команду
+        self.refresh()
+        item = self.summary.first
+        if item is None:
+            return
 
-        if is_mixed:
-            self.spin_width.setValue(first_width)
-            self.spin_width.setStyleSheet("background-color: #fffacd;")
-            self.spin_width.setToolTip("Выбраны оюъекты с разной толщиной")
-        else:
-            self.spin_width.setValue(first_width)
-            self.spin_width.setStyleSheet("")
-            self.spin_width.setToolTip("")
-        
-        self.spin_width.blockSignals(False)
\ No newline at end of file
+        pos = item.pos()
+        self.canvas.translate_selection(self.spin_x.value() - pos.x(), self.spin_y.value() - pos.y(),
+                                        merge_key="panel-pos")
@@ -0,0 +1,68 @@
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QDoubleSpinBox, QFormLayout, QComboBox, QLineEdit, QSpinBox
+from PySide6.QtGui import QColor
+
+KINDS = (("Любой", None), ("Линия", "line"), ("Прямоугольник", "rect"),
+         ("Эллипс", "ellipse"), ("Ломаная", "polyline"), ("Группа", "group"))
+MAX_SIZE = 1_000_000
+
+
+class SelectWhereDialog(QDialog):
+    # Условия для EditorCanvas.select_where(); нулевые значения - "не важно"
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Выделить по условию")
+
+        layout = QFormLayout(self)
+
+        self.combo_kind = QComboBox()
+        for title, kind in KINDS:
+            self.combo_kind.addItem(title, kind)
+        layout.addRow("Тип:", self.combo_kind)
+
+        self.edit_color = QLineEdit()
+        self.edit_color.setPlaceholderText("любой, например red или #ff0000")
+        layout.addRow("Цвет:", self.edit_color)
+
+        self.spin_width = QSpinBox()
+        self.spin_width.setRange(0, 50)
+        self.spin_width.setSpecialValueText("любая")
+        layout.addRow("Толщина:", self.spin_width)
+
+        self.spin_min_w = self._size_spin()
+        layout.addRow("Шире чем:", self.spin_min_w)
+
+        self.spin_min_h = self._size_spin()
+        layout.addRow("Выше чем:", self.spin_min_h)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+        self.edit_color.textChanged.connect(
+            lambda: buttons.button(QDialogButtonBox.Ok).setEnabled(self._color_valid()))
+
+    def filters(self) -> dict:
+        result = {}
+        if self.combo_kind.currentData() is not None:
+            result["kind"] = self.combo_kind.currentData()
+        if self.edit_color.text().strip():
+            result["color"] = self.edit_color.text().strip()
+        if self.spin_width.value() > 0:
+            result["width"] = self.spin_width.value()
+        if self.spin_min_w.value() > 0:
+            result["min_w"] = self.spin_min_w.value()
+        if self.spin_min_h.value() > 0:
+            result["min_h"] = self.spin_min_h.value()
+        return result
+
+    def _color_valid(self) -> bool:
+        text = self.edit_color.text().strip()
+        return not text or QColor(text).isValid()
+
+    @staticmethod
+    def _size_spin() -> QDoubleSpinBox:
+        spin = QDoubleSpinBox()
+        spin.setRange(0, MAX_SIZE)
+        spin.setSpecialValueText("-")
+        return spin
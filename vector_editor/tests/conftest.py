@@ -0,0 +1,25 @@
+import gc
+import os
+import sys
+
+import pytest
+
+# Тесты запускаются без окна: cd vector_editor && python -m pytest -q
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+
+@pytest.fixture(scope="session", autouse=True)
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(autouse=True)
+def collect_garbage():
+    # Сцена связана циклами ссылок с индексами и фигурами, её освобождает сборщик
+    # мусора. Сработав в потоке загрузки или сохранения, он удалил бы сцену Qt
+    # не из UI-потока - поэтому мусор собираем после каждого теста
+    yield
+    gc.collect()
@@ -0,0 +1,95 @@
+import random
+
+import pytest
+from PySide6.QtCore import QPointF, QRectF
+
+from src.logic.cache_policy import CachePolicy
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.spatial_index import IndexedScene
+
+
+def _polyline(count: int, x: float = 0.0):
+    points = [value for i in range(count) for value in (x + i * 2, (i % 2) * 5)]
+    return ShapeFactory.create_polyline(points, "red")
+
+
+@pytest.fixture
+def scene(monkeypatch):
+    monkeypatch.setattr(CachePolicy, "COST_THRESHOLD", 20)
+    scene = IndexedScene()
+    yield scene
+    scene.clear()
+
+
+def _group(scene, *children):
+    group = Group()
+    scene.addItem(group)
+    for child in children:
+        scene.addItem(child)
+        group.addToGroup(child)
+    return group
+
+
+def test_group_cost_follows_child_geometry(scene):
+    child = _polyline(10)
+    inner = _group(scene, child)
+    outer = _group(scene, inner, _polyline(5, 50))
+    assert outer.paint_cost() == 15
+
+    child.assign((tuple(range(40)),), "red", 2)
+    assert inner.paint_cost() == 20
+    assert outer.paint_cost() == 25
+
+
+def test_cache_is_rebuilt_when_child_changes(scene):
+    child = _polyline(10)
+    group = _group(scene, child, _polyline(10, 40))
+    policy = scene.cache_policy
+    policy.flush()
+    assert policy.cached_count == 1
+    memory = policy.memory
+
+    child.moveBy(0, 300)
+    policy.flush()
+    assert policy.memory > memory
+    assert policy._cached[group][1].height() >= 300
+
+    # Ребёнок стал проще - группа дешевле порога и выходит из кэша
+    child.assign(((0, 0, 1, 1),), "red", 2)
+    policy.flush()
+    assert group.paint_cost() == 12
+    assert policy.cached_count == 0
+
+
+def test_child_edits_are_evaluated_once(scene, monkeypatch):
+    group = _group(scene, *(_polyline(3, i * 10) for i in range(50)))
+    policy = scene.cache_policy
+    policy.flush()
+    evaluated = []
+    monkeypatch.setattr(policy, "evaluate", evaluated.append)
+
+    for child in group.childItems():
+        child.moveBy(1, 1)
+    assert evaluated == []
+    policy.flush()
+    assert evaluated == [group]
+
+
+def test_group_bounds_follow_child_edits(scene):
+    rng = random.Random(4)
+    inner = _group(scene, *(_polyline(3, i * 10) for i in range(5)))
+    group = _group(scene, inner, *(_polyline(3, i * 10) for i in range(40)))
+    children = group.childItems() + inner.childItems()
+
+    for _ in range(300):
+        child = rng.choice(children)
+        if rng.random() < 0.5:
+            child.setPos(rng.uniform(-200, 200), rng.uniform(-200, 200))
+        else:
+            child.setRotation(rng.uniform(0, 90))
+
+        expected = QRectF()
+        for item in group.childItems():
+            expected = expected.united(item.mapRectToParent(item.boundingRect()))
+        assert group.boundingRect() == expected
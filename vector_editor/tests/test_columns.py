@@ -0,0 +1,150 @@
+import math
+
+import pytest
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtGui import QUndoStack
+
+from src.logic import transforms
+from src.logic.columnar import COLUMNS, DocumentColumns
+from src.logic.commands.commands import BatchMoveCommand, BulkChangeColorCommand, TransformCommand
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.spatial_index import IndexedScene
+
+
+def _rect(scene, w, h, color="red", x=0.0, y=0.0):
+    shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(w, h), color)
+    shape.setPos(x, y)
+    scene.addItem(shape)
+    return shape
+
+
+def _size(scene, item) -> tuple:
+    table, row, _ = scene.columns._rows[item]
+    return table["w"][row], table["h"][row]
+
+
+def _scene_factor(item) -> float:
+    t = item.sceneTransform()
+    return math.hypot(t.m11(), t.m12())
+
+
+@pytest.fixture
+def scene():
+    scene = IndexedScene()
+    yield scene
+    scene.clear()
+
+
+def test_size_uses_scene_scale_of_rotated_and_grouped_shapes(scene):
+    rotated = _rect(scene, 20, 10)
+    rotated.setRotation(35)
+    rotated.setScale(1.5)
+
+    inner = _rect(scene, 8, 4, x=50)
+    inner.setScale(2)
+    group = Group()
+    scene.addItem(group)
+    group.addToGroup(inner)
+    group.setRotation(-20)
+    group.setScale(3)
+
+    scene.columns.flush()
+    for item, (w, h) in ((rotated, (20, 10)), (inner, (8, 4))):
+        factor = _scene_factor(item)
+        assert _size(scene, item) == pytest.approx((w * factor, h * factor))
+
+
+def test_where_filters_by_style_size_and_area(scene):
+    small = _rect(scene, 5, 5, "red")
+    wide = _rect(scene, 40, 5, "red", x=100)
+    blue = _rect(scene, 40, 5, "blue", x=200)
+
+    columns = scene.columns
+    assert set(columns.where(color="red")) == {small, wide}
+    assert set(columns.where(color="red", min_w=10)) == {wide}
+    assert set(columns.where(kind="rect", area=QRectF(190, -10, 100, 30))) == {blue}
+    assert columns.where(kind="ellipse") == []
+
+
+def test_similar_type_returns_top_level_items_only(scene):
+    loose = _rect(scene, 5, 5)
+    nested = _rect(scene, 5, 5, x=20)
+    group = Group()
+    scene.addItem(group)
+    group.addToGroup(nested)
+
+    assert scene.columns.similar([loose], "type") == {loose}
+    assert scene.columns.similar([loose], "color") == {loose, group}
+
+
+def test_members_follow_grouping(scene):
+    loose = _rect(scene, 5, 5)
+    children = [_rect(scene, 5, 5, x=20 * i) for i in range(1, 4)]
+    inner = Group()
+    scene.addItem(inner)
+    inner.addToGroup(children[2])
+    outer = Group()
+    scene.addItem(outer)
+    for item in (children[0], children[1], inner):
+        outer.addToGroup(item)
+
+    columns = scene.columns
+    assert columns.members() == {loose, outer}
+    assert columns.members(outer.uid) == {children[0], children[1], inner}
+    assert columns.members(inner.uid) == {children[2]}
+
+    scene.destroyItemGroup(outer)
+    assert columns.members() == {loose, children[0], children[1], inner}
+    assert columns.members(outer.uid) == set()
+    assert columns.members(inner.uid) == {children[2]}
+
+
+def test_bounds_follow_moves(scene):
+    shape = _rect(scene, 10, 10)
+    shape.setPos(-100, 50)
+    assert scene.columns.bounds() == QRectF(-101, 49, 12, 12)
+
+
+def _rows(columns) -> dict:
+    columns.flush()
+    return {item: (table.kind, tuple(round(table[name][row], 6) for name, _ in COLUMNS))
+            for item, (table, row, _) in columns._rows.items()}
+
+
+def _reread(scene) -> dict:
+    fresh = DocumentColumns(scene)
+    for item in top_level_items(scene):
+        fresh.mark_dirty(item)
+    return _rows(fresh)
+
+
+def test_moves_and_recolors_update_columns_without_rereading(scene, monkeypatch):
+    shapes = [_rect(scene, 10 + i, 5, x=30 * i) for i in range(6)]
+    group = Group()
+    scene.addItem(group)
+    for shape in shapes[3:]:
+        group.addToGroup(shape)
+    group.setRotation(30)
+    tops = [shapes[0], shapes[1], shapes[2], group]
+    scene.columns.flush()
+
+    reread = []
+    monkeypatch.setattr(DocumentColumns, "_collect", lambda *args: reread.append(args))
+    stack = QUndoStack()
+    starts = [item.pos() for item in tops]
+    ends = [pos + QPointF(15, -40) for pos in starts]
+    stack.push(BatchMoveCommand(scene, tops, starts, ends))
+    before = transforms.capture(tops)
+    stack.push(TransformCommand(scene, tops, before, transforms.translated(before, -3, 7), "Move"))
+    stack.push(BulkChangeColorCommand(scene, [shapes[1], group], "#0000ff"))
+    stack.undo()
+    stack.undo()
+    stack.redo()
+    stack.redo()
+
+    assert reread == []
+    assert set(scene.columns.where(color="#0000ff")) == {shapes[1], *shapes[3:]}
+    monkeypatch.undo()
+    assert _rows(scene.columns) == _reread(scene)
@@ -0,0 +1,189 @@
+import pytest
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtGui import QUndoStack
+
+from src.logic import transforms
+from src.logic.commands.commands import (BatchMoveCommand, BulkChangeColorCommand, BulkChangeWidthCommand,
+                                         TransformCommand)
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.spatial_index import IndexedScene
+
+
+@pytest.fixture
+def shapes():
+    return [ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(10, 10), color)
+            for color in ("#ff0000", "#00ff00")]
+
+
+def _colors(shapes) -> list:
+    return [shape.color for shape in shapes]
+
+
+def test_color_changes_without_merge_key_stay_separate(shapes):
+    stack = QUndoStack()
+    stack.push(BulkChangeColorCommand(None, shapes, "#0000ff"))
+    stack.push(BulkChangeColorCommand(None, shapes, "#000000"))
+
+    assert stack.count() == 2
+    stack.undo()
+    assert _colors(shapes) == ["#0000ff", "#0000ff"]
+
+
+def test_one_interactive_edit_merges(shapes):
+    stack = QUndoStack()
+    for color in ("#0000ff", "#111111", "#222222"):
+        stack.push(BulkChangeColorCommand(None, shapes, color, "edit-1"))
+    stack.push(BulkChangeColorCommand(None, shapes, "#333333", "edit-2"))
+
+    assert stack.count() == 2
+    stack.undo()
+    stack.undo()
+    assert _colors(shapes) == ["#ff0000", "#00ff00"]
+
+
+def test_edit_back_to_original_colors_is_dropped(shapes):
+    stack = QUndoStack()
+    same = shapes[:1]
+    stack.push(BulkChangeColorCommand(None, same, "#0000ff", "edit"))
+    stack.push(BulkChangeColorCommand(None, same, "#ff0000", "edit"))
+
+    assert stack.count() == 0
+    assert same[0].color == "#ff0000"
+
+
+def test_cancelled_preview_is_removed_from_history(shapes):
+    # Так панель свойств убирает предпросмотр, если диалог цвета отменён
+    stack = QUndoStack()
+    stack.push(BulkChangeColorCommand(None, shapes, "#0000ff", "edit"))
+    stack.undo()
+    stack.command(stack.index()).setObsolete(True)
+    stack.redo()
+
+    assert stack.count() == 0
+    assert _colors(shapes) == ["#ff0000", "#00ff00"]
+
+
+def test_width_changes_merge_only_within_one_edit(shapes):
+    stack = QUndoStack()
+    for width in (2, 3, 4):
+        stack.push(BulkChangeWidthCommand(None, shapes, width, "edit-1"))
+    stack.push(BulkChangeWidthCommand(None, shapes, 5, "edit-2"))
+    stack.push(BulkChangeWidthCommand(None, shapes, 6))
+    stack.push(BulkChangeWidthCommand(None, shapes, 7))
+
+    assert stack.count() == 4
+    stack.undo()
+    stack.undo()
+    stack.undo()
+    assert [shape.pen().width() for shape in shapes] == [4, 4]
+
+
+def test_restyling_a_large_group_notifies_once():
+    scene = IndexedScene()
+    group = Group()
+    scene.addItem(group)
+    with scene.batch_changes():
+        for i in range(2000):
+            shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(5, 5), "#ff0000")
+            shape.setPos(i % 50 * 10, i // 50 * 10)
+            scene.addItem(shape)
+            group.addToGroup(shape)
+
+    widths = {shape.pen().width() for shape in group.childItems()}
+    changed = []
+    scene.add_change_listener(changed.append)
+    stack = QUndoStack()
+    stack.push(BulkChangeWidthCommand(scene, [group], 3))
+    stack.push(BulkChangeColorCommand(scene, [group], "#0000ff"))
+    stack.undo()
+    stack.undo()
+
+    assert changed == [group] * 4
+    assert {shape.pen().width() for shape in group.childItems()} == widths
+    assert {shape.color for shape in group.childItems()} == {"#ff0000"}
+    scene.clear()
+
+
+def _placed(scene, count) -> list:
+    shapes = []
+    for i in range(count):
+        shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(10, 10), "#ff0000")
+        shape.setPos(i * 20, 0)
+        scene.addItem(shape)
+        shapes.append(shape)
+    return shapes
+
+
+def _united(items) -> QRectF:
+    rect = QRectF()
+    for item in items:
+        rect = rect.united(item.sceneBoundingRect())
+    return rect
+
+
+def test_batch_move_updates_positions_journal_and_indexes():
+    scene = IndexedScene()
+    shapes = _placed(scene, 3)
+    starts = [shape.pos() for shape in shapes]
+    ends = [QPointF(500 + i * 20, 300) for i in range(3)]
+    command = BatchMoveCommand(scene, shapes, starts, ends)
+    stack = QUndoStack()
+    stack.push(command)
+
+    assert [shape.pos() for shape in shapes] == ends
+    assert set(scene.spatial_index.items_in(QRectF(490, 290, 80, 30))) == set(shapes)
+    assert scene.spatial_index.items_in(QRectF(-5, -5, 60, 20)) == []
+    assert scene.columns.bounds() == _united(shapes)
+    uids = [shape.uid for shape in shapes]
+    assert command.journal_records() == [{"op": "move", "ids": uids, "positions": [500, 300, 520, 300, 540, 300]}]
+    assert command.journal_records(undo=True) == [{"op": "move", "ids": uids, "positions": [0, 0, 20, 0, 40, 0]}]
+
+    stack.undo()
+    assert [shape.pos() for shape in shapes] == starts
+    assert set(scene.spatial_index.items_in(QRectF(-5, -5, 60, 20))) == set(shapes)
+    assert scene.columns.bounds() == _united(shapes)
+
+    stack.redo()
+    assert [shape.pos() for shape in shapes] == ends
+    assert scene.columns.bounds() == _united(shapes)
+    scene.clear()
+
+
+def test_transform_command_rotates_scales_and_merges_position_steps():
+    scene = IndexedScene()
+    shapes = _placed(scene, 2)
+    before = transforms.capture(shapes)
+    rotated = transforms.rotated_scaled(before, 90, 2.0, 0, 0)
+    stack = QUndoStack()
+    stack.push(TransformCommand(scene, shapes, before, rotated, "Rotate"))
+
+    assert transforms.capture(shapes) == rotated
+    assert (shapes[1].rotation(), shapes[1].scale()) == (90, 2.0)
+    assert shapes[1] in scene.spatial_index.items_in(shapes[1].sceneBoundingRect())
+    assert scene.columns.bounds() == _united(shapes)
+
+    # Шаги спинбоксов X/Y одного редактирования - одна команда, только сдвиг
+    for dx in (5, 10, 15):
+        stack.push(TransformCommand(scene, shapes, transforms.capture(shapes),
+                                    transforms.translated(rotated, dx, 0), "Move", merge_key="panel-pos"))
+    assert stack.count() == 2
+    command = stack.command(1)
+    assert command.translation
+    assert transforms.capture(shapes) == transforms.translated(rotated, 15, 0)
+    assert command.journal_records() == [{"op": "transform", "ids": [shape.uid for shape in shapes],
+                                          "state": transforms.translated(rotated, 15, 0).tolist()}]
+    assert scene.columns.bounds() == _united(shapes)
+
+    stack.undo()
+    assert transforms.capture(shapes) == rotated
+    stack.undo()
+    assert transforms.capture(shapes) == before
+    assert scene.columns.bounds() == _united(shapes)
+
+    # Возврат в начальное состояние тем же редактированием убирает команду
+    stack.redo()
+    stack.push(TransformCommand(scene, shapes, rotated, transforms.translated(rotated, 5, 0), "Move", "edit"))
+    stack.push(TransformCommand(scene, shapes, transforms.translated(rotated, 5, 0), rotated, "Move", "edit"))
+    assert stack.count() == 1 and transforms.capture(shapes) == rotated
+    scene.clear()
@@ -0,0 +1,55 @@
+import pytest
+from PySide6.QtCore import QPointF, Qt
+from PySide6.QtGui import QImage, QPainter
+from PySide6.QtWidgets import QStyleOptionGraphicsItem, QWidget
+
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.spatial_index import IndexedScene
+
+
+@pytest.fixture
+def group():
+    scene = IndexedScene()
+    group = Group()
+    scene.addItem(group)
+    for i in range(3):
+        shape = ShapeFactory.create_shape("rect", QPointF(i * 10, 0), QPointF(i * 10 + 8, 8), "red")
+        scene.addItem(shape)
+        group.addToGroup(shape)
+    # Кэш включён: группа рисует детей сама при любом масштабе
+    group.set_cached(True)
+    yield group
+    scene.clear()
+
+
+def _paint(group, scale: float, widget):
+    image = QImage(200, 200, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    painter.scale(scale, scale)
+    group.paint(painter, QStyleOptionGraphicsItem(), widget)
+    painter.end()
+
+
+def test_small_group_at_full_zoom_paints_vectors(group):
+    _paint(group, 1.0, QWidget())
+    assert group._bitmap is None
+
+
+def test_zoomed_out_view_uses_bitmap(group):
+    _paint(group, 0.1, QWidget())
+    assert group._bitmap is not None
+
+
+def test_painter_without_view_paints_vectors(group):
+    _paint(group, 0.1, None)
+    assert group._bitmap is None
+
+
+def test_update_lod_ignores_small_groups_at_full_zoom(group):
+    group.set_cached(False)
+    group.update_lod(1.0)
+    assert not group._lod_small
+    group.update_lod(0.1)
+    assert group._lod_small
@@ -0,0 +1,77 @@
+import pytest
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QColor, QImage
+
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.spatial_index import IndexedScene
+from src.logic.strategies import ImageSaveStrategy
+from src.logic.virtual_document import ShapeRecord, VirtualDocument
+
+
+def _rect(scene, x, y, w, h, color):
+    shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(w, h), color)
+    shape.setPos(x, y)
+    scene.addItem(shape)
+    return shape
+
+
+def _export(tmp_path, scene, **options) -> QImage:
+    path = str(tmp_path / "out.png")
+    ImageSaveStrategy("PNG", background="white", **options).save(path, scene)
+    return QImage(path)
+
+
+def test_export_covers_content_outside_scene_rect(tmp_path):
+    scene = IndexedScene()
+    scene.setSceneRect(0, 0, 100, 100)
+    _rect(scene, -300, -200, 50, 40, "red")
+    _rect(scene, 200, 150, 50, 40, "blue")
+
+    image = _export(tmp_path, scene)
+    # Границы содержимого: фигуры плюс половина пера (толщина 2)
+    assert (image.width(), image.height()) == (552, 392)
+    assert QColor(image.pixel(1, 20)).name() == "#ff0000"
+    assert QColor(image.pixel(550, 370)).name() == "#0000ff"
+
+
+def test_shape_spanning_tiles_is_drawn_in_each(tmp_path):
+    scene = IndexedScene()
+    _rect(scene, 0, 0, 300, 300, "red")
+    _rect(scene, 0, 0, 1, 1, "white")
+
+    image = _export(tmp_path, scene, tile_size=64)
+    for y in (1, 63, 64, 65, 200, 300):
+        assert QColor(image.pixel(300, y)).name() == "#ff0000", y
+
+
+def test_export_draws_dormant_records(tmp_path):
+    scene = IndexedScene()
+    document = VirtualDocument(scene)
+    scene.set_document(document)
+    document.add_records([ShapeRecord(1, "line", 0.0, 0.0, 0.0, 50.0, 100.0, 50.0, "#00ff00", 4)])
+    _rect(scene, 0, 0, 100, 100, "blue")
+
+    image = _export(tmp_path, scene)
+    assert document.dormant_count == 1
+    assert QColor(image.pixel(50, 52)).name() == "#00ff00"
+
+
+def test_jpeg_export_is_encoded_into_the_file(tmp_path):
+    scene = IndexedScene()
+    _rect(scene, 0, 0, 300, 200, "red")
+    path = str(tmp_path / "out.jpg")
+    ImageSaveStrategy("JPG", background="white", tile_size=128).save(path, scene)
+
+    image = QImage(path)
+    assert (image.width(), image.height()) == (302, 202)
+    assert image.pixelColor(1, 100).red() > 200 and image.pixelColor(150, 100).green() > 200
+
+
+def test_oversized_jpeg_is_rejected(tmp_path, monkeypatch):
+    scene = IndexedScene()
+    _rect(scene, 0, 0, 300, 200, "red")
+    monkeypatch.setattr(ImageSaveStrategy, "MAX_WHOLE_PIXELS", 300 * 200)
+    path = tmp_path / "out.jpg"
+    with pytest.raises(ValueError):
+        ImageSaveStrategy("JPG").save(str(path), scene)
+    assert not path.exists()
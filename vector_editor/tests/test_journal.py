@@ -0,0 +1,132 @@
+import glob
+import pytest
+from PySide6.QtCore import QPointF
+
+from src.logic import transforms
+from src.logic.commands.commands import (AddShapeCommand, BulkChangeColorCommand, BulkChangeWidthCommand,
+                                         DeleteCommand, TransformCommand)
+from src.logic.commands.history import command_size
+from src.logic.journal import CommandJournal, JournaledUndoStack
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.spatial_index import IndexedScene
+
+
+def _shape(kind="rect", x=0.0, y=0.0, color="red"):
+    shape = ShapeFactory.create_shape(kind, QPointF(0, 0), QPointF(20, 10), color)
+    shape.setPos(x, y)
+    return shape
+
+
+def _recounted(stack) -> int:
+    return sum(command_size(stack.command(i)) for i in range(stack.count()))
+
+
+def _state(scene) -> list:
+    return sorted(str(sorted(item.to_dict().items())) for item in top_level_items(scene))
+
+
+def test_running_memory_total_matches_full_recount():
+    scene = IndexedScene()
+    stack = JournaledUndoStack(step_limit=6)
+    shapes = []
+
+    for i in range(4):
+        shapes.append(_shape(x=i * 30))
+        stack.push(AddShapeCommand(scene, shapes[-1]))
+        assert stack.memory_used == _recounted(stack)
+
+    for width in (3, 4, 5):
+        stack.push(BulkChangeWidthCommand(scene, shapes, width))
+        assert stack.memory_used == _recounted(stack)
+
+    stack.undo()
+    stack.undo()
+    assert stack.memory_used == _recounted(stack)
+
+    stack.beginMacro("Delete")
+    for shape in shapes[:2]:
+        stack.push(DeleteCommand(scene, shape))
+    stack.endMacro()
+    assert stack.memory_used == _recounted(stack)
+
+    # Предел шагов: самые старые команды удаляются
+    for color in ("#000001", "#000002", "#000003", "#000004"):
+        stack.push(BulkChangeColorCommand(scene, shapes[2:], color))
+        assert stack.count() <= 6
+        assert stack.memory_used == _recounted(stack)
+
+    stack.setIndex(1)
+    stack.push(BulkChangeColorCommand(scene, shapes[2:], "#123456", "edit"))
+    stack.push(BulkChangeColorCommand(scene, shapes[2:], "#654321", "edit"))
+    assert stack.memory_used == _recounted(stack)
+
+    stack.clear()
+    assert stack.memory_used == 0
+
+
+def test_compaction_updates_running_total():
+    scene = IndexedScene()
+    stack = JournaledUndoStack(memory_budget=1, keep_live=1)
+    shapes = [_shape(x=i * 30) for i in range(5)]
+    for shape in shapes:
+        scene.addItem(shape)
+    for shape in shapes:
+        stack.push(DeleteCommand(scene, shape))
+
+    assert all(stack.command(i).record is not None for i in range(3))
+    assert stack.memory_used == _recounted(stack)
+
+
+@pytest.fixture
+def journaled(tmp_path):
+    scene = IndexedScene()
+    stack = JournaledUndoStack()
+    stack.journal = CommandJournal(scene, sync_interval_ms=60000)
+    stack.journal.start(str(tmp_path / "p.journal"))
+    yield scene, stack
+    stack.journal.close()
+
+
+def test_journal_replay_restores_scene(journaled):
+    scene, stack = journaled
+    shapes = [_shape("rect", 0, 0), _shape("ellipse", 50, 20), _shape("line", -30, 40)]
+    polyline = ShapeFactory.create_polyline([0, 0, 10, 5, 20, -5, 30, 0], "blue")
+    for shape in shapes + [polyline]:
+        stack.push(AddShapeCommand(scene, shape))
+
+    stack.push(BulkChangeColorCommand(scene, shapes[:2], "#00ff00"))
+    stack.push(BulkChangeWidthCommand(scene, shapes[1:], 5))
+    before = transforms.capture(shapes)
+    after = transforms.rotated_scaled(transforms.translated(before, 15, -5), 30, 2.0, 0, 0)
+    stack.push(TransformCommand(scene, shapes, before, after, "Transform"))
+    stack.push(DeleteCommand(scene, shapes[2]))
+    stack.undo()
+    stack.undo()
+    stack.redo()
+
+    stack.journal.sync()
+    snapshot, records = CommandJournal.read(stack.journal.path)
+    restored = IndexedScene()
+    assert CommandJournal.replay(restored, snapshot, records) == 0
+    assert _state(restored) == _state(scene)
+
+
+def test_journal_replay_after_compaction(journaled):
+    scene, stack = journaled
+    stack.journal.compact_every = 3
+    shapes = [_shape(x=i * 30) for i in range(4)]
+    for shape in shapes[:3]:
+        stack.push(AddShapeCommand(scene, shape))
+    stack.journal.compact()
+    # Снимок пишется в фоне; записи, сделанные тем временем, дописываются к нему
+    stack.push(AddShapeCommand(scene, shapes[3]))
+    stack.journal.wait_compaction()
+    stack.push(BulkChangeColorCommand(scene, shapes, "#abcdef"))
+
+    snapshot, records = CommandJournal.read(stack.journal.path)
+    assert snapshot is not None and len(records) == 2
+    assert not glob.glob(stack.journal.path + ".*")
+    restored = IndexedScene()
+    assert CommandJournal.replay(restored, snapshot, records) == 0
+    assert _state(restored) == _state(scene)
@@ -0,0 +1,46 @@
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPainterPath
+
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.path_cache import PathCache
+
+
+def _line(x1, y1, x2, y2) -> QPainterPath:
+    path = QPainterPath(QPointF(x1, y1))
+    path.lineTo(x2, y2)
+    return path
+
+
+def test_equal_shapes_share_geometry():
+    first, second = (ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(17, 9), "red") for _ in range(2))
+    assert first._geometry is second._geometry
+    assert first.shape() is first._geometry.outline()
+
+    second.set_stroke_width(first.stroke_width + 3)
+    assert first._geometry is not second._geometry
+    assert second._geometry.width == first.stroke_width + 3
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PathCache(max_size=2)
+    a = cache.lookup("line", (0, 0, 1, 1), 2, _line)
+    b = cache.lookup("line", (0, 0, 2, 2), 2, _line)
+    assert cache.lookup("line", (0, 0, 1, 1), 2, _line) is a
+
+    # Давнее всех использована запись b - её и вытесняет новая
+    cache.lookup("line", (0, 0, 3, 3), 2, _line)
+    assert len(cache) == 2
+    assert cache.lookup("line", (0, 0, 1, 1), 2, _line) is a
+    assert cache.lookup("line", (0, 0, 2, 2), 2, _line) is not b
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    cache.clear()
+    assert len(cache) == 0 and (cache.hits, cache.misses) == (0, 0)
+
+
+def test_key_includes_kind_and_width():
+    cache = PathCache()
+    entry = cache.lookup("line", (0, 0, 5, 5), 2, _line)
+    assert cache.lookup("line", (0, 0, 5, 5), 4, _line) is not entry
+    assert cache.lookup("rect", (0, 0, 5, 5), 2, _line) is not entry
+    assert cache.lookup("line", (-0.0, 0, 5, 5), 2, _line) is entry
@@ -0,0 +1,77 @@
+import pytest
+import shiboken6
+from PySide6.QtCore import QCoreApplication, QEvent, QEventLoop, QObject, QPointF
+
+from src.logic.io import FileManager
+from src.logic.loader import ProjectLoader
+from src.logic.saver import BackgroundSaver
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.spatial_index import IndexedScene
+from src.logic.strategies import BinarySaveStrategy, JsonSaveStrategy
+
+
+def _load(scene, path) -> int:
+    loop = QEventLoop()
+    result = {}
+    loader = ProjectLoader(scene, str(path))
+    loader.finished.connect(lambda errors: (result.setdefault("errors", errors), loop.quit()))
+    loader.failed.connect(lambda message: (result.setdefault("failed", message), loop.quit()))
+    loader.start()
+    loop.exec()
+    assert "failed" not in result, result.get("failed")
+    return result["errors"]
+
+
+@pytest.mark.parametrize("strategy, name", [(JsonSaveStrategy, "p.json"), (BinarySaveStrategy, "p.vec")])
+def test_reloaded_scene_rect_covers_negative_coordinates(tmp_path, strategy, name):
+    scene = IndexedScene()
+    scene.setSceneRect(0, 0, 800, 600)
+    shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(40, 30), "red")
+    shape.setPos(-500, -400)
+    scene.addItem(shape)
+    strategy().save(str(tmp_path / name), scene)
+
+    loaded = IndexedScene()
+    assert _load(loaded, tmp_path / name) == 0
+    rect = loaded.sceneRect()
+    assert rect.contains(QPointF(-500, -400))
+    assert rect.contains(QPointF(800, 600))
+
+
+@pytest.mark.parametrize("strategy, name", [(JsonSaveStrategy, "p.json"), (BinarySaveStrategy, "p.vec")])
+def test_header_keeps_scene_origin(tmp_path, strategy, name):
+    scene = IndexedScene()
+    scene.setSceneRect(-1000, -2000, 300, 200)
+    strategy().save(str(tmp_path / name), scene)
+
+    loaded = IndexedScene()
+    _load(loaded, tmp_path / name)
+    assert (loaded.sceneRect().x(), loaded.sceneRect().y()) == (-1000, -2000)
+
+
+def test_background_saver_is_released_after_save(tmp_path):
+    scene = IndexedScene()
+    scene.addItem(ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(40, 30), "red"))
+    owner = QObject()
+    saver = BackgroundSaver(JsonSaveStrategy(), str(tmp_path / "p.json"), parent=owner)
+
+    loop = QEventLoop()
+    saver.finished.connect(lambda filename: loop.quit())
+    saver.failed.connect(lambda message: loop.quit())
+    saver.start(scene)
+    loop.exec()
+
+    # Так окно отпускает сохраняльщика (VectorEditorWindow._release_saver)
+    worker = saver._worker
+    saver.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    assert owner.children() == []
+    assert not shiboken6.isValid(worker)
+    assert (tmp_path / "p.json").exists()
+
+
+def test_atomic_open_syncs_directory_after_replace(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(FileManager, "_fsync_directory", staticmethod(synced.append))
+    FileManager.save_project(str(tmp_path / "p.json"), {"shapes": []})
+    assert synced == [str(tmp_path)]
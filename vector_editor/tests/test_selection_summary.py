@@ -0,0 +1,58 @@
+from PySide6.QtCore import QPointF
+
+from src.logic.selection_summary import SelectionSummary
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+
+
+def _shape(kind, color, width, x=0.0):
+    shape = ShapeFactory.create_shape(kind, QPointF(0, 0), QPointF(10, 10), color)
+    shape.set_stroke_width(width)
+    shape.setPos(x, 0)
+    return shape
+
+
+def test_common_values_and_mixed_flags():
+    shapes = [_shape("rect", "red", 2), _shape("rect", "red", 2, x=5), _shape("ellipse", "blue", 4, x=5)]
+    summary = SelectionSummary()
+    summary.set_selection(shapes)
+
+    assert len(summary) == 3 and summary.first is shapes[0]
+    # Разные значения - самое частое
+    assert (summary.color, summary.width) == ("#ff0000", 2)
+    assert summary.is_color_mixed and summary.is_width_mixed and summary.is_position_mixed
+
+    summary.set_selection(shapes[1:2])
+    assert len(summary) == 1 and summary.first is shapes[1]
+    assert not (summary.is_color_mixed or summary.is_width_mixed or summary.is_position_mixed)
+
+
+def test_update_item_refreshes_one_snapshot():
+    shapes = [_shape("rect", "red", 2), _shape("line", "red", 2)]
+    summary = SelectionSummary()
+    summary.set_selection(shapes)
+
+    shapes[1].set_active_color("green")
+    shapes[1].setPos(30, 40)
+    assert not summary.is_color_mixed
+    assert summary.update_item(shapes[1])
+    assert summary.is_color_mixed and summary.colors == {"#ff0000": 1, "#008000": 1}
+    assert summary.positions == {(0.0, 0.0): 1, (30.0, 40.0): 1}
+
+    assert not summary.update_item(_shape("rect", "red", 2))
+    summary.clear()
+    assert len(summary) == 0 and summary.color is None and summary.first is None
+
+
+def test_group_counts_position_and_type_only():
+    group = Group()
+    shape = _shape("rect", "red", 3)
+    summary = SelectionSummary()
+    summary.set_selection([group, shape])
+
+    assert summary.widths == {3: 1} and summary.colors == {"#ff0000": 1}
+    assert summary.types == {"group": 1, "rect": 1}
+
+    summary.set_selection([group])
+    assert summary.width is None and summary.color is None
+    assert summary.types == {"group": 1}
@@ -0,0 +1,87 @@
+import math
+import random
+
+import pytest
+
+from src.logic.simplify import MAX_RUN, StreamSimplifier, simplify
+
+
+def _segment_distance(px, py, ax, ay, bx, by) -> float:
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2)) if length2 else 0.0
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def _max_deviation(points, simplified) -> float:
+    # Наибольшее расстояние от исходных точек до упрощённой ломаной
+    segments = list(zip(simplified[0::2], simplified[1::2], simplified[2::2], simplified[3::2]))
+    return max(min(_segment_distance(x, y, *segment) for segment in segments)
+               for x, y in zip(points[0::2], points[1::2]))
+
+
+def _walk(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    x = y = angle = 0.0
+    points = []
+    for _ in range(count):
+        angle += rng.uniform(-0.3, 0.3)
+        x, y = x + 2 * math.cos(angle), y + 2 * math.sin(angle)
+        points += (round(x), round(y))
+    return points
+
+
+def test_straight_line_keeps_endpoints():
+    points = [value for i in range(50) for value in (i, 2 * i)]
+    assert simplify(points, 0.5) == [0, 0, 49, 98]
+
+
+def test_corner_is_kept():
+    points = [0, 0, 5, 0, 10, 0, 10, 5, 10, 10]
+    assert simplify(points, 0.5) == [0, 0, 10, 0, 10, 10]
+
+
+def test_short_input_is_unchanged():
+    assert simplify([1, 2, 3, 4], 10) == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 1.5, 4.0])
+def test_simplify_stays_within_tolerance(tolerance):
+    points = _walk(400)
+    simplified = simplify(points, tolerance)
+    assert len(simplified) < len(points)
+    assert simplified[:2] == points[:2] and simplified[-2:] == points[-2:]
+    assert _max_deviation(points, simplified) <= tolerance + 1e-9
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 1.5, 4.0])
+def test_stream_stays_within_tolerance(tolerance):
+    points = _walk(400, seed=2)
+    stream = StreamSimplifier(tolerance)
+    for x, y in zip(points[0::2], points[1::2]):
+        stream.add(x, y)
+
+    streamed = stream.points()
+    assert streamed[:2] == points[:2] and streamed[-2:] == points[-2:]
+    assert _max_deviation(points, streamed) <= tolerance + 1e-9
+    # Как у инструмента: итог ещё раз через simplify, с тем же допуском на каждом шаге
+    assert _max_deviation(streamed, simplify(streamed, tolerance)) <= tolerance + 1e-9
+
+
+def test_stream_reports_new_vertices_and_skips_repeats():
+    stream = StreamSimplifier(1.0)
+    assert stream.add(0, 0)
+    assert not stream.add(0, 0)
+    assert not stream.add(10, 0)
+    assert not stream.add(20, 0)
+    assert stream.add(20, 10)
+    assert len(stream) == 2
+    assert stream.points() == [0, 0, 20, 0, 20, 10]
+
+
+def test_stream_bounds_open_run():
+    stream = StreamSimplifier(1.0)
+    for i in range(3 * MAX_RUN):
+        stream.add(i, 0)
+    assert len(stream) >= 3
+    assert stream.points()[-2:] == [3 * MAX_RUN - 1, 0]
@@ -0,0 +1,109 @@
+import math
+import random
+
+import pytest
+from PySide6.QtCore import QPointF
+
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.snapping import CELL_POINTS, _collect
+from src.logic.spatial_index import IndexedScene
+
+
+@pytest.fixture
+def scene():
+    scene = IndexedScene()
+    rng = random.Random(3)
+    for i in range(60):
+        kind = ("line", "rect", "ellipse")[i % 3]
+        shape = ShapeFactory.create_shape(kind, QPointF(0, 0), QPointF(rng.uniform(5, 40), rng.uniform(5, 40)), "red")
+        shape.setPos(rng.uniform(0, 500), rng.uniform(0, 500))
+        shape.setRotation(rng.choice((0, 30)))
+        scene.addItem(shape)
+
+    # Дети получают pos после addToGroup, как при загрузке
+    group = Group()
+    group.setPos(300, 300)
+    scene.addItem(group)
+    for i in range(3):
+        shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(10, 10), "blue")
+        group.addToGroup(shape)
+        shape.setPos(100 + i * 30, 80)
+    yield scene
+    scene.clear()
+
+
+def _brute_nearest(scene, x, y, radius):
+    best = None
+    for item in top_level_items(scene):
+        points = []
+        _collect(item, points)
+        for px, py in zip(points[0::2], points[1::2]):
+            distance = math.hypot(px - x, py - y)
+            if distance <= radius and (best is None or distance < best):
+                best = distance
+    return best
+
+
+def test_nearest_matches_brute_force(scene):
+    index = scene.snap_index
+    rng = random.Random(5)
+    queries = [(rng.uniform(0, 550), rng.uniform(0, 550)) for _ in range(200)]
+    # Рядом с детьми группы, сдвинутыми после добавления
+    queries += [(401, 381), (432, 389), (465, 392)]
+    for x, y in queries:
+        hit = index.nearest(x, y, 20)
+        expected = _brute_nearest(scene, x, y, 20)
+        assert (hit[0] if hit else None) == pytest.approx(expected)
+
+
+def test_first_query_collects_only_nearby_items(scene):
+    index = scene.snap_index
+    index.nearest(250, 250, 5)
+    assert len(index._points) < len(top_level_items(scene)) // 4
+
+
+def test_moved_item_is_recollected(scene):
+    index = scene.snap_index
+    item = top_level_items(scene)[0]
+    x, y = index.points_of([item])[:2]
+    item.moveBy(1000, 0)
+
+    assert index.points_of([item])[:2] == pytest.approx([x + 1000, y])
+    assert index.nearest(x + 1000, y, 1)[1:] == pytest.approx((x + 1000, y))
+
+
+def test_large_group_points_are_looked_up_by_cell():
+    scene = IndexedScene()
+    rng = random.Random(8)
+    group = Group()
+    scene.addItem(group)
+    for i in range(400):
+        shape = ShapeFactory.create_shape(("line", "rect", "ellipse")[i % 3], QPointF(0, 0),
+                                          QPointF(rng.uniform(2, 20), rng.uniform(2, 20)), "red")
+        scene.addItem(shape)
+        group.addToGroup(shape)
+        shape.setPos(rng.uniform(0, 600), rng.uniform(0, 600))
+
+    index = scene.snap_index
+    points = index.points_of([group])
+    assert len(points) > 2 * CELL_POINTS
+    for _ in range(200):
+        x, y = rng.uniform(-20, 620), rng.uniform(-20, 620)
+        hit = index.nearest(x, y, 10)
+        assert (hit[0] if hit else None) == pytest.approx(_brute_nearest(scene, x, y, 10))
+
+        vertical, _ = index.aligned(x, y, 4, 150)
+        candidates = [(abs(px - x), abs(py - y)) for px, py in zip(points[0::2], points[1::2])
+                      if abs(px - x) <= 4 and abs(py - y) <= 150]
+        expected = min(candidates) if candidates else None
+        assert (vertical and (abs(vertical[0] - x), abs(vertical[1] - y))) == (expected or None)
+
+    # Изменение ребёнка пересобирает ячейки группы
+    child = group.childItems()[0]
+    child.moveBy(2000, 0)
+    moved = []
+    _collect(child, moved)
+    assert index.nearest(moved[0], moved[1], 1)[1:] == pytest.approx(tuple(moved[:2]))
+    scene.clear()
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtWidgets import QGraphicsScene
+
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.spatial_index import GridIndex, IndexedScene, RTreeIndex, _distance, _intersects
+
+
+def _random_box(rng, side=1000.0):
+    x, y = rng.uniform(-side, side), rng.uniform(-side, side)
+    return (x, y, x + rng.uniform(0, 80), y + rng.uniform(0, 80))
+
+
+def _check(index, boxes, rng):
+    assert len(index) == len(boxes)
+    for _ in range(100):
+        query = _random_box(rng)
+        expected = {item for item, box in boxes.items() if _intersects(box, query)}
+        assert set(index.query(query)) == expected
+
+    for _ in range(50):
+        x, y = rng.uniform(-1100, 1100), rng.uniform(-1100, 1100)
+        hit = index.nearest(x, y, 60)
+        distances = [_distance(box, x, y) for box in boxes.values()]
+        best = min((d for d in distances if d <= 60), default=None)
+        if best is None:
+            assert hit is None
+        else:
+            assert _distance(boxes[hit], x, y) == pytest.approx(best)
+
+
+@pytest.mark.parametrize("make", [GridIndex, lambda: RTreeIndex(max_entries=6), RTreeIndex],
+                         ids=["grid", "rtree-small-nodes", "rtree"])
+def test_index_matches_brute_force(make):
+    rng = random.Random(7)
+    index = make()
+    boxes = {}
+    for item in range(1500):
+        boxes[item] = _random_box(rng)
+        index.insert(item, boxes[item])
+    _check(index, boxes, rng)
+
+    # Удаление половины и перемещение части оставшихся
+    for item in rng.sample(sorted(boxes), 750):
+        index.remove(item)
+        del boxes[item]
+    for item in rng.sample(sorted(boxes), 300):
+        boxes[item] = _random_box(rng)
+        index.update(item, boxes[item])
+    _check(index, boxes, rng)
+
+    for item in list(boxes):
+        index.remove(item)
+    assert len(index) == 0 and index.query((-2000, -2000, 2000, 2000)) == []
+
+
+@pytest.mark.parametrize("backend", ["grid", "rtree"])
+def test_scene_queries_match_qt(backend):
+    scene = IndexedScene(backend=backend)
+    rng = random.Random(11)
+    for i in range(300):
+        shape = ShapeFactory.create_shape(("line", "rect", "ellipse")[i % 3], QPointF(0, 0),
+                                          QPointF(rng.uniform(5, 40), rng.uniform(5, 40)), "red")
+        shape.setPos(rng.uniform(0, 800), rng.uniform(0, 800))
+        scene.addItem(shape)
+    for item in rng.sample(scene.items(), 50):
+        item.moveBy(rng.uniform(-100, 100), rng.uniform(-100, 100))
+
+    # Вид рисует по BSP Qt при любом индексе
+    assert scene.itemIndexMethod() == QGraphicsScene.ItemIndexMethod.BspTreeIndex
+    for _ in range(50):
+        rect = QRectF(rng.uniform(0, 800), rng.uniform(0, 800), rng.uniform(1, 150), rng.uniform(1, 150))
+        expected = set(scene.items(rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect))
+        assert set(scene.spatial_index.items_in(rect)) == expected
+
+        point = QPointF(rng.uniform(0, 800), rng.uniform(0, 800))
+        assert scene.spatial_index.items_at(point) == scene.items(point)
+    scene.clear()
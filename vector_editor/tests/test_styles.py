@@ -0,0 +1,64 @@
+from PySide6.QtCore import QPointF
+
+from src.logic.commands.commands import RestyleCommand
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.shape_logic.styles import style_table
+from src.logic.spatial_index import IndexedScene
+from src.logic.virtual_document import ShapeRecord
+
+
+def test_assigning_color_and_width_switches_shared_style():
+    shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(10, 10), "red")
+    shape.color = "blue"
+    shape.stroke_width = 4
+
+    assert (shape.color, shape.stroke_width) == ("#0000ff", 4)
+    assert shape.style is style_table.intern("#0000ff", 4)
+    assert shape.pen().color().name() == "#0000ff" and shape.pen().width() == 4
+
+
+def test_record_color_and_width_are_assignable():
+    record = ShapeRecord(1, "line", 0, 0, 0, 0, 10, 10, "red", 2)
+    record.color = "green"
+    record.width = 5
+
+    assert record.style is style_table.intern("green", 5)
+
+
+def test_restyle_reaches_every_user_of_the_style():
+    # Свои значения стиля: таблица стилей общая для всех тестов процесса
+    scene = IndexedScene()
+    style = style_table.intern("#123456", 7)
+    shapes = [ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(10, 10), "#123456") for _ in range(3)]
+    for shape in shapes:
+        shape.set_style(style)
+        scene.addItem(shape)
+    group = Group()
+    scene.addItem(group)
+    group.addToGroup(shapes[2])
+    other = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(10, 10), "#654321")
+    scene.addItem(other)
+    removed = shapes[1]
+    scene.removeItem(removed)
+
+    command = RestyleCommand(scene, style, "#abcdef", 9)
+    command.redo()
+    assert style_table.intern("#abcdef", 9) is style
+    assert style_table.intern("#123456", 7) is not style
+    assert [shape.color for shape in shapes] == ["#abcdef"] * 3
+    assert set(scene.columns.where(color="#abcdef", width=9)) == {shapes[0], shapes[2]}
+    assert command.journal_records() == [{"op": "restyle", "from": ["#123456", 7], "to": ["#abcdef", 9]}]
+
+    # Перья элементов догоняют таблицу раз за кадр, вернувшаяся фигура - при добавлении
+    scene.sync_styles()
+    scene.addItem(removed)
+    for shape in shapes:
+        assert shape.pen().color().name() == "#abcdef" and shape.pen().width() == 9
+    assert other.pen().color().name() == "#654321"
+
+    command.undo()
+    scene.sync_styles()
+    assert all(shape.pen().color().name() == "#123456" and shape.pen().width() == 7 for shape in shapes)
+    assert style_table.intern("#abcdef", 9) is not style
+    scene.clear()
@@ -0,0 +1,56 @@
+import pytest
+from PySide6.QtCore import QPointF, QRectF
+
+from src.logic.scene_utils import content_rect
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.spatial_index import IndexedScene
+from src.logic.strategies import SvgSaveStrategy
+from src.logic.svg_import import SvgImporter
+from src.logic.svg_stream import column_bounds
+from src.logic.vec_format import VecFormat
+
+
+@pytest.fixture
+def scene():
+    scene = IndexedScene()
+    for i, kind in enumerate(("line", "rect", "ellipse")):
+        shape = ShapeFactory.create_shape(kind, QPointF(0, 0), QPointF(30, 12), "red")
+        shape.setPos(i * 40 - 200, -50)
+        shape.setRotation(i * 25)
+        scene.addItem(shape)
+
+    polyline = ShapeFactory.create_polyline([0, 0, 10, -40, 25, 5], "blue")
+    polyline.setPos(300, 120)
+    scene.addItem(polyline)
+
+    group = Group()
+    scene.addItem(group)
+    for i in range(3):
+        shape = ShapeFactory.create_shape("rect", QPointF(0, 0), QPointF(8, 8), "green")
+        shape.set_stroke_width(5)
+        shape.setPos(i * 12, 0)
+        scene.addItem(shape)
+        group.addToGroup(shape)
+    group.setPos(80, 200)
+    group.setRotation(40)
+    group.setScale(2.5)
+    yield scene
+    scene.clear()
+
+
+def test_column_bounds_cover_content_rect(scene):
+    rect = content_rect(scene)
+    x, y, w, h = column_bounds(VecFormat.columns(scene))
+    assert QRectF(x, y, w, h).contains(rect)
+    # Запас - выступ квадратного конца пера: толщина 5 в группе с масштабом 2.5
+    assert (x, y, x + w, y + h) == pytest.approx((rect.left(), rect.top(), rect.right(), rect.bottom()), abs=5)
+
+
+def test_export_round_trips_through_importer(scene, tmp_path):
+    path = str(tmp_path / "out.svg")
+    SvgSaveStrategy().save(path, scene)
+
+    imported = [value for key, value, _ in SvgImporter.iter_project(path) if key == "item"]
+    kinds = sorted(item.type_name for item in imported)
+    assert kinds == ["ellipse", "group", "line", "polyline", "rect"]
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QTransform
+
+from src.logic.svg_import import SvgImporter
+
+RECT = (10.0, 10.0, 20.0, 20.0)
+
+
+def _import(tmp_path, body: str) -> list:
+    path = tmp_path / "in.svg"
+    path.write_text(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">{body}</svg>')
+    return [value for key, value, _ in SvgImporter.iter_project(str(path)) if key == "item"]
+
+
+def _corners(x, y, w, h) -> list:
+    return [QPointF(x, y), QPointF(x + w, y), QPointF(x + w, y + h), QPointF(x, y + h)]
+
+
+def _rounded(points) -> set:
+    return {(round(p.x(), 6) + 0.0, round(p.y(), 6) + 0.0) for p in points}
+
+
+@pytest.mark.parametrize("transform, matrix", [
+    ("scale(1,-1)", (1, 0, 0, -1, 0, 0)),
+    ("scale(-1,1)", (-1, 0, 0, 1, 0, 0)),
+    ("scale(-2,3)", (-2, 0, 0, 3, 0, 0)),
+    ("translate(5 7) scale(1,-1)", (1, 0, 0, -1, 5, 7)),
+    # Отражение относительно прямой под 30 градусов: det = -1
+    ("matrix(0.5 0.8660254 0.8660254 -0.5 40 0)", (0.5, 0.8660254, 0.8660254, -0.5, 40, 0)),
+    ("matrix(0 2 2 0 0 0)", (0, 2, 2, 0, 0, 0)),
+    ("rotate(30) scale(2)", None),
+])
+def test_rect_transforms_keep_corners(tmp_path, transform, matrix):
+    (item,) = _import(tmp_path, f'<rect x="10" y="10" width="20" height="20" transform="{transform}" '
+                                f'stroke="black" fill="none"/>')
+    if matrix is None:
+        t = QTransform().rotate(30).scale(2, 2)
+    else:
+        t = QTransform(*matrix)
+    expected = _rounded(t.map(point) for point in _corners(*RECT))
+
+    x, y, w, h = item.get_geometry()
+    assert w > 0 and h > 0
+    assert _rounded(item.mapToScene(point) for point in _corners(x, y, w, h)) == expected
+
+
+def test_mirrored_rect_bounds(tmp_path):
+    (item,) = _import(tmp_path, '<rect x="10" y="10" width="20" height="20" transform="scale(1,-1)" '
+                                'stroke="black" stroke-width="1" fill="none"/>')
+    rect = item.sceneBoundingRect()
+    assert (rect.top(), rect.bottom()) == (-30.5, -9.5)
+    assert (rect.left(), rect.right()) == (9.5, 30.5)
+
+
+def test_mirror_keeps_stroke_width(tmp_path):
+    (item,) = _import(tmp_path, '<rect x="0" y="0" width="10" height="10" transform="scale(-3,3)" '
+                                'stroke="black" stroke-width="2" fill="none"/>')
+    assert item.stroke_width == 6
+
+
+def test_polyline_points_follow_matrix(tmp_path):
+    (item,) = _import(tmp_path, '<polyline points="0,0 10,0 10,10" transform="matrix(1 0 0 -1 5 5)" '
+                                'stroke="red"/>')
+    points = item.points
+    scene = [item.mapToScene(QPointF(points[i], points[i + 1])) for i in range(0, len(points), 2)]
+    assert [(p.x(), p.y()) for p in scene] == [(5.0, 5.0), (15.0, 5.0), (15.0, -5.0)]
+
+
+def test_ellipse_mirrored_rotation(tmp_path):
+    (item,) = _import(tmp_path, '<ellipse cx="20" cy="10" rx="10" ry="5" '
+                                'transform="matrix(0 1 1 0 0 0)" stroke="black" fill="none"/>')
+    # Отражение относительно диагонали: центр (20, 10) -> (10, 20), оси меняются местами
+    center = item.mapToScene(item.path().boundingRect().center())
+    assert (round(center.x(), 6), round(center.y(), 6)) == (10.0, 20.0)
+    assert math.isclose(item.sceneBoundingRect().width(), 10 + item.stroke_width, abs_tol=1e-6)
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from PySide6.QtCore import QPointF
+
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.factory import ShapeFactory
+from src.logic.shape_logic.group import Group
+from src.logic.spatial_index import IndexedScene
+from src.logic.vec_format import HEADER, KIND_GROUP, MAGIC, VecFormat
+
+
+@pytest.fixture
+def scene():
+    scene = IndexedScene()
+    for i, kind in enumerate(("line", "rect", "ellipse")):
+        shape = ShapeFactory.create_shape(kind, QPointF(0, 0), QPointF(30, 12), ("red", "#00ff00", "blue")[i])
+        shape.setPos(i * 40 - 200, -50)
+        shape.setRotation(i * 25)
+        shape.set_stroke_width(i + 1)
+        scene.addItem(shape)
+
+    polyline = ShapeFactory.create_polyline([0, 0, 10.5, -40.25, 25, 5, 40, 0], "blue")
+    polyline.setPos(300, 120)
+    polyline.setScale(1.5)
+    scene.addItem(polyline)
+
+    inner = Group()
+    scene.addItem(inner)
+    for i in range(2):
+        shape = ShapeFactory.create_shape("ellipse", QPointF(0, 0), QPointF(6, 4), "red")
+        shape.setPos(i * 10, 30)
+        scene.addItem(shape)
+        inner.addToGroup(shape)
+
+    outer = Group()
+    scene.addItem(outer)
+    child = ShapeFactory.create_polyline([0, 0, 5, 5, 10, 0], "green")
+    scene.addItem(child)
+    outer.addToGroup(child)
+    outer.addToGroup(inner)
+    outer.setPos(80, 200)
+    outer.setRotation(40)
+    outer.setScale(2.5)
+    yield scene
+    scene.clear()
+
+
+def _state(dicts) -> list:
+    return sorted(json.dumps(data, sort_keys=True) for data in dicts)
+
+
+def _read(path, records=False) -> list:
+    return [value for key, value, _ in VecFormat.iter_project(str(path), records) if key in ("item", "record")]
+
+
+def test_round_trip_restores_items(scene, tmp_path):
+    path = tmp_path / "p.vec"
+    VecFormat.save(str(path), scene)
+
+    loaded = _read(path)
+    assert _state(item.to_dict() for item in loaded) == _state(item.to_dict() for item in top_level_items(scene))
+
+
+def test_records_match_items(scene, tmp_path):
+    path = tmp_path / "p.vec"
+    VecFormat.save(str(path), scene)
+
+    records = _read(path, records=True)
+    assert _state(record.to_dict() for record in records) == _state(item.to_dict() for item in _read(path))
+
+
+def test_header_and_unknown_version(scene, tmp_path):
+    path = tmp_path / "p.vec"
+    VecFormat.save(str(path), scene)
+    key, info, _ = next(VecFormat.iter_project(str(path)))
+    assert key == "scene" and (info["width"], info["height"]) == (scene.width(), scene.height())
+
+    data = bytearray(path.read_bytes())
+    HEADER.pack_into(data, 0, MAGIC, 99, *HEADER.unpack_from(data, 0)[2:])
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        _read(path)
+
+
+def test_truncated_file_is_rejected(scene, tmp_path):
+    path = tmp_path / "p.vec"
+    VecFormat.save(str(path), scene)
+    path.write_bytes(path.read_bytes()[:HEADER.size + 40])
+    with pytest.raises(ValueError):
+        _read(path)
+
+
+@pytest.mark.parametrize("column, value", [(3, lambda node: 9), (4, lambda node: 99), (5, lambda node: node)],
+                         ids=["kind", "style", "parent"])
+def test_invalid_nodes_are_rejected(scene, tmp_path, column, value):
+    # Колонки снимка: 3 - тип, 4 - стиль, 5 - родитель (здесь - сам узел)
+    blocks = VecFormat.collect(scene)
+    node = next(i for i, kind in enumerate(blocks[3]) if kind != KIND_GROUP)
+    blocks[column][node] = value(node)
+    path = tmp_path / "p.vec"
+    VecFormat.write(str(path), blocks)
+    with pytest.raises(ValueError):
+        _read(path)
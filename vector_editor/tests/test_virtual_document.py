@@ -0,0 +1,85 @@
+import pytest
+from PySide6.QtCore import QRectF
+
+from src.logic import virtual_document
+from src.logic.scene_utils import top_level_items
+from src.logic.shape_logic.shapes import next_uid
+from src.logic.snapping import SnapIndex, _collect
+from src.logic.spatial_index import IndexedScene, top_level
+from src.logic.virtual_document import ShapeRecord, VirtualDocument
+
+
+def _records() -> list:
+    records = [ShapeRecord(next_uid(), "rect", i * 50, 0, 0, 0, 20, 10, "red") for i in range(4)]
+    records.append(ShapeRecord(next_uid(), "line", 0, 80, 0, 0, 40, 30, "blue", 3, rotation=30))
+    records.append(ShapeRecord(next_uid(), "polyline", 100, 80, color="blue", points=[0, 0, 10, 20, 30, 5]))
+    children = [ShapeRecord(next_uid(), "ellipse", 0, 0, 0, 0, 12, 6, "green", 4),
+                ShapeRecord(next_uid(), "rect", 20, 0, 0, 0, 8, 8, "red", scale=1.5)]
+    records.append(ShapeRecord(next_uid(), "group", 200, 60, color=None, width=0, rotation=-40, scale=2.0,
+                               children=children))
+    return records
+
+
+@pytest.fixture
+def document():
+    scene = IndexedScene()
+    document = VirtualDocument(scene)
+    scene.set_document(document)
+    document.add_records(_records())
+    yield document
+    scene.clear()
+
+
+def _uids(nodes) -> set:
+    return {node.uid for node in nodes}
+
+
+def test_update_view_materializes_nearest_records_up_to_cap(document, monkeypatch):
+    monkeypatch.setattr(virtual_document, "MAX_LIVE", 2)
+    document.update_view(QRectF(-10, -10, 40, 30))
+
+    assert len(document.live) == 2
+    assert {item.pos().x() for item in document.live} == {0, 50}
+    assert document.dormant_count == 5
+
+
+@pytest.mark.parametrize("filters", [
+    {"color": "red"},
+    {"kind": "rect", "min_w": 15},
+    {"kind": "ellipse"},
+    {"width": 3, "max_h": 100},
+    {"area": QRectF(190, 40, 30, 30)},
+    {"kind": "group", "min_w": 10},
+])
+def test_where_matches_columns_of_materialized_items(document, filters):
+    found = _uids(document.where(**filters))
+
+    document.materialize_all()
+    items = {top_level(item) for item in document.scene.columns.where(**filters)}
+    assert found == _uids(items)
+
+
+def test_similar_finds_records_by_kind_and_style(document):
+    assert len(document.similar(kinds={"rect"})) == 4
+
+    # Образец - созданный красный прямоугольник: красный ребёнок находит группу
+    document.update_view(QRectF(-5, -5, 10, 10))
+    sample = [item for item in document.live if item.pos().x() == 0]
+    styles = document.scene.columns.similar_styles(sample, "color")
+    found = document.similar(styles=styles)
+    assert sorted(record.kind for record in found) == ["group"] + ["rect"] * (4 - len(document.live))
+
+
+def test_anchor_points_match_materialized_items(document):
+    expected = {record.uid: record.anchor_points() for record in document.nodes()}
+
+    document.materialize_all()
+    for item in top_level_items(document.scene):
+        points = []
+        _collect(item, points)
+        assert expected[item.uid] == pytest.approx(points)
+
+
+def test_snap_reaches_dormant_records(document):
+    index = SnapIndex(document.scene)
+    assert index.nearest(52, 1, 5)[1:] == (50, 0)